@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Post, PostComment, PostLike, CommentLike
+from .models import Post, PostComment, PostLike, CommentLike, PostUpload, Hashtag
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -25,7 +25,20 @@ class CommentLikeAdmin(admin.ModelAdmin):
     list_filter = ('created_at',)
 
 
+class PostUploadAdmin(admin.ModelAdmin):
+    list_display = ('id', 'author', 'status', 'size', 'created_at')
+    search_fields = ('author__username', 'key')
+    list_filter = ('status', 'created_at')
+
+
+class HashtagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'posts_count', 'created_at')
+    search_fields = ('name',)
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(PostComment, PostCommentAdmin)
 admin.site.register(PostLike, PostLikeAdmin)
-admin.site.register(CommentLike, CommentLikeAdmin)
\ No newline at end of file
+admin.site.register(CommentLike, CommentLikeAdmin)
+admin.site.register(PostUpload, PostUploadAdmin)
+admin.site.register(Hashtag, HashtagAdmin)
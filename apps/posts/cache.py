@@ -0,0 +1,104 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+from shared import page_cache
+from shared.redis_client import get_redis
+from .models import PostComment
+
+
+# Read-through cache of the viewer independent part of the post and comment
+# detail payloads. Each object has one hash whose fields are request hosts
+# (payloads contain absolute media URLs). The key carries the object's
+# version, which invalidation bumps: a payload built from rows read before
+# a change is written under the old version and never served.
+# Per-viewer fields (me_liked) and buffered like deltas are merged in by the
+# views. Author renames or new photos show up once DETAIL_CACHE_TTL expires.
+# Comment keys use the hex form of the id, the same as PostComment.path.
+POST_DETAIL_KEY = 'post:detail:{post_id}:v{version}'
+POST_VERSION_KEY = 'post:detail:{post_id}:version'
+COMMENT_DETAIL_KEY = 'comment:detail:{comment_hex}:v{version}'
+COMMENT_VERSION_KEY = 'comment:detail:{comment_hex}:version'
+
+
+def _get(key, version_key, host, **ids):
+    """The cached entry for ``host`` (or None) and the version a new one must be stored under."""
+    client = get_redis()
+    version = int(client.get(version_key.format(**ids)) or 0)
+    raw = client.hget(key.format(version=version, **ids), host)
+    return (json.loads(raw) if raw else None), version
+
+
+def _set(key, host, data, version, modified, **ids):
+    """
+    Store ``data`` under ``version`` and return the cache entry: payload,
+    content hash and ``modified``, the object's last change.
+    """
+    payload = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+    entry = {
+        'data': json.loads(payload),
+        'etag': hashlib.sha1(payload.encode()).hexdigest(),
+        'modified': modified.timestamp(),
+    }
+    key = key.format(version=version, **ids)
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hset(key, host, json.dumps(entry))
+    pipe.expire(key, settings.DETAIL_CACHE_TTL)
+    pipe.execute()
+    return entry
+
+
+def get_post(post_id, host):
+    return _get(POST_DETAIL_KEY, POST_VERSION_KEY, host, post_id=post_id)
+
+
+def set_post(post_id, host, data, version, modified):
+    return _set(POST_DETAIL_KEY, host, data, version, modified, post_id=post_id)
+
+
+def get_comment(comment_id, host):
+    return _get(COMMENT_DETAIL_KEY, COMMENT_VERSION_KEY, host, comment_hex=comment_id.hex)
+
+
+def set_comment(comment_id, host, data, version, modified):
+    return _set(COMMENT_DETAIL_KEY, host, data, version, modified, comment_hex=comment_id.hex)
+
+
+def _delete(version_keys, surrogate_keys):
+    if version_keys:
+        pipe = get_redis().pipeline(transaction=False)
+        for key in version_keys:
+            pipe.incr(key)
+            # outlives every entry stored under an older version
+            pipe.expire(key, 2 * settings.DETAIL_CACHE_TTL)
+        pipe.execute()
+    page_cache.purge(surrogate_keys)
+
+
+def invalidate_posts(post_ids):
+    """Retire cached post payloads and list pages showing them once the current transaction commits."""
+    keys = [POST_VERSION_KEY.format(post_id=post_id) for post_id in post_ids]
+    surrogate_keys = [f'post-{post_id}' for post_id in post_ids]
+    transaction.on_commit(lambda: _delete(keys, surrogate_keys))
+
+
+def invalidate_comment_paths(paths):
+    """
+    Retire the cached payloads of the comments on ``paths`` and of all their
+    ancestors, whose reply trees embed them, once the transaction commits.
+    """
+    segments = {segment for path in paths for segment in path.split('/') if segment}
+    keys = [COMMENT_VERSION_KEY.format(comment_hex=segment) for segment in segments]
+    surrogate_keys = [f'comment-{segment}' for segment in segments]
+    transaction.on_commit(lambda: _delete(keys, surrogate_keys))
+
+
+def invalidate_comments(comment_ids):
+    invalidate_comment_paths(PostComment.objects.filter(pk__in=comment_ids).values_list('path', flat=True))
+
+
+def invalidate_lists(surrogate_keys):
+    """Purge the list pages new rows show up on (see views.tag_page) after commit."""
+    transaction.on_commit(lambda: page_cache.purge(surrogate_keys))
@@ -0,0 +1,148 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from shared.redis_client import get_redis
+from .models import Post, PostComment
+from . import cache
+
+
+# Denormalized counters are always changed with a single UPDATE ... SET x = x + n
+# so concurrent requests never overwrite each other's increments. Call these
+# inside the same transaction as the row insert/delete they describe.
+
+PENDING_LIKES_KEY = 'post:likes:pending:{post_id}:{shard}'
+DIRTY_POSTS_KEY = 'post:likes:dirty'
+
+
+def _pending_keys(post_id):
+    return [PENDING_LIKES_KEY.format(post_id=post_id, shard=shard) for shard in range(settings.POST_LIKES_COUNTER_SHARDS)]
+
+
+def change_post_likes(post_id, delta):
+    if settings.POST_LIKES_WRITE_BEHIND:
+        # Only buffer once the like row is committed, otherwise a rolled back
+        # request would still move the counter.
+        transaction.on_commit(lambda: buffer_post_likes(post_id, delta))
+        return
+    Post.objects.filter(pk=post_id).update(likes_count=F('likes_count') + delta)
+
+
+def _add_likes(model, deltas):
+    """Apply ``{pk: delta}`` to ``model.likes_count`` in one UPDATE."""
+    model.objects.filter(pk__in=list(deltas)).update(likes_count=F('likes_count') + Case(
+        *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+
+def _add_post_likes(deltas):
+    """Apply ``{post_id: delta}`` to ``Post.likes_count`` in one UPDATE."""
+    _add_likes(Post, deltas)
+
+
+def change_many_post_likes(deltas):
+    """``change_post_likes`` for several posts at once, e.g. a batch of like operations."""
+    deltas = {post_id: delta for post_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if settings.POST_LIKES_WRITE_BEHIND:
+        transaction.on_commit(lambda: [buffer_post_likes(post_id, delta) for post_id, delta in deltas.items()])
+        return
+    _add_post_likes(deltas)
+
+
+def change_post_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(comments_count=F('comments_count') + delta)
+
+
+def change_comment_likes(comment_id, delta):
+    PostComment.objects.filter(pk=comment_id).update(likes_count=F('likes_count') + delta)
+
+
+def change_many_comment_likes(deltas):
+    """``change_comment_likes`` for several comments in one UPDATE."""
+    deltas = {comment_id: delta for comment_id, delta in deltas.items() if delta}
+    if deltas:
+        _add_likes(PostComment, deltas)
+
+
+def change_comment_replies(comment_id, delta):
+    PostComment.objects.filter(pk=comment_id).update(replies_count=F('replies_count') + delta)
+
+
+def buffer_post_likes(post_id, delta):
+    """Add ``delta`` to one randomly picked sub-key of the post and mark it dirty."""
+    shard = random.randrange(settings.POST_LIKES_COUNTER_SHARDS)
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.incrby(PENDING_LIKES_KEY.format(post_id=post_id, shard=shard), delta)
+    pipe.sadd(DIRTY_POSTS_KEY, str(post_id))
+    pipe.execute()
+
+
+def pending_post_likes(post_ids):
+    """
+    Return ``{str(post_id): delta}`` of likes buffered in Redis but not yet
+    flushed, in one MGET for the whole page. Empty when write-behind is off.
+    """
+    if not settings.POST_LIKES_WRITE_BEHIND or not post_ids:
+        return {}
+    shards = settings.POST_LIKES_COUNTER_SHARDS
+    keys = [key for post_id in post_ids for key in _pending_keys(post_id)]
+    values = get_redis().mget(keys)
+    pending = {}
+    for i, post_id in enumerate(post_ids):
+        total = sum(int(v) for v in values[i * shards:(i + 1) * shards] if v)
+        if total:
+            pending[str(post_id)] = total
+    return pending
+
+
+def dirty_posts(post_ids):
+    """The subset of ``post_ids`` (as strings) with like deltas still buffered in Redis."""
+    if not settings.POST_LIKES_WRITE_BEHIND or not post_ids:
+        return set()
+    post_ids = [str(post_id) for post_id in post_ids]
+    flags = get_redis().smismember(DIRTY_POSTS_KEY, post_ids)
+    return {post_id for post_id, flag in zip(post_ids, flags) if flag}
+
+
+def flush_pending_post_likes(batch_size=1000):
+    """
+    Move buffered like deltas of up to ``batch_size`` dirty posts into
+    ``Post.likes_count`` with a single UPDATE. Returns the number of dirty
+    posts taken, including those whose deltas cancelled out. Between the GETDEL and the UPDATE a reader can briefly see the
+    old stored value without the delta; the next read after commit is exact.
+    """
+    client = get_redis()
+    post_ids = client.spop(DIRTY_POSTS_KEY, batch_size)
+    if not post_ids:
+        return 0
+
+    shards = settings.POST_LIKES_COUNTER_SHARDS
+    pipe = client.pipeline(transaction=False)
+    for post_id in post_ids:
+        for key in _pending_keys(post_id):
+            pipe.getdel(key)
+    values = pipe.execute()
+
+    deltas = {}
+    for i, post_id in enumerate(post_ids):
+        total = sum(int(v) for v in values[i * shards:(i + 1) * shards] if v)
+        if total:
+            deltas[post_id] = total
+    if not deltas:
+        return len(post_ids)
+
+    try:
+        _add_post_likes(deltas)
+    except Exception:
+        # Put the deltas back so the next flush retries them.
+        for post_id, delta in deltas.items():
+            buffer_post_likes(post_id, delta)
+        raise
+    # cached payloads hold the old stored count and the delta is no longer pending
+    cache.invalidate_posts(list(deltas))
+    return len(post_ids)
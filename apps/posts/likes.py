@@ -0,0 +1,245 @@
+from django.conf import settings
+from django.db import connection, transaction
+from redis.exceptions import WatchError
+from shared.redis_client import get_redis
+from .models import CommentLike, PostLike
+from . import cache, counters
+
+
+# Every user's liked posts and liked comments are Redis sets, loaded from the
+# database on first use and then kept current by the like views, so a page
+# resolves me_liked with one SMISMEMBER. The placeholder member keeps the
+# set in existence for users without likes, which tells "liked nothing"
+# apart from "not loaded". Every change bumps a version stamp, and a load
+# only stores its set if the stamp did not move while it read the database.
+# Users with more than LIKED_SET_MAX_SIZE likes get a set holding just the
+# OVERFLOW marker, and their pages are checked against the database.
+LIKED_KEY = 'user:{user_id}:liked_{kind}'
+LIKED_VERSION_KEY = 'user:{user_id}:liked_{kind}:version'
+PLACEHOLDER = '-'
+OVERFLOW = '*'
+
+SOURCES = {
+    'posts': (PostLike, 'post_id'),
+    'comments': (CommentLike, 'comment_id'),
+}
+
+
+def _load(kind, user_id):
+    """
+    Fill the user's liked set from the database. Returns the liked ids, or
+    None when there are too many to keep in Redis.
+    """
+    model, field = SOURCES[kind]
+    key, version_key = LIKED_KEY.format(user_id=user_id, kind=kind), LIKED_VERSION_KEY.format(user_id=user_id, kind=kind)
+    client = get_redis()
+    version = client.get(version_key)
+    limit = settings.LIKED_SET_MAX_SIZE
+    ids = {str(pk) for pk in model.objects.filter(author_id=user_id).values_list(field, flat=True)[:limit + 1]}
+    members = [OVERFLOW] if len(ids) > limit else [PLACEHOLDER, *ids]
+
+    with client.pipeline(transaction=True) as pipe:
+        try:
+            pipe.watch(version_key)
+            # a like committed since the read above may be missing from it
+            if pipe.get(version_key) == version:
+                pipe.multi()
+                pipe.delete(key)
+                pipe.sadd(key, *members)
+                pipe.expire(key, settings.LIKED_SET_TTL)
+                pipe.execute()
+        except WatchError:
+            pass
+    return None if members == [OVERFLOW] else ids
+
+
+def liked(kind, user, ids):
+    """The members of ``ids`` (posts or comments) liked by ``user``, in one round trip."""
+    if user is None or not user.is_authenticated or not ids:
+        return set()
+    ids = list(ids)
+    key = LIKED_KEY.format(user_id=user.pk, kind=kind)
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.exists(key)
+    pipe.smismember(key, [OVERFLOW, *[str(pk) for pk in ids]])
+    loaded, (overflow, *flags) = pipe.execute()
+    if loaded and not overflow:
+        return {pk for pk, flag in zip(ids, flags) if flag}
+    stored = None if overflow else _load(kind, user.pk)
+    if stored is None:
+        model, field = SOURCES[kind]
+        stored = {str(pk) for pk in model.objects.filter(author_id=user.pk, **{f'{field}__in': ids}).values_list(field, flat=True)}
+    return {pk for pk in ids if str(pk) in stored}
+
+
+def liked_post_ids(user, post_ids):
+    return liked('posts', user, post_ids)
+
+
+def liked_comment_ids(user, comment_ids):
+    return liked('comments', user, comment_ids)
+
+
+def _apply(key, version_key, add, members):
+    # Only touch a loaded set: adding to a missing key would create a partial
+    # set that reads as complete. If it changes meanwhile, drop it instead.
+    client = get_redis()
+    with client.pipeline(transaction=True) as pipe:
+        try:
+            pipe.watch(key)
+            loaded = pipe.exists(key)
+            pipe.multi()
+            # tells a load running right now that its rows may be stale
+            pipe.incr(version_key)
+            pipe.expire(version_key, settings.LIKED_SET_TTL)
+            if loaded:
+                if add:
+                    pipe.sadd(key, *members)
+                else:
+                    pipe.srem(key, *members)
+            pipe.execute()
+        except WatchError:
+            client.delete(key)
+            client.incr(version_key)
+
+
+def record(kind, user_id, ids, add):
+    """Add (or remove) ``ids`` to the user's liked set once the transaction commits."""
+    members = [str(pk) for pk in ids]
+    if members:
+        key, version_key = LIKED_KEY.format(user_id=user_id, kind=kind), LIKED_VERSION_KEY.format(user_id=user_id, kind=kind)
+        transaction.on_commit(lambda: _apply(key, version_key, add, members))
+
+
+# Liking and unliking is one statement each: an INSERT ... ON CONFLICT DO
+# NOTHING RETURNING that only inserts while the target exists, and a
+# DELETE ... RETURNING. The returned row tells whether anything changed, so
+# double taps and client retries neither fail on the unique constraint nor
+# move the counters twice. Raw statements send no signals, so the counters,
+# the liked set and the cached payloads are updated here.
+
+def _after_change(kind, user_id, target_id, delta):
+    record(kind, user_id, [target_id], add=delta > 0)
+    if kind == 'posts':
+        counters.change_post_likes(target_id, delta)
+        cache.invalidate_posts([target_id])
+    else:
+        counters.change_comment_likes(target_id, delta)
+        cache.invalidate_comments([target_id])
+
+
+def _target(kind):
+    model, field = SOURCES[kind]
+    return model._meta.get_field(field.removesuffix('_id'))
+
+
+def _changed(fk, target_ids, rows):
+    """The ``target_ids`` whose like row came back from RETURNING, in input order."""
+    returned = {fk.target_field.to_python(value) for value, in rows}
+    return [target_id for target_id in target_ids if fk.target_field.to_python(target_id) in returned]
+
+
+def _insert(kind, user_id, target_ids):
+    """Insert the user's likes of ``target_ids`` in one statement; returns the ids really inserted."""
+    model, fk = SOURCES[kind][0], _target(kind)
+    target = fk.related_model
+    fields = model._meta.concrete_fields
+    columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+    # INSERT ... SELECT leaves parameter types to be inferred, so cast the ones that need it
+    placeholders = ', '.join(connection.ops.unification_cast_sql(f) for f in fields)
+    selects, params = [], []
+    for target_id in target_ids:
+        like = model(author_id=user_id, **{SOURCES[kind][1]: target_id})
+        selects.append(f"SELECT {placeholders} WHERE EXISTS (SELECT 1 FROM {target._meta.db_table} WHERE id = %s)")
+        params += [f.get_db_prep_save(f.pre_save(like, True), connection) for f in fields]
+        params.append(target._meta.pk.get_db_prep_value(target_id, connection))
+    if not selects:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {model._meta.db_table} ({columns}) {' UNION ALL '.join(selects)} "
+            f"ON CONFLICT DO NOTHING RETURNING {fk.column}",
+            params,
+        )
+        return _changed(fk, target_ids, cursor.fetchall())
+
+
+def _delete(kind, user_id, target_ids):
+    """Delete the user's likes of ``target_ids`` in one statement; returns the ids really deleted."""
+    model = SOURCES[kind][0]
+    fk, author = _target(kind), model._meta.get_field('author')
+    if not target_ids:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {model._meta.db_table} WHERE {author.column} = %s "
+            f"AND {fk.column} IN ({', '.join(['%s'] * len(target_ids))}) RETURNING {fk.column}",
+            [
+                author.target_field.get_db_prep_value(user_id, connection),
+                *[fk.target_field.get_db_prep_value(target_id, connection) for target_id in target_ids],
+            ],
+        )
+        return _changed(fk, target_ids, cursor.fetchall())
+
+
+def _exists(kind, target_id):
+    return _target(kind).related_model.objects.filter(pk=target_id).exists()
+
+
+@transaction.atomic
+def add_like(kind, user_id, target_id):
+    """
+    Like a post or comment. Returns True if the like was created, False if
+    it already existed and None if the target does not exist.
+    """
+    if _insert(kind, user_id, [target_id]):
+        _after_change(kind, user_id, target_id, 1)
+        return True
+    return False if _exists(kind, target_id) else None
+
+
+@transaction.atomic
+def remove_like(kind, user_id, target_id):
+    """
+    Unlike a post or comment. Returns True if a like was deleted, False if
+    there was none and None if the target does not exist.
+    """
+    if _delete(kind, user_id, [target_id]):
+        _after_change(kind, user_id, target_id, -1)
+        return True
+    return False if _exists(kind, target_id) else None
+
+
+@transaction.atomic
+def change_likes(kind, user_id, wanted):
+    """
+    Apply ``{target_id: like}`` for one user with one INSERT for all likes
+    and one DELETE for all unlikes, and return the lists of ids really liked
+    and really unliked. The counters, the liked set and the caches follow
+    the returned rows, so retries and concurrent requests never count twice.
+    """
+    liked = _insert(kind, user_id, [target_id for target_id, like in wanted.items() if like])
+    unliked = _delete(kind, user_id, [target_id for target_id, like in wanted.items() if not like])
+    record(kind, user_id, liked, add=True)
+    record(kind, user_id, unliked, add=False)
+    deltas = {**{target_id: 1 for target_id in liked}, **{target_id: -1 for target_id in unliked}}
+    if kind == 'posts':
+        counters.change_many_post_likes(deltas)
+        cache.invalidate_posts(list(deltas))
+    else:
+        counters.change_many_comment_likes(deltas)
+        cache.invalidate_comments(list(deltas))
+    return liked, unliked
+
+
+@transaction.atomic
+def toggle_like(kind, user_id, target_id):
+    """Unlike if liked, like otherwise. Returns the new state, or None if the target does not exist."""
+    if _delete(kind, user_id, [target_id]):
+        _after_change(kind, user_id, target_id, -1)
+        return False
+    if _insert(kind, user_id, [target_id]):
+        _after_change(kind, user_id, target_id, 1)
+        return True
+    # a concurrent like landed in between
+    return True if _exists(kind, target_id) else None
@@ -0,0 +1,41 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.posts import tags
+from apps.posts.models import Post, PostComment, Hashtag, PostHashtag
+from apps.posts.tasks import _count
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = "Index hashtags and mentions of existing posts and comments, then recount Hashtag.posts_count."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        size = options['chunk_size']
+        posts = Post.objects.only('id', 'caption', 'created_at').order_by().iterator(chunk_size=size)
+        indexed = 0
+        for chunk in _chunks(posts, size):
+            with transaction.atomic():
+                tags.index_posts(chunk)
+            indexed += len(chunk)
+            self.stdout.write(f"{indexed} posts indexed")
+
+        comments = PostComment.objects.only('id', 'post_id', 'content').order_by().iterator(chunk_size=size)
+        indexed = 0
+        for chunk in _chunks(comments, size):
+            with transaction.atomic():
+                tags.index_comments(chunk)
+            indexed += len(chunk)
+            self.stdout.write(f"{indexed} comments indexed")
+
+        Hashtag.objects.update(posts_count=_count(PostHashtag, 'hashtag'))
+        self.stdout.write(self.style.SUCCESS(f"Indexed {Hashtag.objects.count()} hashtags."))
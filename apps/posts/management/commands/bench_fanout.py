@@ -0,0 +1,97 @@
+import random
+import statistics
+import time
+import uuid
+
+import fakeredis
+import redis
+from django.core.management.base import BaseCommand
+from shared import redis_client
+from apps.posts import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare fan-out-on-write with the hybrid strategy on a synthetic, "
+        "power-law follower graph: Redis writes per post and timeline read latency. "
+        "Uses an in-memory fakeredis unless --redis-url points at a scratch database, "
+        "which is FLUSHED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--alpha', type=float, default=1.2, help="Pareto shape of the follower distribution.")
+        parser.add_argument('--threshold', type=int, default=1000, help="Follower count above which authors are not fanned out.")
+        parser.add_argument('--reads', type=int, default=500)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--redis-url', default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        client = redis.Redis.from_url(options['redis_url'], decode_responses=True) if options['redis_url'] \
+            else fakeredis.FakeRedis(decode_responses=True)
+        redis_client._client = client
+
+        users = [uuid.uuid4() for _ in range(options['users'])]
+        followers, following = self.build_graph(users, options['alpha'], rng)
+        celebrities = {author for author, fans in followers.items() if len(fans) >= options['threshold']}
+        # popular accounts post more often: weight authors by sqrt(followers)
+        weights = [1 + len(followers[user]) ** 0.5 for user in users]
+        authors = rng.choices(users, weights=weights, k=options['posts'])
+        posts = [(author, uuid.uuid4(), float(i)) for i, author in enumerate(authors)]
+        readers = rng.sample(users, min(options['reads'], len(users)))
+
+        self.stdout.write(
+            f"{len(users)} users, {sum(map(len, followers.values()))} follows, "
+            f"{len(celebrities)} authors at or above {options['threshold']} followers, {len(posts)} posts"
+        )
+        for name, threshold in (('fan-out-on-write', None), ('hybrid', options['threshold'])):
+            client.flushdb()
+            writes, write_time = self.write(posts, followers, celebrities if threshold else set())
+            latencies = self.read(readers, following, celebrities if threshold else set(), options['page_size'])
+            self.stdout.write(self.style.SUCCESS(name))
+            self.stdout.write(f"  timeline writes: {writes} ({writes / len(posts):.1f} per post), {write_time:.2f}s total")
+            self.stdout.write(
+                f"  read latency: p50 {statistics.median(latencies) * 1000:.2f}ms, "
+                f"p95 {statistics.quantiles(latencies, n=20)[-1] * 1000:.2f}ms"
+            )
+        client.flushdb()
+
+    def build_graph(self, users, alpha, rng):
+        followers = {user: set() for user in users}
+        following = {user: set() for user in users}
+        limit = len(users) - 1
+        for author in users:
+            count = min(int(rng.paretovariate(alpha)), limit)
+            for fan in rng.sample(users, count):
+                if fan != author:
+                    followers[author].add(fan)
+                    following[fan].add(author)
+        return followers, following
+
+    def write(self, posts, followers, celebrities):
+        writes = 0
+        started = time.perf_counter()
+        for author, post_id, score in posts:
+            timeline.push_to_timelines([author], post_id, score)
+            writes += 1
+            if author in celebrities:
+                timeline.push_author_post(author, post_id, score)
+                writes += 1
+                continue
+            fans = list(followers[author])
+            for i in range(0, len(fans), 1000):
+                timeline.push_to_timelines(fans[i:i + 1000], post_id, score)
+            writes += len(fans)
+        return writes, time.perf_counter() - started
+
+    def read(self, readers, following, celebrities, page_size):
+        latencies = []
+        for reader in readers:
+            authors = [author for author in following[reader] if author in celebrities]
+            started = time.perf_counter()
+            timeline.read_merged(reader, authors, page_size)
+            latencies.append(time.perf_counter() - started)
+        return latencies
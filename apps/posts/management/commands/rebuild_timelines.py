@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from apps.users.models import User
+from apps.posts.timeline import rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = "Recompute home timelines in Redis from the database (e.g. after the cache was lost)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', help="Only rebuild these user ids (repeatable).")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True)
+        if options['users']:
+            users = users.filter(id__in=options['users'])
+        rebuilt = 0
+        for user_id in users.values_list('id', flat=True).iterator(chunk_size=options['chunk_size']):
+            rebuild_timeline(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} timelines."))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:34
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, fk):
+    rows = model.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostComment = apps.get_model('posts', 'PostComment')
+    PostLike = apps.get_model('posts', 'PostLike')
+    CommentLike = apps.get_model('posts', 'CommentLike')
+    Post.objects.update(likes_count=_count(PostLike, 'post'), comments_count=_count(PostComment, 'post'))
+    PostComment.objects.update(likes_count=_count(CommentLike, 'comment'), replies_count=_count(PostComment, 'parent'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_alter_post_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='likes_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='replies_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
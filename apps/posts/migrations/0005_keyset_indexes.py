@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_post_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='posts_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postcomment',
+            index=models.Index(fields=['-created_at', '-id'], name='post_comments_created_id_idx'),
+        ),
+    ]
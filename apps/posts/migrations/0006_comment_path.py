@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:38
+
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    PostComment = apps.get_model('posts', 'PostComment')
+    parents = dict(PostComment.objects.values_list('id', 'parent_id').iterator(chunk_size=2000))
+    paths = {}
+
+    def resolve(comment_id):
+        # walk up to the first ancestor with a known path, then fill in downwards
+        chain = []
+        while comment_id not in paths:
+            chain.append(comment_id)
+            parent_id = parents[comment_id]
+            if parent_id is None:
+                break
+            comment_id = parent_id
+        prefix, depth = paths.get(comment_id, ('', -1))
+        for item in reversed(chain):
+            prefix, depth = f'{prefix}{item.hex}/', depth + 1
+            paths[item] = (prefix, depth)
+
+    for comment_id in parents:
+        resolve(comment_id)
+
+    batch = []
+    for comment_id, (path, depth) in paths.items():
+        batch.append(PostComment(id=comment_id, path=path, depth=depth))
+        if len(batch) == 1000:
+            PostComment.objects.bulk_update(batch, ['path', 'depth'])
+            batch = []
+    PostComment.objects.bulk_update(batch, ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postcomment',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='path',
+            field=models.TextField(db_index=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_comment_path'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postcomment',
+            index=models.Index(fields=['post', 'parent', 'created_at', 'id'], name='post_comments_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postcomment',
+            index=models.Index(fields=['parent', 'created_at', 'id'], name='post_comments_replies_idx'),
+        ),
+    ]
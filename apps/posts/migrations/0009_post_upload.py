@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:51
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_image_derivatives'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('content_type', models.CharField(max_length=50)),
+                ('size', models.PositiveBigIntegerField()),
+                ('multipart_id', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('finalized', 'Finalized'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_uploads', to=settings.AUTH_USER_MODEL)),
+                ('post', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload', to='posts.post')),
+            ],
+            options={
+                'verbose_name': 'Post Upload',
+                'verbose_name_plural': 'Post Uploads',
+                'db_table': 'post_uploads',
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:56
+
+import django.core.validators
+import shared.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_upload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(storage=shared.storage.get_media_storage, upload_to='post_images/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png', 'webp'])]),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# (table, text column) pairs that /posts/search/ covers
+SEARCH_TABLES = (('posts', 'caption'), ('post_comments', 'content'))
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, column in SEARCH_TABLES:
+        if vendor == 'postgresql':
+            # Filled by triggers so only inserts and real text changes pay for
+            # to_tsvector; counter UPDATEs on the same rows do not.
+            schema_editor.execute(f"ALTER TABLE {table} ADD COLUMN search_vector tsvector")
+            schema_editor.execute(f"UPDATE {table} SET search_vector = to_tsvector('simple', coalesce({column}, ''))")
+            for name, event in (('insert', 'INSERT'), ('update', f'UPDATE OF {column}')):
+                condition = '' if name == 'insert' else f'WHEN (OLD.{column} IS DISTINCT FROM NEW.{column}) '
+                schema_editor.execute(
+                    f"CREATE TRIGGER {table}_search_{name} BEFORE {event} ON {table} FOR EACH ROW {condition}"
+                    f"EXECUTE FUNCTION tsvector_update_trigger(search_vector, 'pg_catalog.simple', {column})"
+                )
+            schema_editor.execute(f"CREATE INDEX {table}_search_idx ON {table} USING GIN (search_vector)")
+        elif vendor == 'sqlite':
+            # Django remakes SQLite tables on many schema changes, which drops
+            # triggers and renumbers rowids, so the FTS5 table is keyed by id and
+            # kept up to date from apps.posts.signals instead.
+            schema_editor.execute(f"CREATE VIRTUAL TABLE {table}_fts USING fts5(id UNINDEXED, body)")
+            schema_editor.execute(f"INSERT INTO {table}_fts (id, body) SELECT id, {column} FROM {table}")
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, _ in SEARCH_TABLES:
+        if vendor == 'postgresql':
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_search_insert ON {table}")
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_search_update ON {table}")
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+            schema_editor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+        elif vendor == 'sqlite':
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_media_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
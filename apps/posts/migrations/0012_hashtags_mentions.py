@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:21
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hashtag',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('posts_count', models.IntegerField(default=0, editable=False)),
+            ],
+            options={
+                'verbose_name': 'Hashtag',
+                'verbose_name_plural': 'Hashtags',
+                'db_table': 'hashtags',
+            },
+        ),
+        migrations.CreateModel(
+            name='Mention',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='posts.postcomment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='posts.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Mention',
+                'verbose_name_plural': 'Mentions',
+                'db_table': 'mentions',
+                'indexes': [models.Index(fields=['user', '-created_at'], name='mentions_user_created_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('comment__isnull', True)), fields=('user', 'post'), name='unique_post_mention'), models.UniqueConstraint(condition=models.Q(('comment__isnull', False)), fields=('user', 'comment'), name='unique_comment_mention')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostHashtag',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_hashtags', to='posts.hashtag')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_hashtags', to='posts.post')),
+            ],
+            options={
+                'verbose_name': 'Post Hashtag',
+                'verbose_name_plural': 'Post Hashtags',
+                'db_table': 'post_hashtags',
+                'indexes': [models.Index(fields=['hashtag', '-created_at', '-id'], name='post_hashtags_feed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hashtag', 'post'), name='unique_post_hashtag')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:16
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_hashtags_mentions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postupload',
+            name='caption',
+            field=models.TextField(blank=True, validators=[django.core.validators.MaxLengthValidator(2200)]),
+        ),
+    ]
@@ -1,22 +1,50 @@
+import uuid
+
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from shared.models import BaseModel
+from shared.storage import get_media_storage
 from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator, MaxLengthValidator
 
 
 User = get_user_model()
+
+
+class PostQuerySet(models.QuerySet):
+    def with_feed_data(self):
+        """
+        Load everything PostSerializer needs from the database so a page
+        renders in one query; me_liked comes from likes.liked_post_ids.
+        """
+        return self.select_related('author')
+
+
 # Create your models here.
 class Post(BaseModel):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
-    image = models.ImageField(upload_to='post_images/', validators=[
+    image = models.ImageField(upload_to='post_images/', storage=get_media_storage, validators=[
         FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png','webp'])
         ])
     caption = models.TextField(validators=[MaxLengthValidator(2200)])
+    # filled in by the generate_post_derivatives task after upload
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_blurhash = models.CharField(max_length=64, blank=True, editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    likes_count = models.IntegerField(default=0, editable=False)
+    comments_count = models.IntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         db_table = 'posts'
         verbose_name = 'Post'
         verbose_name_plural = 'Posts'
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='posts_created_id_idx'),
+        ]
 
     def __str__(self):
         return f'Post by {self.author.username} - {self.caption[:20]}'
@@ -27,15 +55,43 @@ class PostComment(BaseModel):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='post_comments')
     content = models.TextField(validators=[MaxLengthValidator(1000)])
     parent = models.ForeignKey('self', on_delete=models.CASCADE, related_name='child', null=True, blank=True)
+    likes_count = models.IntegerField(default=0, editable=False)
+    replies_count = models.IntegerField(default=0, editable=False)
+    # Materialized path of ancestor ids ("<root hex>/<child hex>/.../<own hex>/"),
+    # so a whole subtree is one indexed prefix scan.
+    path = models.TextField(default='', editable=False, db_index=True)
+    depth = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         db_table = 'post_comments'
         verbose_name = 'Post Comment'
         verbose_name_plural = 'Post Comments'
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_comments_created_id_idx'),
+            models.Index(fields=['post', 'parent', 'created_at', 'id'], name='post_comments_thread_idx'),
+            models.Index(fields=['parent', 'created_at', 'id'], name='post_comments_replies_idx'),
+        ]
 
     def __str__(self):
         return f'Comment by {self.author.username} on Post {self.post.id}'
 
+    def build_path(self):
+        if self.parent_id:
+            return f'{self.parent.path}{self.id.hex}/', self.parent.depth + 1
+        return f'{self.id.hex}/', 0
+
+    def save(self, *args, **kwargs):
+        old_path, old_depth = self.path, self.depth
+        self.path, self.depth = self.build_path()
+        super().save(*args, **kwargs)
+        if old_path and old_path != self.path:
+            # The comment was moved under another parent: rewrite its descendants too.
+            self.previous_path = old_path
+            PostComment.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (self.depth - old_depth),
+            )
+
 
 class PostLike(BaseModel):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
@@ -71,4 +127,93 @@ class CommentLike(BaseModel):
         ]
 
     def __str__(self):
-        return f'Like by {self.author.username} on Comment {self.comment.id}'
\ No newline at end of file
+        return f'Like by {self.author.username} on Comment {self.comment.id}'
+
+
+class UploadStatus(models.TextChoices):
+    Pending = 'pending', 'Pending'
+    Finalized = 'finalized', 'Finalized'
+    Processed = 'processed', 'Processed'
+    Failed = 'failed', 'Failed'
+
+
+class PostUpload(BaseModel):
+    """An image the client uploads straight to object storage before the Post exists."""
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='post_uploads')
+    key = models.CharField(max_length=255, unique=True)
+    content_type = models.CharField(max_length=50)
+    size = models.PositiveBigIntegerField()
+    multipart_id = models.CharField(max_length=255, blank=True)
+    status = models.CharField(choices=UploadStatus.choices, default=UploadStatus.Pending, max_length=20)
+    # kept until ingest creates the post from it
+    caption = models.TextField(blank=True, validators=[MaxLengthValidator(2200)])
+    post = models.OneToOneField(Post, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload')
+
+    class Meta:
+        db_table = 'post_uploads'
+        verbose_name = 'Post Upload'
+        verbose_name_plural = 'Post Uploads'
+
+    def __str__(self):
+        return f'Upload {self.key} by {self.author.username} - {self.status}'
+
+
+class Hashtag(BaseModel):
+    name = models.CharField(max_length=100, unique=True)
+    posts_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        db_table = 'hashtags'
+        verbose_name = 'Hashtag'
+        verbose_name_plural = 'Hashtags'
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class PostHashtag(models.Model):
+    """
+    A hashtag in a post's caption. ``created_at`` is the post's creation
+    time rather than the row's, so a tag feed is one range scan on
+    ``(hashtag, created_at, id)`` that KeysetPagination can walk directly.
+    """
+    id = models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_hashtags')
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='post_hashtags')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'post_hashtags'
+        verbose_name = 'Post Hashtag'
+        verbose_name_plural = 'Post Hashtags'
+        constraints = [
+            models.UniqueConstraint(fields=['hashtag', 'post'], name='unique_post_hashtag'),
+        ]
+        indexes = [
+            models.Index(fields=['hashtag', '-created_at', '-id'], name='post_hashtags_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'#{self.hashtag.name} on Post {self.post_id}'
+
+
+class Mention(BaseModel):
+    """An @username in a post caption (``comment`` is null) or in a comment."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mentions')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='mentions')
+    comment = models.ForeignKey(PostComment, on_delete=models.CASCADE, null=True, blank=True, related_name='mentions')
+
+    class Meta:
+        db_table = 'mentions'
+        verbose_name = 'Mention'
+        verbose_name_plural = 'Mentions'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], condition=models.Q(comment__isnull=True), name='unique_post_mention'),
+            models.UniqueConstraint(fields=['user', 'comment'], condition=models.Q(comment__isnull=False), name='unique_comment_mention'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='mentions_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'@{self.user.username} in Post {self.post_id}'
@@ -0,0 +1,104 @@
+import re
+
+from django.db import connection
+from apps.users.models import User
+from .models import Post, PostComment
+
+
+# Ranked full-text search over captions and comments, and username lookup.
+# Postgres matches a trigger-maintained tsvector column through its GIN index and
+# usernames through a pg_trgm index (migrations posts 0011, users 0006).
+# SQLite uses FTS5 tables that the signals keep current, and a LIKE scan
+# for usernames. Every search returns ``(pk, rank)`` pairs, best first,
+# strictly after the ``after`` position ``(rank, pk)``.
+
+DOCUMENTS = {
+    'posts': (Post, 'posts', 'caption'),
+    'comments': (PostComment, 'post_comments', 'content'),
+}
+
+
+def _db_pk(model, pk):
+    return model._meta.pk.get_db_prep_value(pk, connection)
+
+
+def _page(model, sql, params, after, limit):
+    """Wrap ``sql`` (selecting ``id`` and ``rank``) with keyset ordering on (rank, id)."""
+    query = f"SELECT id, rank FROM ({sql}) ranked"
+    if after is not None:
+        rank, pk = after
+        query += " WHERE rank < %s OR (rank = %s AND id < %s)"
+        params = [*params, rank, rank, _db_pk(model, pk)]
+    query += " ORDER BY rank DESC, id DESC LIMIT %s"
+    with connection.cursor() as cursor:
+        cursor.execute(query, [*params, limit])
+        rows = cursor.fetchall()
+    to_python = model._meta.pk.to_python
+    return [(to_python(pk), float(rank)) for pk, rank in rows]
+
+
+def fts5_query(text):
+    """Quote every word so user input never reaches FTS5 syntax; the last word matches as a prefix."""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+
+
+def search_documents(kind, text, limit, after=None):
+    model, table, _ = DOCUMENTS[kind]
+    if connection.vendor == 'postgresql':
+        sql = (
+            f"SELECT t.id, ts_rank(t.search_vector, q) AS rank "
+            f"FROM {table} t, websearch_to_tsquery('simple', %s) q WHERE t.search_vector @@ q"
+        )
+        return _page(model, sql, [text], after, limit)
+
+    query = fts5_query(text)
+    if not query:
+        return []
+    sql = f"SELECT id, -bm25({table}_fts) AS rank FROM {table}_fts WHERE {table}_fts MATCH %s"
+    return _page(model, sql, [query], after, limit)
+
+
+def _like_escape(text):
+    return re.sub(r'([\\%_])', r'\\\1', text)
+
+
+def search_users(text, limit, after=None):
+    """Usernames starting with ``text`` first, then the most similar ones."""
+    text = text.strip()
+    if not text:
+        return []
+    prefix = _like_escape(text) + '%'
+    if connection.vendor == 'postgresql':
+        sql = (
+            "SELECT id, GREATEST(similarity(username, %s), CASE WHEN username ILIKE %s THEN 1 ELSE 0 END) AS rank "
+            "FROM users_user WHERE username %% %s OR username ILIKE %s"
+        )
+        return _page(User, sql, [text, prefix, text, prefix], after, limit)
+
+    sql = (
+        "SELECT id, CASE WHEN username LIKE %s ESCAPE '\\' THEN 1.0 ELSE 0.5 END AS rank "
+        "FROM users_user WHERE username LIKE %s ESCAPE '\\'"
+    )
+    return _page(User, sql, [prefix, '%' + prefix], after, limit)
+
+
+def index_document(kind, instance):
+    """Refresh one row of the SQLite FTS5 fallback; Postgres maintains its column itself."""
+    if connection.vendor != 'sqlite':
+        return
+    model, table, column = DOCUMENTS[kind]
+    pk = _db_pk(model, instance.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}_fts WHERE id = %s", [pk])
+        cursor.execute(f"INSERT INTO {table}_fts (id, body) VALUES (%s, %s)", [pk, getattr(instance, column)])
+
+
+def remove_document(kind, pk):
+    if connection.vendor != 'sqlite':
+        return
+    model, table, _ = DOCUMENTS[kind]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}_fts WHERE id = %s", [_db_pk(model, pk)])
@@ -1,13 +1,21 @@
 from rest_framework import serializers
-from .models import Post, CommentLike, PostComment, PostLike
+from django.core.validators import MaxLengthValidator
+from django.conf import settings
+from .models import Post, CommentLike, PostComment, PostLike, PostUpload
 from .models import User
+from . import counters, likes, threads
+from shared.images import variant_urls
 
 
 class UserSerializer(serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
+    photo_variants = serializers.SerializerMethodField('get_photo_variants')
     class Meta:
         model = User
-        fields = ['id', 'username', 'photo']
+        fields = ['id', 'username', 'photo', 'photo_blurhash', 'photo_variants']
+
+    def get_photo_variants(self, obj):
+        return variant_urls(obj.photo_variants, self.context.get('request'))
 
 
 
@@ -15,27 +23,32 @@ class PostSerializer(serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
     author = UserSerializer(read_only=True)
     post_likes_count = serializers.SerializerMethodField('get_post_likes_count')
-    post_comments_count = serializers.SerializerMethodField('get_post_comments_count')
+    post_comments_count = serializers.IntegerField(source='comments_count', read_only=True)
     me_liked = serializers.SerializerMethodField('get_me_liked')
+    image_variants = serializers.SerializerMethodField('get_image_variants')
     class Meta:
         model = Post
-        fields = ['id', 'author', 'image', 'caption', 'created_at', 'post_likes_count', 'post_comments_count', 'me_liked']
+        fields = ['id', 'author', 'image', 'image_width', 'image_height', 'image_blurhash', 'image_variants',
+                  'caption', 'created_at', 'post_likes_count', 'post_comments_count', 'me_liked']
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image_variants, self.context.get('request'))
 
     def get_post_likes_count(self, obj):
-        return obj.likes.count()
-    
-    def get_post_comments_count(self, obj):
-        return obj.comments.count()
-    
+        # Views pass the page's buffered write-behind deltas as 'pending_likes'.
+        pending = self.context.get('pending_likes')
+        if pending is None:
+            pending = counters.pending_post_likes([obj.id])
+        return obj.likes_count + pending.get(str(obj.id), 0)
+
+    # Views resolve the whole page against the viewer's liked set up front
+    # and pass it as 'liked_post_ids'.
     def get_me_liked(self, obj):
-        request = self.context.get('request', None)
-        if request and request.user.is_authenticated:
-            try:
-                PostLike.objects.get(post=obj, author=request.user)
-                return True
-            except PostLike.DoesNotExist:
-                return False
-        return False
+        liked = self.context.get('liked_post_ids')
+        if liked is None:
+            request = self.context.get('request', None)
+            liked = likes.liked_post_ids(request.user if request else None, [obj.pk])
+        return obj.pk in liked
     
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -43,22 +56,40 @@ class CommentSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     replies = serializers.SerializerMethodField('get_replies')
     me_liked = serializers.SerializerMethodField('get_me_liked')
-    likes_count = serializers.SerializerMethodField('get_likes_count')
+    likes_count = serializers.IntegerField(read_only=True)
+    replies_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = PostComment
-        fields = ['id', 'post', 'author', 'content', 'parent', 'created_at','replies','likes_count','me_liked']  
+        fields = ['id', 'post', 'author', 'content', 'parent', 'created_at','replies','likes_count','replies_count','me_liked']  
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
-    
+    def validate(self, attrs):
+        post = attrs.get('post', getattr(self.instance, 'post', None))
+        parent = attrs.get('parent')
+        if self.instance is not None and post != self.instance.post:
+            # the replies would stay behind on the old post
+            raise serializers.ValidationError({'post': 'A comment cannot be moved to another post.'})
+        if parent is not None:
+            if post is not None and parent.post_id != post.id:
+                raise serializers.ValidationError({'parent': 'Reply must belong to the same post.'})
+            if self.instance is not None and parent.path.startswith(self.instance.path):
+                raise serializers.ValidationError({'parent': 'A comment cannot reply to itself or its replies.'})
+        return attrs
+
+    # Views load the whole reply tree up front with threads.attach_threads();
+    # a comment serialized on its own loads its subtree in one query here.
     def get_replies(self, obj):
-        if obj.child.exists():
-            serializers = self.__class__(obj.child.all(), many=True, context=self.context)
-            return serializers.data
-        return []
+        replies = getattr(obj, 'thread_replies', None)
+        if replies is None:
+            liked = threads.attach_threads([obj], self.context['request'].user)
+            self.context.setdefault('liked_comment_ids', set()).update(liked)
+            replies = obj.thread_replies
+        return self.__class__(replies, many=True, context=self.context).data
 
     def get_me_liked(self, obj):
+        liked = self.context.get('liked_comment_ids')
+        if liked is not None:
+            return obj.pk in liked
         user = self.context.get('request').user
         if user and user.is_authenticated:
             return obj.likes.filter(author=user).exists()
@@ -78,4 +109,47 @@ class PostLikeSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     class Meta:
         model = PostLike
-        fields = ['id', 'user', 'post', 'created_at']
\ No newline at end of file
+        fields = ['id', 'user', 'post', 'created_at']
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    type = serializers.ChoiceField(choices=['posts', 'comments', 'users'], default='posts')
+
+
+class PostBatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), min_length=1, max_length=settings.POST_BATCH_MAX_SIZE)
+
+
+class PostLikeOperationSerializer(serializers.Serializer):
+    post_id = serializers.UUIDField()
+    action = serializers.ChoiceField(choices=['like', 'unlike'])
+
+
+class PostLikeBatchSerializer(serializers.Serializer):
+    operations = PostLikeOperationSerializer(many=True, allow_empty=False, max_length=settings.POST_BATCH_MAX_SIZE)
+
+
+class PostUploadSerializer(serializers.Serializer):
+    content_type = serializers.CharField(max_length=50)
+    size = serializers.IntegerField(min_value=1)
+
+
+class UploadPartSerializer(serializers.Serializer):
+    part_number = serializers.IntegerField(min_value=1, max_value=10000)
+    etag = serializers.CharField(max_length=255)
+
+
+class PostUploadPartsSerializer(serializers.Serializer):
+    parts = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=10000), required=False)
+
+
+class PostUploadFinalizeSerializer(serializers.Serializer):
+    caption = serializers.CharField(validators=[MaxLengthValidator(2200)], allow_blank=True)
+    parts = UploadPartSerializer(many=True, required=False)
+
+
+class PostUploadStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PostUpload
+        fields = ['id', 'status', 'post', 'created_at', 'updated_at']
@@ -0,0 +1,94 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from shared.storage import release_file
+from . import cache, search, tags, timeline
+from .models import CommentLike, Post, PostComment, PostLike
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    release_file(instance.image)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_author_posts(sender, instance, **kwargs):
+    author_id, post_id = instance.author_id, instance.pk  # Model.delete() clears pk before commit
+    transaction.on_commit(lambda: timeline.remove_author_post(author_id, post_id))
+
+
+# Counter columns change through F() updates that send no signals, so the
+# cached payloads are also dropped when the rows behind a counter change.
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, created=False, **kwargs):
+    cache.invalidate_posts([instance.pk])
+    if created:
+        cache.invalidate_lists(['posts-head'])
+
+
+@receiver(post_save, sender=PostComment)
+@receiver(post_delete, sender=PostComment)
+def invalidate_comment(sender, instance, **kwargs):
+    cache.invalidate_posts([instance.post_id])
+    cache.invalidate_comment_paths([instance.path, getattr(instance, 'previous_path', '')])
+    if kwargs['signal'] is post_save:
+        lists = ['comments-head', f'post-{instance.post_id}-comments']
+        if instance.parent_id:
+            lists.append(f'comment-{instance.parent_id.hex}-replies')
+        cache.invalidate_lists(lists)
+
+
+@receiver(post_save, sender=PostLike)
+@receiver(post_delete, sender=PostLike)
+def invalidate_liked_post(sender, instance, **kwargs):
+    cache.invalidate_posts([instance.post_id])
+
+
+@receiver(post_save, sender=CommentLike)
+@receiver(post_delete, sender=CommentLike)
+def invalidate_liked_comment(sender, instance, **kwargs):
+    if CommentLike.comment.is_cached(instance):
+        cache.invalidate_comment_paths([instance.comment.path])
+    else:
+        cache.invalidate_comments([instance.comment_id])
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'caption' in update_fields:
+        search.index_document('posts', instance)
+
+
+@receiver(post_save, sender=PostComment)
+def index_comment(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'content' in update_fields:
+        search.index_document('comments', instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_document('posts', instance.pk)
+
+
+@receiver(post_delete, sender=PostComment)
+def unindex_comment(sender, instance, **kwargs):
+    search.remove_document('comments', instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def extract_post_tags(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is None or 'caption' in update_fields:
+        tags.sync_post(instance, created)
+
+
+@receiver(post_save, sender=PostComment)
+def extract_comment_mentions(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is None or 'content' in update_fields:
+        tags.sync_comment(instance, created)
+
+
+@receiver(pre_delete, sender=Post)
+def release_post_tags(sender, instance, **kwargs):
+    tags.release_post(instance)
@@ -0,0 +1,123 @@
+import re
+from collections import defaultdict
+
+from django.db.models import F
+from apps.users.models import User
+from . import cache
+from .models import Hashtag, Mention, PostHashtag
+
+
+# Hashtags and @mentions are parsed once per save and stored as rows, so
+# tag feeds and "mentioned in" lookups are index scans instead of caption
+# LIKEs. Only captions contribute hashtags; mentions come from captions and
+# comments.
+HASHTAG_RE = re.compile(r'(?<![\w&#])#(\w+)')
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.+-]+)')
+MAX_HASHTAGS = 30
+MAX_MENTIONS = 20
+
+
+def extract_hashtags(text):
+    """Distinct lowercase tags in order of appearance, at most MAX_HASHTAGS."""
+    tags = dict.fromkeys(tag.lower()[:100] for tag in HASHTAG_RE.findall(text or ''))
+    return list(tags)[:MAX_HASHTAGS]
+
+
+def extract_mentions(text):
+    names = dict.fromkeys(name.rstrip('.') for name in MENTION_RE.findall(text or ''))
+    return [name for name in names if name][:MAX_MENTIONS]
+
+
+def hashtag_ids(names):
+    """Ids of the given tag names, inserting the missing ones in one statement."""
+    if not names:
+        return {}
+    Hashtag.objects.bulk_create([Hashtag(name=name) for name in names], ignore_conflicts=True)
+    return dict(Hashtag.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def change_posts_count(added, removed):
+    if added:
+        Hashtag.objects.filter(pk__in=added).update(posts_count=F('posts_count') + 1)
+    if removed:
+        Hashtag.objects.filter(pk__in=removed).update(posts_count=F('posts_count') - 1)
+
+
+def _mentioned_user_ids(names):
+    return dict(User.objects.filter(username__in=names).values_list('username', 'id')) if names else {}
+
+
+def sync_post(post, created=False):
+    """Bring a post's PostHashtag and caption Mention rows in line with its caption."""
+    names = extract_hashtags(post.caption)
+    mentioned = extract_mentions(post.caption)
+    if created and not names and not mentioned:
+        return
+
+    wanted = set(hashtag_ids(names).values())
+    current = set() if created else set(PostHashtag.objects.filter(post=post).values_list('hashtag_id', flat=True))
+    added, removed = wanted - current, current - wanted
+    if removed:
+        PostHashtag.objects.filter(post=post, hashtag_id__in=removed).delete()
+    if added:
+        PostHashtag.objects.bulk_create(
+            [PostHashtag(post=post, hashtag_id=hashtag_id, created_at=post.created_at) for hashtag_id in added],
+            ignore_conflicts=True,
+        )
+        cache.invalidate_lists([f'tag-{name}-head' for name in names])
+    change_posts_count(added, removed)
+
+    _sync_mentions(Mention.objects.filter(post=post, comment__isnull=True), mentioned, post_id=post.pk, comment_id=None, created=created)
+
+
+def sync_comment(comment, created=False):
+    mentioned = extract_mentions(comment.content)
+    if created and not mentioned:
+        return
+    _sync_mentions(Mention.objects.filter(comment=comment), mentioned, post_id=comment.post_id, comment_id=comment.pk, created=created)
+
+
+def _sync_mentions(existing, names, post_id, comment_id, created):
+    wanted = set(_mentioned_user_ids(names).values())
+    current = set() if created else set(existing.values_list('user_id', flat=True))
+    if current - wanted:
+        existing.filter(user_id__in=current - wanted).delete()
+    Mention.objects.bulk_create(
+        [Mention(user_id=user_id, post_id=post_id, comment_id=comment_id) for user_id in wanted - current],
+        ignore_conflicts=True,
+    )
+
+
+def release_post(post):
+    """Decrement the counters of a post's hashtags; call before its rows are deleted."""
+    Hashtag.objects.filter(post_hashtags__post=post).update(posts_count=F('posts_count') - 1)
+
+
+def index_posts(posts):
+    """
+    Backfill for a chunk of posts: add every missing PostHashtag and caption
+    Mention row with one bulk insert each. Counters are left to the caller.
+    """
+    tags_by_post = {post: extract_hashtags(post.caption) for post in posts}
+    ids = hashtag_ids(list({name for names in tags_by_post.values() for name in names}))
+    PostHashtag.objects.bulk_create([
+        PostHashtag(post=post, hashtag_id=ids[name], created_at=post.created_at)
+        for post, names in tags_by_post.items() for name in names
+    ], ignore_conflicts=True)
+    _index_mentions([(post.pk, None, post.caption) for post in posts])
+
+
+def index_comments(comments):
+    _index_mentions([(comment.post_id, comment.pk, comment.content) for comment in comments])
+
+
+def _index_mentions(rows):
+    names = defaultdict(list)
+    for post_id, comment_id, text in rows:
+        for name in extract_mentions(text):
+            names[name].append((post_id, comment_id))
+    users = _mentioned_user_ids(list(names))
+    Mention.objects.bulk_create([
+        Mention(user_id=users[name], post_id=post_id, comment_id=comment_id)
+        for name, places in names.items() if name in users for post_id, comment_id in places
+    ], ignore_conflicts=True)
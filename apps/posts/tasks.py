@@ -0,0 +1,130 @@
+from botocore.exceptions import ClientError
+from celery import shared_task
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from shared.images import build_derivatives
+from .models import Post, PostComment, PostLike, CommentLike, Hashtag, PostHashtag
+from .counters import dirty_posts, flush_pending_post_likes
+from . import cache, timeline, uploads
+
+
+def _count(model, fk):
+    rows = model.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows), 0)
+
+
+def _reconcile(model, expected, batch_size, invalidate=None, held=None):
+    """
+    Walk ``model`` in primary-key order, ``batch_size`` rows at a time, and
+    rewrite every counter column whose stored value differs from the real
+    row count. ``expected`` maps a counter column to its count expression;
+    ``invalidate``, if given, drops the cached payloads of the repaired rows.
+    ``held``, if given, takes a batch's primary keys and returns
+    ``{column: keys}`` of counters to leave alone because a change to them
+    is still buffered elsewhere.
+    """
+    repaired = 0
+    last_pk = None
+    while True:
+        batch = model.objects.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = batch.annotate(**{f'actual_{field}': expr for field, expr in expected.items()})
+        rows = list(batch.values('pk', *[f'actual_{field}' for field in expected], *expected)[:batch_size])
+        if not rows:
+            return repaired
+        last_pk = rows[-1]['pk']
+
+        skip = held([row['pk'] for row in rows]) if held is not None else {}
+        drifted = {}
+        for row in rows:
+            fields = tuple(
+                field for field in expected
+                if str(row['pk']) not in skip.get(field, ()) and row[field] != row[f'actual_{field}']
+            )
+            if fields:
+                drifted.setdefault(fields, []).append(row['pk'])
+        for fields, pks in drifted.items():
+            # Recount inside the UPDATE itself so a like that lands between the
+            # check above and this write is not lost.
+            repaired += model.objects.filter(pk__in=pks).update(**{field: expected[field] for field in fields})
+            if invalidate is not None:
+                invalidate(pks)
+
+
+def _buffered_likes(post_ids):
+    # the stored count of a dirty post lags by its buffered delta, which the next flush adds
+    return {'likes_count': dirty_posts(post_ids)}
+
+
+@shared_task
+def reconcile_counters(batch_size=500):
+    repaired = _reconcile(Post, {
+        'likes_count': _count(PostLike, 'post'),
+        'comments_count': _count(PostComment, 'post'),
+    }, batch_size, cache.invalidate_posts, _buffered_likes)
+    repaired += _reconcile(PostComment, {
+        'likes_count': _count(CommentLike, 'comment'),
+        'replies_count': _count(PostComment, 'parent'),
+    }, batch_size, cache.invalidate_comments)
+    repaired += _reconcile(Hashtag, {
+        'posts_count': _count(PostHashtag, 'hashtag'),
+    }, batch_size)
+    return repaired
+
+
+@shared_task
+def flush_post_likes(batch_size=1000):
+    flushed = 0
+    while True:
+        taken = flush_pending_post_likes(batch_size)
+        if not taken:
+            return flushed
+        flushed += taken
+
+
+
+@shared_task
+def fan_out_post(post_id):
+    post = Post.objects.filter(id=post_id).select_related('author').only('id', 'created_at', 'author__followers_count').first()
+    if post is not None:
+        timeline.fan_out(post)
+
+
+@shared_task
+def add_author_to_timeline(user_id, author_id):
+    timeline.add_author(user_id, author_id)
+
+
+@shared_task
+def remove_author_from_timeline(user_id, author_id):
+    timeline.remove_author(user_id, author_id)
+
+
+@shared_task
+def generate_post_derivatives(post_id):
+    post = Post.objects.filter(id=post_id).only('id', 'image').first()
+    if post is None or not post.image:
+        return False
+    result = build_derivatives(post.image)
+    Post.objects.filter(id=post_id, image=post.image.name).update(
+        image_width=result['width'],
+        image_height=result['height'],
+        image_blurhash=result['blurhash'],
+        image_variants=result['variants'],
+    )
+    cache.invalidate_posts([post_id])
+    return True
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=10)
+def ingest_post_upload(self, upload_id):
+    try:
+        post = uploads.ingest(upload_id)
+    except ClientError as exc:
+        raise self.retry(exc=exc)
+    if post is None:
+        return False
+    fan_out_post.delay(str(post.id))
+    generate_post_derivatives.delay(str(post.id))
+    return True
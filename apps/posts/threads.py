@@ -0,0 +1,97 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from .models import PostComment
+from .likes import liked_comment_ids
+
+
+def _assemble(roots, rows, max_depth, replies_per_level):
+    """Hang ``rows`` under ``roots`` in memory; returns every attached comment by id."""
+    # Grouped by parent rather than walked in creation order: a comment moved
+    # under a newer one is older than its parent.
+    children = defaultdict(list)
+    for reply in rows:
+        children[reply.parent_id].append(reply)
+    nodes = {comment.pk: comment for comment in roots}
+    limits = {comment.pk: comment.depth + max_depth for comment in roots}
+    pending = list(roots)
+    for comment in roots:
+        comment.thread_replies = []
+    while pending:
+        parent = pending.pop()
+        for reply in children.get(parent.pk, ()):
+            if reply.depth > limits[parent.pk] or len(parent.thread_replies) >= replies_per_level:
+                break
+            node = nodes.setdefault(reply.pk, reply)
+            if node is reply:
+                reply.thread_replies = []
+                limits[reply.pk] = limits[parent.pk]
+                pending.append(reply)
+            parent.thread_replies.append(node)
+    return nodes
+
+
+def _limits(max_depth, replies_per_level):
+    max_depth = settings.COMMENT_THREAD_MAX_DEPTH if max_depth is None else max_depth
+    replies_per_level = settings.COMMENT_THREAD_REPLIES_PER_LEVEL if replies_per_level is None else replies_per_level
+    return max_depth, replies_per_level
+
+
+def attach_threads(comments, user=None, max_depth=None, replies_per_level=None):
+    """
+    Load the reply trees under ``comments`` with one prefix query on
+    ``PostComment.path`` and assemble them in memory. Every comment in the
+    result gets a ``thread_replies`` list, cut at ``max_depth`` levels below
+    its root and ``replies_per_level`` children per node (``replies_count``
+    still reports the full number). Returns the set of ids the user liked,
+    for CommentSerializer's ``liked_comment_ids`` context.
+    """
+    max_depth, replies_per_level = _limits(max_depth, replies_per_level)
+    comments = list(comments)
+    if not comments:
+        return set()
+
+    rows = []
+    if max_depth > 0:
+        deepest = max(comment.depth for comment in comments) + max_depth
+        rows = (
+            PostComment.objects
+            .filter(reduce(or_, (Q(path__startswith=comment.path) for comment in comments)), depth__lte=deepest)
+            .select_related('author')
+            .order_by('created_at', 'id')
+        )
+    nodes = _assemble(comments, rows, max_depth, replies_per_level)
+    return liked_comment_ids(user, list(nodes))
+
+
+def attach_reply_previews(comments, user=None, limit=None):
+    """
+    Give each of ``comments`` its first ``limit`` direct replies as
+    ``thread_replies`` (one windowed query for the whole page). Previewed
+    replies get no nested replies of their own; clients expand them through
+    the replies endpoint. Returns the ids the user liked.
+    """
+    limit = settings.COMMENT_REPLY_PREVIEW if limit is None else limit
+    comments = list(comments)
+    nodes = {comment.pk: comment for comment in comments}
+    for comment in comments:
+        comment.thread_replies = []
+    with_replies = [comment.pk for comment in comments if comment.replies_count]
+    if limit > 0 and with_replies:
+        previews = (
+            PostComment.objects
+            .filter(parent_id__in=with_replies)
+            .select_related('author')
+            .annotate(position=Window(RowNumber(), partition_by=F('parent_id'), order_by=[F('created_at').asc(), F('id').asc()]))
+            .filter(position__lte=limit)
+            .order_by('created_at', 'id')
+        )
+        for reply in previews:
+            reply.thread_replies = []
+            nodes[reply.parent_id].thread_replies.append(reply)
+            nodes[reply.pk] = reply
+    return liked_comment_ids(user, list(nodes))
@@ -0,0 +1,209 @@
+import heapq
+
+from django.conf import settings
+from apps.users.models import Follow, User
+from shared.redis_client import get_redis
+from .models import Post
+
+
+# Every user's home timeline is a Redis sorted set of post ids scored by the
+# post's creation time. The "built" marker tells an empty or partial set
+# (e.g. after a Redis restart) apart from one rebuilt from the database.
+TIMELINE_KEY = 'timeline:{user_id}'
+TIMELINE_BUILT_KEY = 'timeline:{user_id}:built'
+
+# Authors with at least FANOUT_FOLLOWER_THRESHOLD followers are not fanned
+# out. Their recent posts live in one sorted set per author instead and are
+# merged into each follower's timeline when it is read. If an author drops
+# back under the threshold, posts that only reached their list show up in
+# followers' timelines after the next rebuild.
+AUTHOR_POSTS_KEY = 'author_posts:{author_id}'
+AUTHOR_POSTS_BUILT_KEY = 'author_posts:{author_id}:built'
+
+
+def is_celebrity(followers_count):
+    return followers_count >= settings.FANOUT_FOLLOWER_THRESHOLD
+
+
+def post_score(post):
+    return post.created_at.timestamp()
+
+
+def push_to_timelines(user_ids, post_id, score):
+    """Add one post to many timelines in one pipeline, trimming each to TIMELINE_LENGTH."""
+    pipe = get_redis().pipeline(transaction=False)
+    for user_id in user_ids:
+        key = TIMELINE_KEY.format(user_id=user_id)
+        pipe.zadd(key, {str(post_id): score})
+        pipe.zremrangebyrank(key, 0, -settings.TIMELINE_LENGTH - 1)
+    pipe.execute()
+
+
+def remove_from_timeline(user_id, post_ids):
+    if post_ids:
+        get_redis().zrem(TIMELINE_KEY.format(user_id=user_id), *[str(post_id) for post_id in post_ids])
+
+
+def recent_author_posts(author_id):
+    return Post.objects.filter(author_id=author_id).order_by('-created_at').values_list('id', 'created_at')[:settings.TIMELINE_LENGTH]
+
+
+def add_author(user_id, author_id):
+    """Merge a newly followed author's recent posts into the user's timeline."""
+    if is_celebrity(User.objects.filter(pk=author_id).values_list('followers_count', flat=True).first() or 0):
+        return
+    entries = {str(post_id): created_at.timestamp() for post_id, created_at in recent_author_posts(author_id)}
+    if entries:
+        key = TIMELINE_KEY.format(user_id=user_id)
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.zadd(key, entries)
+        pipe.zremrangebyrank(key, 0, -settings.TIMELINE_LENGTH - 1)
+        pipe.execute()
+
+
+def remove_author(user_id, author_id):
+    remove_from_timeline(user_id, [post_id for post_id, _ in recent_author_posts(author_id)])
+
+
+def follower_ids(author_id):
+    return Follow.objects.filter(following_id=author_id).values_list('follower_id', flat=True)
+
+
+def push_author_post(author_id, post_id, score):
+    key = AUTHOR_POSTS_KEY.format(author_id=author_id)
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.zadd(key, {str(post_id): score})
+    pipe.zremrangebyrank(key, 0, -settings.AUTHOR_RECENT_POSTS - 1)
+    pipe.execute()
+
+
+def remove_author_post(author_id, post_id):
+    """Drop a deleted post from its author's recent posts, which every follower merges in."""
+    get_redis().zrem(AUTHOR_POSTS_KEY.format(author_id=author_id), str(post_id))
+
+
+def fan_out(post):
+    """
+    Push a new post into its author's and all followers' timelines, in
+    batches. Posts of high-follower authors only go to the author's recent
+    posts list and are merged in at read time.
+    """
+    score = post_score(post)
+    push_to_timelines([post.author_id], post.id, score)
+    if is_celebrity(post.author.followers_count):
+        push_author_post(post.author_id, post.id, score)
+        return
+    batch = []
+    for user_id in follower_ids(post.author_id).iterator(chunk_size=settings.FANOUT_BATCH_SIZE):
+        batch.append(user_id)
+        if len(batch) == settings.FANOUT_BATCH_SIZE:
+            push_to_timelines(batch, post.id, score)
+            batch = []
+    if batch:
+        push_to_timelines(batch, post.id, score)
+
+
+def followed_celebrity_ids(user_id):
+    return list(
+        Follow.objects
+        .filter(follower_id=user_id, following__followers_count__gte=settings.FANOUT_FOLLOWER_THRESHOLD)
+        .values_list('following_id', flat=True)
+    )
+
+
+def timeline_posts_query(user_id):
+    followed = Follow.objects.filter(
+        follower_id=user_id, following__followers_count__lt=settings.FANOUT_FOLLOWER_THRESHOLD,
+    ).values('following_id')
+    return Post.objects.filter(author_id__in=followed) | Post.objects.filter(author_id=user_id)
+
+
+def rebuild_timeline(user_id):
+    """Recompute a user's timeline from the database and swap it in atomically."""
+    posts = timeline_posts_query(user_id).order_by('-created_at').values_list('id', 'created_at')[:settings.TIMELINE_LENGTH]
+    entries = {str(post_id): created_at.timestamp() for post_id, created_at in posts}
+    _replace_zset(TIMELINE_KEY.format(user_id=user_id), TIMELINE_BUILT_KEY.format(user_id=user_id), entries)
+    return len(entries)
+
+
+def rebuild_author_posts(author_id):
+    posts = Post.objects.filter(author_id=author_id).order_by('-created_at').values_list('id', 'created_at')[:settings.AUTHOR_RECENT_POSTS]
+    entries = {str(post_id): created_at.timestamp() for post_id, created_at in posts}
+    _replace_zset(AUTHOR_POSTS_KEY.format(author_id=author_id), AUTHOR_POSTS_BUILT_KEY.format(author_id=author_id), entries)
+
+
+def _replace_zset(key, built_key, entries):
+    pipe = get_redis().pipeline(transaction=True)
+    if entries:
+        pipe.zadd(f'{key}:rebuild', entries)
+        pipe.rename(f'{key}:rebuild', key)
+    else:
+        pipe.delete(key)
+    pipe.set(built_key, 1)
+    pipe.execute()
+
+
+def zset_page(key, count, before=None):
+    """
+    Up to ``count`` ``(member, score)`` pairs of a sorted set, newest first,
+    strictly after the ``before`` position ``(score, member)``.
+    """
+    client = get_redis()
+    if before is None:
+        return client.zrevrange(key, 0, count - 1, withscores=True)
+
+    score, post_id = before
+    entries = []
+    offset = 0
+    # Posts sharing the cursor's score come back in reverse member order;
+    # skip the ones the previous page already returned.
+    while len(entries) < count:
+        chunk = client.zrevrangebyscore(key, score, '-inf', start=offset, num=count + 1, withscores=True)
+        if not chunk:
+            break
+        offset += len(chunk)
+        entries += [(member, value) for member, value in chunk if value < score or member < post_id]
+    return entries[:count]
+
+
+def merge_pages(pages, count):
+    """k-way heap merge of newest-first pages, dropping posts seen in more than one."""
+    merged = []
+    seen = set()
+    for member, score in heapq.merge(*pages, key=lambda entry: (entry[1], entry[0]), reverse=True):
+        if member in seen:
+            continue
+        seen.add(member)
+        merged.append((member, score))
+        if len(merged) == count:
+            break
+    return merged
+
+
+def read_merged(user_id, author_ids, count, before=None):
+    """One page of the user's own timeline merged with the given authors' recent posts."""
+    pages = [zset_page(TIMELINE_KEY.format(user_id=user_id), count, before)]
+    pages += [zset_page(AUTHOR_POSTS_KEY.format(author_id=author_id), count, before) for author_id in author_ids]
+    return merge_pages(pages, count)
+
+
+def read_timeline(user_id, count, before=None):
+    """
+    Up to ``count`` ``(post_id, score)`` pairs, newest first, strictly after
+    the ``before`` position ``(score, post_id)``. Fanned-out posts and the
+    followed high-follower authors' posts are merged into one page. Any
+    sorted set that was never built or was lost is rebuilt from the
+    database first.
+    """
+    client = get_redis()
+    if not client.exists(TIMELINE_BUILT_KEY.format(user_id=user_id)):
+        rebuild_timeline(user_id)
+    author_ids = followed_celebrity_ids(user_id)
+    if author_ids:
+        pipe = client.pipeline(transaction=False)
+        for author_id in author_ids:
+            pipe.exists(AUTHOR_POSTS_BUILT_KEY.format(author_id=author_id))
+        for author_id, built in zip(author_ids, pipe.execute()):
+            if not built:
+                rebuild_author_posts(author_id)
+    return read_merged(user_id, author_ids, count, before)
@@ -0,0 +1,163 @@
+import math
+import posixpath
+import uuid
+from io import BytesIO
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from shared.object_storage import get_s3_client
+from .models import Post, PostUpload, UploadStatus
+
+
+# Direct uploads: the client asks for a presigned URL, PUTs/POSTs the bytes
+# straight to the bucket and then calls finalize. Django only ever handles
+# small JSON requests; the image is pulled into media storage by a worker.
+
+ALLOWED_CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+}
+PILLOW_FORMATS = {'JPEG', 'PNG', 'WEBP'}
+
+
+def start_upload(user, content_type, size):
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise ValidationError({'content_type': 'Only JPEG, PNG and WebP images are allowed.'})
+    if not 0 < size <= settings.DIRECT_UPLOAD_MAX_SIZE:
+        raise ValidationError({'size': f'Size must be between 1 and {settings.DIRECT_UPLOAD_MAX_SIZE} bytes.'})
+
+    key = f'{settings.DIRECT_UPLOAD_PREFIX}{user.pk}/{uuid.uuid4().hex}.{ALLOWED_CONTENT_TYPES[content_type]}'
+    client = get_s3_client()
+    multipart_id = ''
+    if size > settings.DIRECT_UPLOAD_PART_SIZE:
+        multipart_id = client.create_multipart_upload(
+            Bucket=settings.DIRECT_UPLOAD_BUCKET, Key=key, ContentType=content_type,
+        )['UploadId']
+    upload = PostUpload.objects.create(author=user, key=key, content_type=content_type, size=size, multipart_id=multipart_id)
+    return upload, upload_instructions(upload)
+
+
+def upload_instructions(upload, part_numbers=None):
+    """What the client needs to send the bytes: a presigned POST, or presigned part URLs."""
+    client = get_s3_client()
+    expires = settings.DIRECT_UPLOAD_EXPIRES
+    if not upload.multipart_id:
+        post = client.generate_presigned_post(
+            Bucket=settings.DIRECT_UPLOAD_BUCKET,
+            Key=upload.key,
+            Fields={'Content-Type': upload.content_type},
+            Conditions=[{'Content-Type': upload.content_type}, ['content-length-range', 1, upload.size]],
+            ExpiresIn=expires,
+        )
+        return {'id': upload.id, 'method': 'POST', 'url': post['url'], 'fields': post['fields'], 'expires_in': expires}
+
+    total_parts = math.ceil(upload.size / settings.DIRECT_UPLOAD_PART_SIZE)
+    part_numbers = part_numbers or range(1, total_parts + 1)
+    urls = {}
+    for number in part_numbers:
+        if not 1 <= number <= total_parts:
+            raise ValidationError({'parts': f'Part numbers must be between 1 and {total_parts}.'})
+        urls[number] = client.generate_presigned_url('upload_part', Params={
+            'Bucket': settings.DIRECT_UPLOAD_BUCKET,
+            'Key': upload.key,
+            'UploadId': upload.multipart_id,
+            'PartNumber': number,
+        }, ExpiresIn=expires)
+    return {
+        'id': upload.id,
+        'method': 'PUT',
+        'part_size': settings.DIRECT_UPLOAD_PART_SIZE,
+        'total_parts': total_parts,
+        'parts': urls,
+        'uploaded_parts': uploaded_parts(upload),
+        'expires_in': expires,
+    }
+
+
+def uploaded_parts(upload):
+    """Parts already stored for a multipart upload, so an interrupted client can resume."""
+    response = get_s3_client().list_parts(Bucket=settings.DIRECT_UPLOAD_BUCKET, Key=upload.key, UploadId=upload.multipart_id)
+    return [{'part_number': part['PartNumber'], 'etag': part['ETag']} for part in response.get('Parts', [])]
+
+
+def finalize_upload(upload, caption, parts=None):
+    """
+    Complete the upload and check what actually landed in the bucket. The
+    post is created by ingest() once the image is in media storage, so no
+    timeline ever shows it before then.
+    """
+    client = get_s3_client()
+    bucket = settings.DIRECT_UPLOAD_BUCKET
+    # the conditional UPDATE lets only one of several concurrent finalize calls through
+    claimed = PostUpload.objects.filter(pk=upload.pk, status=UploadStatus.Pending).update(
+        status=UploadStatus.Finalized, caption=caption, updated_at=timezone.now(),
+    )
+    if not claimed:
+        raise ValidationError({'detail': 'Upload was already finalized.'})
+    try:
+        if upload.multipart_id:
+            parts = parts or uploaded_parts(upload)
+            client.complete_multipart_upload(
+                Bucket=bucket, Key=upload.key, UploadId=upload.multipart_id,
+                MultipartUpload={'Parts': [{'PartNumber': part['part_number'], 'ETag': part['etag']} for part in sorted(parts, key=lambda part: part['part_number'])]},
+            )
+        head = client.head_object(Bucket=bucket, Key=upload.key)
+    except ClientError:
+        # the client may upload the rest and finalize again
+        PostUpload.objects.filter(pk=upload.pk, status=UploadStatus.Finalized).update(status=UploadStatus.Pending, updated_at=timezone.now())
+        raise ValidationError({'detail': 'The file has not been uploaded yet.'})
+
+    if head['ContentLength'] > upload.size or head['ContentLength'] > settings.DIRECT_UPLOAD_MAX_SIZE:
+        client.delete_object(Bucket=bucket, Key=upload.key)
+        PostUpload.objects.filter(pk=upload.pk, status=UploadStatus.Finalized).update(status=UploadStatus.Failed, updated_at=timezone.now())
+        raise ValidationError({'detail': 'Uploaded file is larger than announced.'})
+
+    upload.refresh_from_db(fields=['status', 'caption', 'updated_at'])
+    return upload
+
+
+def ingest(upload_id):
+    """
+    Pull a finalized upload into media storage: validate it with Pillow,
+    save it as the image of a new post and drop the staging object. Returns
+    the post, or None for an invalid file or an upload that was already
+    ingested.
+    """
+    upload = PostUpload.objects.filter(id=upload_id, status=UploadStatus.Finalized).first()
+    if upload is None:
+        return None
+    client = get_s3_client()
+    bucket = settings.DIRECT_UPLOAD_BUCKET
+    data = client.get_object(Bucket=bucket, Key=upload.key)['Body'].read()
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image_format = image.format
+            image.verify()
+        if image_format not in PILLOW_FORMATS:
+            raise ValueError(image_format)
+    except Exception:
+        PostUpload.objects.filter(pk=upload.pk, status=UploadStatus.Finalized).update(
+            status=UploadStatus.Failed, updated_at=timezone.now(),
+        )
+        client.delete_object(Bucket=bucket, Key=upload.key)
+        return None
+
+    with transaction.atomic():
+        # a retried or duplicated task finds the row already processed
+        upload = PostUpload.objects.select_for_update().filter(pk=upload.pk, status=UploadStatus.Finalized).first()
+        if upload is None:
+            return None
+        post = Post(author_id=upload.author_id, caption=upload.caption)
+        post.image.save(posixpath.basename(upload.key), ContentFile(data), save=False)
+        post.save()
+        upload.post = post
+        upload.status = UploadStatus.Processed
+        upload.save(update_fields=['post', 'status', 'updated_at'])
+    client.delete_object(Bucket=bucket, Key=upload.key)
+    return post
@@ -1,14 +1,30 @@
 from django.urls import path
-from .views import PostListView, PostCreateView, PostRetrieveUpdateDeleteView, CommentListView, CommentCreateView, CommentRetrieveUpdateDeleteView,PostLikeToggleView, CommentLikeToggleView
+from .views import PostListView, PostCreateView, PostRetrieveUpdateDeleteView, CommentListView, CommentCreateView, CommentRetrieveUpdateDeleteView,PostLikeToggleView, CommentLikeToggleView, \
+    PostCommentListView, CommentReplyListView, HomeTimelineView, PostUploadCreateView, PostUploadPartsView, \
+    PostUploadFinalizeView, SearchView, PostTagFeedView, PostBatchView, PostLikeBatchView, \
+    PostLikeView, CommentLikeView, PostUploadDetailView
 
 
 urlpatterns = [
     path('', PostListView.as_view(), name='post-list'),
     path('create/', PostCreateView.as_view(), name='post-create'),
+    path('timeline/', HomeTimelineView.as_view(), name='home-timeline'),
+    path('batch/', PostBatchView.as_view(), name='post-batch'),
+    path('likes/batch/', PostLikeBatchView.as_view(), name='post-like-batch'),
+    path('search/', SearchView.as_view(), name='post-search'),
+    path('tags/<str:tag>/', PostTagFeedView.as_view(), name='post-tag-feed'),
+    path('uploads/', PostUploadCreateView.as_view(), name='post-upload-create'),
+    path('uploads/<uuid:id>/', PostUploadDetailView.as_view(), name='post-upload-detail'),
+    path('uploads/<uuid:id>/parts/', PostUploadPartsView.as_view(), name='post-upload-parts'),
+    path('uploads/<uuid:id>/finalize/', PostUploadFinalizeView.as_view(), name='post-upload-finalize'),
     path('<uuid:id>/', PostRetrieveUpdateDeleteView.as_view(), name='post-detail'),
+    path('<uuid:post_id>/comments/', PostCommentListView.as_view(), name='post-comment-list'),
     path('comments/', CommentListView.as_view(), name='comment-list'),
     path('comments/create/', CommentCreateView.as_view(), name='comment-create'),
     path('comments/<uuid:id>/', CommentRetrieveUpdateDeleteView.as_view(), name='comment-detail'),
+    path('comments/<uuid:comment_id>/replies/', CommentReplyListView.as_view(), name='comment-replies'),
+    path('<uuid:post_id>/like/', PostLikeView.as_view(), name='post-like'),
+    path('comments/<uuid:comment_id>/like/', CommentLikeView.as_view(), name='comment-like'),
     path('<uuid:post_id>/like-toggle/', PostLikeToggleView.as_view(), name='post-like-toggle'),
     path('comments/<uuid:comment_id>/like-toggle/', CommentLikeToggleView.as_view(), name='comment-like-toggle'),  
 ]
@@ -1,29 +1,136 @@
-from .models import Post, PostComment, PostLike, CommentLike
-from .serializers import PostSerializer, CommentSerializer
+import hashlib
+import uuid
+
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from .models import Post, PostComment, PostUpload, UploadStatus, User, Hashtag, PostHashtag
+from .serializers import PostSerializer, CommentSerializer, PostUploadSerializer, PostUploadPartsSerializer, \
+    PostUploadFinalizeSerializer, PostUploadStatusSerializer, SearchQuerySerializer, UserSerializer, PostBatchSerializer, \
+    PostLikeBatchSerializer
+from . import cache, counters, likes, search, threads, timeline, uploads
+from .tasks import fan_out_post, generate_post_derivatives, ingest_post_upload
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly, IsAuthenticated
-from shared.custom_pagination import CustomPagination
+from shared.custom_pagination import KeysetPaginationMixin, OldestFirstKeysetPagination, KeysetPagination, \
+    encode_cursor, decode_cursor
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
 
 from drf_spectacular.utils import extend_schema, OpenApiExample
+from shared.page_cache import AnonymousPageCacheMixin
+from shared.storage import release_file
+
+
+def post_context(request, posts):
+    """Serializer context for a page of posts with per-page lookups done up front."""
+    post_ids = [post.id for post in posts]
+    return {
+        'request': request,
+        'pending_likes': counters.pending_post_likes(post_ids),
+        'liked_post_ids': likes.liked_post_ids(request.user, post_ids),
+    }
+
+
+def comment_context(request, comments):
+    """Serializer context for comments whose reply trees are loaded in one query."""
+    return {
+        'request': request,
+        'liked_comment_ids': threads.attach_threads(comments, request.user),
+    }
+
+
+def conditional_response(request, data, entry, *viewer_state):
+    """
+    Response for a cached detail ``entry`` whose ``data`` got the per-viewer
+    fields merged in. The strong ETag is the cached payload's hash plus
+    ``viewer_state``; a matching If-None-Match returns 304. Last-Modified is
+    the row's updated_at, which counter updates don't touch, so it is not
+    used to answer If-Modified-Since.
+    """
+    response = Response(data, status=status.HTTP_200_OK)
+    etag = entry['etag']
+    if viewer_state:
+        etag = f"{etag}-{hashlib.sha1(':'.join(map(str, viewer_state)).encode()).hexdigest()[:16]}"
+    response.headers['ETag'] = quote_etag(etag)
+    response.headers['Last-Modified'] = http_date(entry['modified'])
+    patch_vary_headers(response, ['Authorization'])
+    return get_conditional_response(request, etag=quote_etag(etag), response=response)
+
 
+def tag_page(response, item_keys, list_key, newest_first):
+    """
+    Set the surrogate keys of a list page for the anonymous page cache: one
+    per object shown (a comment key also covers its reply previews), plus
+    ``list_key`` on the pages new rows land on. That is the first page of
+    newest-first lists, the last page of oldest-first ones, and any page with
+    a count (including every ``?page=N`` page).
+    """
+    data = response.data
+    grows = 'count' in data or (data['previous'] if newest_first else data['next']) is None
+    response.surrogate_keys = item_keys + ([list_key] if grows else [])
+    return response
 
-class PostListView(APIView):
+
+def _comment_tree(data):
+    yield data
+    for reply in data['replies']:
+        yield from _comment_tree(reply)
+
+
+class PostListView(AnonymousPageCacheMixin, KeysetPaginationMixin, APIView):
     permission_classes = [AllowAny]
-    pagination_class = CustomPagination
+    stateless_auth = True
     
     def get(self, request):
-        posts = Post.objects.all().order_by('-created_at')
-        paginator = self.pagination_class()
+        posts = Post.objects.with_feed_data().order_by('-created_at', '-id')
+        paginator = self.get_paginator(request)
         page = paginator.paginate_queryset(posts, request)
         if page is not None:
-            serializer = PostSerializer(page, many=True, context={'request': request})
-            return paginator.get_paginated_response(serializer.data)
-        serializer = PostSerializer(posts, many=True, context={'request': request})
+            serializer = PostSerializer(page, many=True, context=post_context(request, page))
+            response = paginator.get_paginated_response(serializer.data)
+            return tag_page(response, [f'post-{post.pk}' for post in page], 'posts-head', newest_first=True)
+        serializer = PostSerializer(posts, many=True, context=post_context(request, posts))
         return Response(serializer.data, status=status.HTTP_200_OK)
     
 
+class HomeTimelineView(APIView):
+    """Posts of followed authors, read from the user's precomputed Redis timeline."""
+    permission_classes = [IsAuthenticated]
+    stateless_auth = True
+    cursor_query_param = 'cursor'
+
+    def get(self, request):
+        page_size = KeysetPagination().get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        before = None
+        if cursor:
+            position = decode_cursor(cursor)
+            try:
+                # members are canonical uuid strings, compared as such in zset_page
+                before = (float(position['s']), str(uuid.UUID(position['i'])))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                raise NotFound('Invalid cursor.')
+
+        entries = timeline.read_timeline(request.user.pk, page_size + 1, before)
+        has_more = len(entries) > page_size
+        entries = entries[:page_size]
+        post_ids = [post_id for post_id, _ in entries]
+        posts = {str(pk): post for pk, post in Post.objects.with_feed_data().in_bulk(post_ids).items()}
+        page = [posts[post_id] for post_id in post_ids if post_id in posts]
+        # deleted posts are dropped from the timeline as they are noticed
+        timeline.remove_from_timeline(request.user.pk, [post_id for post_id in post_ids if post_id not in posts])
+
+        next_link = None
+        if has_more and entries:
+            post_id, score = entries[-1]
+            next_link = replace_query_param(request.build_absolute_uri(), self.cursor_query_param, encode_cursor({'s': score, 'i': post_id}))
+        serializer = PostSerializer(page, many=True, context=post_context(request, page))
+        return Response({'next': next_link, 'results': serializer.data}, status=status.HTTP_200_OK)
+
+
 class PostCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -62,21 +169,95 @@ class PostCreateView(APIView):
     def post(self, request):
         serializer = PostSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save(author=request.user)
+            post = serializer.save(author=request.user)
+            transaction.on_commit(lambda: fan_out_post.delay(str(post.id)))
+            transaction.on_commit(lambda: generate_post_derivatives.delay(str(post.id)))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
+class PostUploadCreateView(APIView):
+    """Step 1 of a direct upload: returns a presigned, size-limited URL (or part URLs) for the bucket."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = PostUploadSerializer(data=request.data)
+        if serializer.is_valid():
+            _, instructions = uploads.start_upload(request.user, **serializer.validated_data)
+            return Response(instructions, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class PostUploadPartsView(APIView):
+    """Fresh part URLs plus the parts already stored, for resuming a multipart upload."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, id):
+        try:
+            upload = PostUpload.objects.get(id=id, author=request.user, status=UploadStatus.Pending)
+        except PostUpload.DoesNotExist:
+            return Response({'detail': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if not upload.multipart_id:
+            return Response({'detail': 'Upload is not a multipart upload.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = PostUploadPartsSerializer(data=request.data)
+        if serializer.is_valid():
+            instructions = uploads.upload_instructions(upload, serializer.validated_data.get('parts'))
+            return Response(instructions, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class PostUploadFinalizeView(APIView):
+    """
+    Step 2 of a direct upload: queues validation, which creates the Post.
+    Poll the upload until its status is "processed" to get the post id.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, id):
+        try:
+            upload = PostUpload.objects.get(id=id, author=request.user)
+        except PostUpload.DoesNotExist:
+            return Response({'detail': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = PostUploadFinalizeSerializer(data=request.data)
+        if serializer.is_valid():
+            upload = uploads.finalize_upload(upload, serializer.validated_data['caption'], serializer.validated_data.get('parts'))
+            transaction.on_commit(lambda: ingest_post_upload.delay(str(upload.id)))
+            return Response(PostUploadStatusSerializer(upload).data, status=status.HTTP_202_ACCEPTED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class PostUploadDetailView(APIView):
+    """Status of a direct upload, with the post id once it is processed."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, id):
+        try:
+            upload = PostUpload.objects.get(id=id, author=request.user)
+        except PostUpload.DoesNotExist:
+            return Response({'detail': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(PostUploadStatusSerializer(upload).data, status=status.HTTP_200_OK)
+
+
 class PostRetrieveUpdateDeleteView(APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
+    stateless_auth = True
 
     def get(self, request, id):
-        try:
-            post = Post.objects.get(id=id)
-        except Post.DoesNotExist:
-            return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = PostSerializer(post, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        host = request.get_host()
+        entry, version = cache.get_post(id, host)
+        if entry is None:
+            try:
+                post = Post.objects.with_feed_data().get(id=id)
+            except Post.DoesNotExist:
+                return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
+            data = PostSerializer(post, context={'request': request, 'pending_likes': {}, 'liked_post_ids': set()}).data
+            entry = cache.set_post(id, host, data, version, post.updated_at)
+
+        data = entry['data']
+        pending = counters.pending_post_likes([id]).get(str(id), 0)
+        data['post_likes_count'] += pending
+        data['me_liked'] = id in likes.liked_post_ids(request.user, [id])
+        return conditional_response(request, data, entry, pending, int(data['me_liked']))
     
     def put(self, request, id):
         try:
@@ -87,7 +268,13 @@ class PostRetrieveUpdateDeleteView(APIView):
             return Response({'detail': 'You do not have permission to edit this post.'}, status=status.HTTP_403_FORBIDDEN)
         serializer = PostSerializer(post, data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
+            old_image = post.image
+            post = serializer.save()
+            if 'image' in serializer.validated_data:
+                # the new upload took its own reference, even on identical content
+                release_file(old_image)
+            if post.image.name != old_image.name:
+                transaction.on_commit(lambda: generate_post_derivatives.delay(str(post.id)))
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -102,40 +289,204 @@ class PostRetrieveUpdateDeleteView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
     
 
-class CommentListView(APIView):
+class PostBatchView(APIView):
+    """Several posts by id in one query, in the requested order."""
     permission_classes = [AllowAny]
-    pagination_class = CustomPagination
+
+    def post(self, request):
+        serializer = PostBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        found = Post.objects.with_feed_data().in_bulk(ids)
+        posts = [found[id] for id in ids if id in found]
+        data = PostSerializer(posts, many=True, context=post_context(request, posts)).data
+        return Response({
+            'results': data,
+            'missing': [id for id in ids if id not in found],
+        }, status=status.HTTP_200_OK)
+
+
+class PostLikeBatchView(APIView):
+    """
+    Apply a list of like/unlike operations of the current user in one
+    transaction. The last operation on a post wins; unknown posts are
+    reported as missing.
+    """
+
+    def post(self, request):
+        serializer = PostLikeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        wanted = {op['post_id']: op['action'] == 'like' for op in serializer.validated_data['operations']}
+        existing = set(Post.objects.filter(pk__in=list(wanted)).values_list('pk', flat=True))
+        # deltas come from the rows each statement really inserted or deleted,
+        # so concurrent batches and the single like endpoints can't double count
+        to_like, to_unlike = likes.change_likes('posts', request.user.pk, {
+            post_id: like for post_id, like in wanted.items() if post_id in existing
+        })
+
+        return Response({
+            'liked': to_like,
+            'unliked': to_unlike,
+            'missing': [post_id for post_id in wanted if post_id not in existing],
+        }, status=status.HTTP_200_OK)
+
+
+class CommentListView(AnonymousPageCacheMixin, KeysetPaginationMixin, APIView):
+    permission_classes = [AllowAny]
+    stateless_auth = True
 
     def get(self, request):
-        comments = PostComment.objects.all().order_by('-created_at')
-        paginator = self.pagination_class()
+        comments = PostComment.objects.select_related('author').order_by('-created_at', '-id')
+        paginator = self.get_paginator(request)
         page = paginator.paginate_queryset(comments, request)
         if page is not None:
-            serializer = CommentSerializer(page, many=True, context={'request': request})
-            return paginator.get_paginated_response(serializer.data)
-        serializer = CommentSerializer(comments, many=True, context={'request': request})
+            serializer = CommentSerializer(page, many=True, context=comment_context(request, page))
+            response = paginator.get_paginated_response(serializer.data)
+            return tag_page(response, [f'comment-{comment.pk.hex}' for comment in page], 'comments-head', newest_first=True)
+        serializer = CommentSerializer(comments, many=True, context=comment_context(request, comments))
         return Response(serializer.data, status=status.HTTP_200_OK)
     
 
+class PostTagFeedView(AnonymousPageCacheMixin, APIView):
+    """Newest posts carrying one hashtag."""
+    permission_classes = [AllowAny]
+    stateless_auth = True
+
+    def get(self, request, tag):
+        try:
+            hashtag = Hashtag.objects.get(name=tag.lower())
+        except Hashtag.DoesNotExist:
+            return Response({'detail': 'Hashtag not found.'}, status=status.HTTP_404_NOT_FOUND)
+        rows = PostHashtag.objects.filter(hashtag=hashtag).select_related('post__author')
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(rows, request)
+        posts = [row.post for row in page]
+        serializer = PostSerializer(posts, many=True, context=post_context(request, posts))
+        response = paginator.get_paginated_response(serializer.data)
+        response.data['tag'] = hashtag.name
+        response.data['posts_count'] = hashtag.posts_count
+        return tag_page(response, [f'post-{post.pk}' for post in posts], f'tag-{hashtag.name}-head', newest_first=True)
+
+
+class SearchView(APIView):
+    """Ranked full-text search over posts and comments, and username lookup (?type=users)."""
+    permission_classes = [AllowAny]
+    stateless_auth = True
+    cursor_query_param = 'cursor'
+
+    def get(self, request):
+        query = SearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        text, kind = query.validated_data['q'], query.validated_data['type']
+        page_size = KeysetPagination().get_page_size(request)
+        after = None
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            position = decode_cursor(cursor)
+            try:
+                after = (float(position['r']), uuid.UUID(position['i']))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                raise NotFound('Invalid cursor.')
+
+        if kind == 'users':
+            hits = search.search_users(text, page_size + 1, after)
+        else:
+            hits = search.search_documents(kind, text, page_size + 1, after)
+        has_more = len(hits) > page_size
+        hits = hits[:page_size]
+        ids = [pk for pk, _ in hits]
+
+        if kind == 'posts':
+            found = Post.objects.with_feed_data().in_bulk(ids)
+            page = [found[pk] for pk in ids if pk in found]
+            results = PostSerializer(page, many=True, context=post_context(request, page)).data
+        elif kind == 'comments':
+            found = PostComment.objects.select_related('author').in_bulk(ids)
+            page = [found[pk] for pk in ids if pk in found]
+            liked = threads.attach_reply_previews(page, request.user, limit=0)
+            results = CommentSerializer(page, many=True, context={'request': request, 'liked_comment_ids': liked}).data
+        else:
+            found = User.objects.in_bulk(ids)
+            results = UserSerializer([found[pk] for pk in ids if pk in found], many=True, context={'request': request}).data
+
+        next_link = None
+        if has_more:
+            pk, rank = hits[-1]
+            next_link = replace_query_param(request.build_absolute_uri(), self.cursor_query_param, encode_cursor({'r': rank, 'i': str(pk)}))
+        return Response({'next': next_link, 'results': results}, status=status.HTTP_200_OK)
+
+
+class PostCommentListView(AnonymousPageCacheMixin, APIView):
+    """Top-level comments of one post, oldest first, each with a short reply preview."""
+    permission_classes = [AllowAny]
+    stateless_auth = True
+    pagination_class = OldestFirstKeysetPagination
+
+    def get(self, request, post_id):
+        comments = PostComment.objects.filter(post_id=post_id, parent__isnull=True).select_related('author')
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(comments, request)
+        if not page and not Post.objects.filter(id=post_id).exists():
+            return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
+        liked = threads.attach_reply_previews(page, request.user)
+        serializer = CommentSerializer(page, many=True, context={'request': request, 'liked_comment_ids': liked})
+        response = paginator.get_paginated_response(serializer.data)
+        return tag_page(response, [f'comment-{comment.pk.hex}' for comment in page], f'post-{post_id}-comments', newest_first=False)
+
+
+class CommentReplyListView(AnonymousPageCacheMixin, APIView):
+    """Direct replies of one comment for expanding a thread on demand."""
+    permission_classes = [AllowAny]
+    stateless_auth = True
+    pagination_class = OldestFirstKeysetPagination
+
+    def get(self, request, comment_id):
+        replies = PostComment.objects.filter(parent_id=comment_id).select_related('author')
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(replies, request)
+        if not page and not PostComment.objects.filter(id=comment_id).exists():
+            return Response({'detail': 'Comment not found.'}, status=status.HTTP_404_NOT_FOUND)
+        liked = threads.attach_reply_previews(page, request.user)
+        serializer = CommentSerializer(page, many=True, context={'request': request, 'liked_comment_ids': liked})
+        response = paginator.get_paginated_response(serializer.data)
+        return tag_page(response, [f'comment-{reply.pk.hex}' for reply in page], f'comment-{comment_id.hex}-replies', newest_first=False)
+
+
 class CommentCreateView(APIView):
     def post(self, request):
         serializer = CommentSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save(author=request.user)
+            with transaction.atomic():
+                comment = serializer.save(author=request.user)
+                counters.change_post_comments(comment.post_id, 1)
+                if comment.parent_id:
+                    counters.change_comment_replies(comment.parent_id, 1)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
 class CommentRetrieveUpdateDeleteView(APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
+    stateless_auth = True
 
     def get(self, request, id):
-        try:
-            comment = PostComment.objects.get(id=id)
-        except PostComment.DoesNotExist:
-            return Response({'detail': 'Comment not found.'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = CommentSerializer(comment, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        host = request.get_host()
+        entry, version = cache.get_comment(id, host)
+        if entry is None:
+            try:
+                comment = PostComment.objects.select_related('author').get(id=id)
+            except PostComment.DoesNotExist:
+                return Response({'detail': 'Comment not found.'}, status=status.HTTP_404_NOT_FOUND)
+            threads.attach_threads([comment])
+            data = CommentSerializer(comment, context={'request': request, 'liked_comment_ids': set()}).data
+            entry = cache.set_comment(id, host, data, version, comment.updated_at)
+
+        data = entry['data']
+        nodes = list(_comment_tree(data))
+        liked = {str(pk) for pk in threads.liked_comment_ids(request.user, [node['id'] for node in nodes])}
+        for node in nodes:
+            node['me_liked'] = node['id'] in liked
+        return conditional_response(request, data, entry, *sorted(liked))
     
     def put(self, request, id):
         try:
@@ -146,7 +497,15 @@ class CommentRetrieveUpdateDeleteView(APIView):
             return Response({'detail': 'You do not have permission to edit this comment.'}, status=status.HTTP_403_FORBIDDEN)
         serializer = CommentSerializer(comment, data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
+            old_parent_id = comment.parent_id
+            with transaction.atomic():
+                serializer.save()
+                # a reply moved under another comment changes both replies_count
+                if comment.parent_id != old_parent_id:
+                    if old_parent_id:
+                        counters.change_comment_replies(old_parent_id, -1)
+                    if comment.parent_id:
+                        counters.change_comment_replies(comment.parent_id, 1)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -157,33 +516,60 @@ class CommentRetrieveUpdateDeleteView(APIView):
             return Response({'detail': 'Comment not found.'}, status=status.HTTP_404_NOT_FOUND)
         if comment.author != request.user:
             return Response({'detail': 'You do not have permission to delete this comment.'}, status=status.HTTP_403_FORBIDDEN)
-        comment.delete()
+        with transaction.atomic():
+            # replies are removed by the cascade, so take the real number of deleted comments
+            _, deleted = comment.delete()
+            counters.change_post_comments(comment.post_id, -deleted.get(PostComment._meta.label, 0))
+            if comment.parent_id:
+                counters.change_comment_replies(comment.parent_id, -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
 
+class PostLikeView(APIView):
+    """Idempotent like (PUT) and unlike (DELETE) of a post."""
+
+    def put(self, request, post_id):
+        created = likes.add_like('posts', request.user.pk, post_id)
+        if created is None:
+            return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'detail': 'Post liked.'}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def delete(self, request, post_id):
+        if likes.remove_like('posts', request.user.pk, post_id) is None:
+            return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CommentLikeView(APIView):
+    """Idempotent like (PUT) and unlike (DELETE) of a comment."""
+
+    def put(self, request, comment_id):
+        created = likes.add_like('comments', request.user.pk, comment_id)
+        if created is None:
+            return Response({'detail': 'Comment not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'detail': 'Comment liked.'}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def delete(self, request, comment_id):
+        if likes.remove_like('comments', request.user.pk, comment_id) is None:
+            return Response({'detail': 'Comment not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class PostLikeToggleView(APIView):
     def post(self, request, post_id):
-        try:
-            post = Post.objects.get(id=post_id)
-        except Post.DoesNotExist:
+        liked = likes.toggle_like('posts', request.user.pk, post_id)
+        if liked is None:
             return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
-        
-        like, created = PostLike.objects.get_or_create(post=post, author=request.user)
-        if not created:
-            like.delete()
+        if not liked:
             return Response({'detail': 'Post unliked.'}, status=status.HTTP_200_OK)
         return Response({'detail': 'Post liked.'}, status=status.HTTP_201_CREATED)
     
 
 class CommentLikeToggleView(APIView):
     def post(self, request, comment_id):
-        try:
-            comment = PostComment.objects.get(id=comment_id)
-        except PostComment.DoesNotExist:
+        liked = likes.toggle_like('comments', request.user.pk, comment_id)
+        if liked is None:
             return Response({'detail': 'Comment not found.'}, status=status.HTTP_404_NOT_FOUND)
-        
-        like, created = CommentLike.objects.get_or_create(comment=comment, author=request.user)
-        if not created:
-            like.delete()
+        if not liked:
             return Response({'detail': 'Comment unliked.'}, status=status.HTTP_200_OK)
         return Response({'detail': 'Comment liked.'}, status=status.HTTP_201_CREATED)
\ No newline at end of file
@@ -1,7 +1,8 @@
 from django.contrib import admin
-from .models import User, UserConfirmation
+from .models import User, UserConfirmation, Follow
 
 # Register your models here.
 
 admin.site.register(User)
-admin.site.register(UserConfirmation)
\ No newline at end of file
+admin.site.register(UserConfirmation)
+admin.site.register(Follow)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from shared import outbox
+from shared.redis_client import get_redis
+from .models import AuthType, UserConfirmation, PHONE_TIME, EMAIL_TIME
+from .tasks import send_verification_email
+
+
+# Verification codes live in Redis by default: the key expires on its own
+# after PHONE_TIME/EMAIL_TIME, wrong guesses are counted with INCR and a
+# correct code is consumed with GETDEL, so two concurrent requests can't both
+# use it. With VERIFICATION_CODE_STORE = 'db' the UserConfirmation table is
+# used instead, and purge_confirmations removes its dead rows.
+CODE_KEY = 'user:{user_id}:verify_code'
+ATTEMPTS_KEY = 'user:{user_id}:verify_attempts'
+
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+
+
+def _new_code():
+    return ''.join(secrets.choice('0123456789') for _ in range(4))
+
+
+def _ttl(auth_type):
+    return timedelta(minutes=PHONE_TIME if auth_type == AuthType.Phone else EMAIL_TIME)
+
+
+def _use_db():
+    return settings.VERIFICATION_CODE_STORE == 'db'
+
+
+def issue(user, auth_type, replace=True):
+    """
+    Create a verification code for ``user`` and send it. With
+    ``replace=False`` nothing happens while an unexpired code exists.
+    Returns the code, or None if one was still valid.
+    """
+    code = _new_code()
+    if _use_db():
+        if not replace and UserConfirmation.objects.filter(user=user, is_verified=False, expired_time__gt=timezone.now()).exists():
+            return None
+        # the post_save signal sends the email
+        UserConfirmation.objects.create(user=user, code=code, auth_type=auth_type)
+        return code
+
+    ttl = _ttl(auth_type)
+    client = get_redis()
+    if not client.set(CODE_KEY.format(user_id=user.pk), code, ex=ttl, nx=not replace):
+        return None
+    # reset only with a new code, or asking for one would undo the attempt limit
+    client.set(ATTEMPTS_KEY.format(user_id=user.pk), 0, ex=ttl)
+    if auth_type == AuthType.Email:
+        outbox.enqueue(send_verification_email, user.email, code)
+    return code
+
+
+def verify(user, code):
+    """Check ``code`` and consume it on success. Returns VERIFIED, INVALID, EXPIRED or LOCKED."""
+    if _use_db():
+        return _verify_db(user, code)
+
+    client = get_redis()
+    code_key, attempts_key = CODE_KEY.format(user_id=user.pk), ATTEMPTS_KEY.format(user_id=user.pk)
+    pipe = client.pipeline(transaction=True)
+    pipe.get(code_key)
+    pipe.incr(attempts_key)
+    stored, attempts = pipe.execute()
+    if stored is None:
+        client.delete(attempts_key)
+        return EXPIRED
+    if attempts > settings.VERIFICATION_CODE_MAX_ATTEMPTS:
+        return LOCKED
+    if not secrets.compare_digest(stored, code):
+        return INVALID
+    # only one of several concurrent requests with the right code gets it back
+    if client.getdel(code_key) != stored:
+        return EXPIRED
+    client.delete(attempts_key)
+    return VERIFIED
+
+
+def _verify_db(user, code):
+    confirmation = UserConfirmation.objects.filter(user=user, is_verified=False).order_by('-created_at').first()
+    if confirmation is None or timezone.now() > confirmation.expired_time:
+        return EXPIRED
+    # the guard and the increment are one UPDATE, so concurrent guesses can't all pass it
+    counted = UserConfirmation.objects.filter(
+        pk=confirmation.pk, attempts__lt=settings.VERIFICATION_CODE_MAX_ATTEMPTS,
+    ).update(attempts=F('attempts') + 1)
+    if not counted:
+        return LOCKED
+    if not secrets.compare_digest(confirmation.code, code):
+        return INVALID
+    # the DELETE is the consumption: a concurrent request that loses finds no row
+    if not UserConfirmation.objects.filter(pk=confirmation.pk).delete()[0]:
+        return EXPIRED
+    return VERIFIED
@@ -0,0 +1,132 @@
+import csv
+import json
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from apps.users.models import AuthType, User, UserStatus
+from shared.utility import email_regex, phone_regex_uz, username_regex
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _temp_username():
+    # same shape as User.change_username
+    return f'instagram-{str(uuid.uuid4()).split("-")[-1]}'
+
+
+def normalize(row):
+    """
+    The User fields for one input row, or None if it is not an object or has
+    neither a valid email nor a valid Uzbek phone number. Phones are stored
+    as +998XXXXXXXXX.
+    """
+    if not isinstance(row, dict):
+        return None
+    email = (row.get('email') or '').strip().lower()
+    phone = (row.get('phone_number') or '').strip().replace(' ', '')
+    email = email if email_regex.match(email) else None
+    phone = '+998' + phone[-9:] if phone_regex_uz.match(phone) else None
+    if email is None and phone is None:
+        return None
+    username = (row.get('username') or '').strip()
+    return {
+        'email': email,
+        'phone_number': phone,
+        'auth_type': AuthType.Email if email else AuthType.Phone,
+        'username': username if username_regex.match(username) else None,
+        'password': row.get('password') or None,
+        'first_name': (row.get('first_name') or '').strip()[:150],
+        'last_name': (row.get('last_name') or '').strip()[:150],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users from a CSV or NDJSON file (columns: email, phone_number, username, "
+        "password, first_name, last_name) with bulk inserts, skipping User.save. "
+        "Rows whose email, phone or username already exists are skipped; rows without "
+        "a password get an unusable one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or - for stdin.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=4, help="Password hashing processes; 0 hashes in-process.")
+        parser.add_argument('--status', choices=UserStatus.values, default=UserStatus.Done)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('ndjson' if options['path'].endswith(('.ndjson', '.jsonl')) else 'csv')
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        pool = ProcessPoolExecutor(options['workers']) if options['workers'] > 0 else None
+        started = time.monotonic()
+        imported = skipped = 0
+        try:
+            rows = csv.DictReader(stream) if fmt == 'csv' else (json.loads(line) for line in stream if line.strip())
+            for chunk in _chunks(rows, options['chunk_size']):
+                created, rejected = self.import_chunk(chunk, options['status'], pool)
+                imported += created
+                skipped += rejected
+                rate = imported / max(time.monotonic() - started, 1e-9)
+                self.stdout.write(f"{imported} imported, {skipped} skipped, {rate:.0f} users/s")
+        except (csv.Error, json.JSONDecodeError) as exc:
+            raise CommandError(f"Malformed input after {imported + skipped} rows: {exc}")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} users, skipped {skipped} in {time.monotonic() - started:.1f}s."
+        ))
+
+    def import_chunk(self, rows, user_status, pool):
+        """Insert one chunk; returns (created, skipped)."""
+        records = [record for record in map(normalize, rows) if record is not None]
+        generated = set()
+        for record in records:
+            if record['username'] is None:
+                record['username'] = _temp_username()
+                generated.add(record['username'])
+
+        # one query finds every username, email and phone of the chunk that already exists
+        existing = User.objects.filter(
+            Q(username__in=[record['username'] for record in records])
+            | Q(email__in=[record['email'] for record in records if record['email']])
+            | Q(phone_number__in=[record['phone_number'] for record in records if record['phone_number']])
+        ).values_list('username', 'email', 'phone_number')
+        taken = {value for row in existing for value in row if value}
+
+        unique = []
+        for record in records:
+            if record['email'] in taken or record['phone_number'] in taken:
+                continue
+            while record['username'] in taken and record['username'] in generated:
+                # a generated name that collides (practically never): draw again
+                record['username'] = _temp_username()
+            if record['username'] in taken:
+                continue
+            taken.update(value for value in (record['username'], record['email'], record['phone_number']) if value)
+            unique.append(record)
+
+        passwords = [record.pop('password') for record in unique]
+        hashed = pool.map(make_password, passwords, chunksize=64) if pool else map(make_password, passwords)
+        users = [
+            User(**record, password=password, user_status=user_status)
+            for record, password in zip(unique, hashed)
+        ]
+        # rows a concurrent signup took in the meantime are dropped by the database,
+        # so only the ids that made it in count as created
+        User.objects.bulk_create(users, batch_size=len(users) or None, ignore_conflicts=True)
+        created = User.objects.filter(pk__in=[user.pk for user in users]).count() if users else 0
+        return created, len(rows) - created
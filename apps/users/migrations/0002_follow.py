@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:42
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Follow',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('follower', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL)),
+                ('following', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='followers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Follow',
+                'verbose_name_plural': 'Follows',
+                'db_table': 'follows',
+                'indexes': [models.Index(fields=['following', 'follower'], name='follows_following_idx')],
+                'constraints': [models.UniqueConstraint(fields=('follower', 'following'), name='unique_follow')],
+            },
+        ),
+    ]
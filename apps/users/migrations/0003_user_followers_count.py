@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:45
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_followers_count(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+    followers = Follow.objects.filter(following=OuterRef('pk')).order_by().values('following').annotate(total=Count('pk')).values('total')
+    User.objects.update(followers_count=Coalesce(Subquery(followers), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_follow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_followers_count, migrations.RunPython.noop),
+    ]
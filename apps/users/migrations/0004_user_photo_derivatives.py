@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_followers_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='photo_blurhash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='photo_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='photo_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
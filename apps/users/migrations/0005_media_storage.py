@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:56
+
+import shared.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_photo_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=shared.storage.get_media_storage, upload_to='user_photos/'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def create_trigram_index(apps, schema_editor):
+    # prefix and fuzzy username lookups for /posts/search/?type=users; other
+    # databases fall back to a LIKE scan
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute("CREATE INDEX users_username_trgm_idx ON users_user USING GIN (username gin_trgm_ops)")
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS users_username_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_media_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
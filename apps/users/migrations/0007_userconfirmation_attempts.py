@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_username_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userconfirmation',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
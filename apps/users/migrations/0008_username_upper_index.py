@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:53
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0007_userconfirmation_attempts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Upper('username'), name='users_username_upper_idx'),
+        ),
+    ]
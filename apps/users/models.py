@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser
 from rest_framework_simplejwt.tokens import RefreshToken
 
@@ -6,6 +7,7 @@ import uuid
 import secrets
 
 from shared.models import BaseModel
+from shared.storage import get_media_storage
 
 class AuthType(models.TextChoices):
     Email = 'email', 'Email'
@@ -23,7 +25,20 @@ class User(AbstractUser, BaseModel):
     phone_number = models.CharField(max_length=13, unique=True, null=True, blank=True)
     auth_type = models.CharField(choices=AuthType.choices)
     user_status = models.CharField(choices=UserStatus.choices, default=UserStatus.New)
-    photo = models.ImageField(upload_to='user_photos/', null=True, blank=True)
+    photo = models.ImageField(upload_to='user_photos/', storage=get_media_storage, null=True, blank=True)
+    # filled in by the generate_photo_derivatives task after upload
+    photo_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    photo_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    photo_blurhash = models.CharField(max_length=64, blank=True, editable=False)
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
+    followers_count = models.IntegerField(default=0, editable=False)
+
+    class Meta(AbstractUser.Meta):
+        swappable = 'AUTH_USER_MODEL'
+        indexes = [
+            # case-insensitive username login (username__iexact)
+            models.Index(Upper('username'), name='users_username_upper_idx'),
+        ]
 
     def normalize_email(self):
         if self.email:
@@ -40,9 +55,9 @@ class User(AbstractUser, BaseModel):
         if not self.password:
             self.set_password(f"password-{uuid.uuid4().__str__().split('-')[-1]}")
 
-    def generate_code(self, auth_type):
-        code = ''.join(secrets.choice('0123456789') for _ in range(4))
-        return UserConfirmation.objects.create(user=self, code=code, auth_type=auth_type)
+    def generate_code(self, auth_type, replace=True):
+        from .codes import issue
+        return issue(self, auth_type, replace=replace)
     
     def token(self):
         refresh = RefreshToken.for_user(self)
@@ -60,6 +75,25 @@ class User(AbstractUser, BaseModel):
         self.change_password()
         super().save(*args, **kwargs)
     
+class Follow(BaseModel):
+    follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following')
+    following = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers')
+
+    class Meta:
+        db_table = 'follows'
+        verbose_name = 'Follow'
+        verbose_name_plural = 'Follows'
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'following'], name='unique_follow'),
+        ]
+        indexes = [
+            models.Index(fields=['following', 'follower'], name='follows_following_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.follower.username} follows {self.following.username}'
+
+
 PHONE_TIME = 3  # minutes
 EMAIL_TIME = 5  # minutes
 
@@ -69,6 +103,7 @@ class UserConfirmation(BaseModel):
     auth_type = models.CharField(choices=AuthType.choices)
     is_verified = models.BooleanField(default=False)
     expired_time = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
 
     def __str__(self):
         return f'Confirmation for {self.user.username} - Code: {self.code} - Verified: {self.is_verified}'
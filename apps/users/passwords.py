@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework.exceptions import Throttled
+
+# Password hashing is CPU-bound and Argon2 releases the GIL, so a burst of
+# logins could otherwise occupy every request thread of a gunicorn gthread
+# worker at once. Hashes run on a small per-process pool instead; requests
+# beyond PASSWORD_HASH_WORKERS wait in a queue of PASSWORD_HASH_QUEUE, and
+# anything past that gets a 429 after PASSWORD_HASH_WAIT seconds. This only
+# bounds anything with several request threads per process, hence gthread
+# in the compose files.
+_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+_slots = BoundedSemaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE)
+
+
+def _run(func, *args):
+    if not _slots.acquire(timeout=settings.PASSWORD_HASH_WAIT):
+        raise Throttled(detail="Too many login attempts right now, try again shortly.")
+    try:
+        return _executor.submit(func, *args).result()
+    finally:
+        _slots.release()
+
+
+def verify_password(user, raw_password):
+    """
+    Check ``raw_password`` against ``user`` (which may be None, costing the
+    same time as a wrong password). A correct password stored with an older
+    hasher, e.g. PBKDF2, is rehashed with the preferred one, Argon2.
+    """
+    if user is None:
+        _run(make_password, raw_password)
+        return False
+    outdated = []
+    if not _run(check_password, raw_password, user.password, outdated.append):
+        return False
+    if outdated:
+        user.password = _run(make_password, raw_password)
+        user.save(update_fields=['password'])
+    return True
@@ -0,0 +1,43 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from shared.redis_client import get_redis
+from .models import User
+
+# Logins and token refreshes record "last seen" in one Redis hash instead of
+# writing the user row each time; flush_last_seen moves the hash into
+# User.last_login with bulk UPDATEs every LAST_SEEN_FLUSH_INTERVAL seconds.
+# The column therefore lags by up to one interval, and if Redis loses the
+# hash, at most one interval of timestamps is lost. Only the latest time per
+# user is kept, which is all last_login holds anyway.
+LAST_SEEN_KEY = 'users:last_seen'
+
+
+def record_seen(user_id):
+    get_redis().hset(LAST_SEEN_KEY, str(user_id), time.time())
+
+
+def flush_last_seen():
+    """Write the buffered timestamps to the database; returns the number of users updated."""
+    pipe = get_redis().pipeline(transaction=True)
+    pipe.hgetall(LAST_SEEN_KEY)
+    pipe.delete(LAST_SEEN_KEY)
+    seen, _ = pipe.execute()
+    if not seen:
+        return 0
+
+    users = [
+        User(pk=user_id, last_login=datetime.fromtimestamp(float(ts), tz=dt_timezone.utc))
+        for user_id, ts in seen.items()
+    ]
+    try:
+        User.objects.bulk_update(users, ['last_login'], batch_size=settings.LAST_SEEN_BATCH_SIZE)
+    except Exception:
+        # put them back for the next flush unless a newer time arrived meanwhile
+        pipe = get_redis().pipeline(transaction=False)
+        for user_id, ts in seen.items():
+            pipe.hsetnx(LAST_SEEN_KEY, user_id, ts)
+        pipe.execute()
+        raise
+    return len(users)
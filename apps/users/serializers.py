@@ -3,10 +3,11 @@ from .models import User, AuthType, UserStatus
 from django.core.validators import FileExtensionValidator
 from shared.utility import check_user_type
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken
 from rest_framework_simplejwt.tokens import AccessToken
-from django.contrib.auth import authenticate
-from django.shortcuts import get_object_or_404
-from django.contrib.auth.models import update_last_login
+from shared import revocation
+from .passwords import verify_password
+from .presence import record_seen
 from rest_framework.exceptions import ValidationError, PermissionDenied, NotFound
 from django.db.models import Q
 from django.contrib.auth.password_validation import validate_password
@@ -87,6 +88,12 @@ class UserPhotoSerializer(serializers.Serializer):
 
 
 class LoginSerializer(TokenObtainPairSerializer):
+    # which column each kind of login input is looked up in; emails are stored lowercased
+    LOOKUPS = {
+        'email': 'email',
+        'phone': 'phone_number',
+        'username': 'username__iexact',
+    }
 
     def __init__(self, *args, **kwargs):
         super(LoginSerializer, self).__init__(*args, **kwargs)
@@ -94,75 +101,56 @@ class LoginSerializer(TokenObtainPairSerializer):
         self.fields['username'] = serializers.CharField(required=False, read_only=True)
 
     def auth_validate(self, data):
-        user_input = data.get('userinput')  # email, phone_number, username
-        if check_user_type(user_input) == 'username':
-            username = user_input
-        elif check_user_type(user_input) == "email":  # Anora@gmail.com   -> anOra@gmail.com
-            user = self.get_user(email__iexact=user_input) # user get method orqali user o'zgartiruvchiga biriktirildi
-            username = user.username
-        elif check_user_type(user_input) == 'phone':
-            user = self.get_user(phone_number=user_input)
-            username = user.username
-        else:
-            data = {
-                'success': True,
-                'message': "Siz email, username yoki telefon raqami jonatishingiz kerak"
-            }
-            raise ValidationError(data)
-
-        authentication_kwargs = {
-            self.username_field: username,
-            'password': data['password']
-        }
-        # user statusi tekshirilishi kerak
-        current_user = User.objects.filter(username__iexact=username).first()  # None
-
-        if current_user is not None and current_user.auth_status in [UserStatus.NEW, UserStatus.CODE_VERIFIED]:
+        user_input = data.get('userinput').strip()  # email, phone_number, username
+        try:
+            input_type = check_user_type(user_input)
+        except ValueError:
             raise ValidationError(
                 {
                     'success': False,
-                    'message': "Siz royhatdan toliq otmagansiz!"
+                    'message': "Siz email, username yoki telefon raqami jonatishingiz kerak"
                 }
             )
-        user = authenticate(**authentication_kwargs)
-        if user is not None:
-            self.user = user
-        else:
+        if input_type == 'email':
+            user_input = user_input.lower()
+        user = User.objects.filter(**{self.LOOKUPS[input_type]: user_input}).first()
+
+        # parol har doim tekshiriladi, aks holda status xatosi
+        # akkaunt borligini javob vaqti va matni orqali oshkor qiladi
+        if not verify_password(user, data['password']) or not user.is_active:
             raise ValidationError(
                 {
                     'success': False,
                     'message': "Sorry, login or password you entered is incorrect. Please check and trg again!"
                 }
             )
+        if user.user_status in [UserStatus.New, UserStatus.CodeVerified]:
+            raise ValidationError(
+                {
+                    'success': False,
+                    'message': "Siz royhatdan toliq otmagansiz!"
+                }
+            )
+        self.user = user
 
     def validate(self, data):
         self.auth_validate(data)
-        if self.user.auth_status not in [UserStatus.DONE, UserStatus.PHOTO_DONE]:
+        if self.user.user_status not in [UserStatus.Done, UserStatus.Photo_Done]:
             raise ValidationError("Siz login qila olmaysiz. Ruxsatingiz yoq")
+        record_seen(self.user.pk)
         data = self.user.token()
-        data['auth_status'] = self.user.auth_status
-        data['full_name'] = self.user.full_name
+        data['user_status'] = self.user.user_status
+        data['full_name'] = self.user.get_full_name()
         return data
 
-    def get_user(self, **kwargs):
-        users = User.objects.filter(**kwargs)
-        if not users.exists():
-            raise ValidationError(
-                {
-                    "message": "No active account found"
-                }
-            )
-        return users.first()
-
 
 class LoginRefreshSerializer(TokenRefreshSerializer):
 
     def validate(self, attrs):
+        if revocation.check(self.token_class(attrs['refresh'])):
+            raise InvalidToken("Token has been revoked")
         data = super().validate(attrs)
-        access_token_instance = AccessToken(data['access'])
-        user_id = access_token_instance['user_id']
-        user = get_object_or_404(User, id=user_id)
-        update_last_login(None, user)
+        record_seen(AccessToken(data['access'])['user_id'])
         return data
 
 
@@ -1,13 +1,24 @@
-from .models import UserConfirmation, AuthType
-from django.db.models.signals import post_save
+from .models import User, UserConfirmation, AuthType
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from shared import outbox
+from shared.authentication import invalidate_user
+from shared.storage import release_file
 from .tasks import send_verification_email
 
 @receiver(post_save, sender=UserConfirmation)
 def send_code_on_created(sender, instance, created, **kwargs):
     if created and instance.auth_type == AuthType.Email:
-        send_verification_email.delay(instance.user.email, instance.code)
+        outbox.enqueue(send_verification_email, instance.user.email, instance.code)
 
 
+@receiver(post_delete, sender=User)
+def release_photo(sender, instance, **kwargs):
+    release_file(instance.photo)
 
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # covers status and password changes, which both go through save()
+    invalidate_user(instance.pk)
@@ -1,11 +1,20 @@
 from celery import shared_task
 from django.core.mail import EmailMessage
+from django.db.models import Q
 from django.template.loader import render_to_string
+from django.utils import timezone
+from shared import outbox
+from shared.images import build_derivatives
+from .models import User, UserConfirmation
+from . import presence
 
 
-@shared_task
-def send_verification_email(email, code):
-    html_content = render_to_string('email/activate_account.html', {'code': code})
+@shared_task(bind=True, autoretry_for=(OSError,), retry_backoff=True, max_retries=5)
+def send_verification_email(self, email, code):
+    # sent through the outbox, which may publish the same message twice
+    if not outbox.claim_delivery(self.request.id):
+        return False
+    html_content = render_to_string('emails/activate_account.html', {'code': code})
 
     email = EmailMessage(
         subject='Your Verification Code',
@@ -13,6 +22,45 @@ def send_verification_email(email, code):
         to=[email],
     )
     email.content_subtype = 'html'
-    email.send()
+    try:
+        email.send()
+    except Exception:
+        outbox.release_delivery(self.request.id)
+        raise
+
+    return True
+
+
+@shared_task
+def generate_photo_derivatives(user_id):
+    user = User.objects.filter(id=user_id).only('id', 'photo').first()
+    if user is None or not user.photo:
+        return False
+    result = build_derivatives(user.photo)
+    User.objects.filter(id=user_id, photo=user.photo.name).update(
+        photo_width=result['width'],
+        photo_height=result['height'],
+        photo_blurhash=result['blurhash'],
+        photo_variants=result['variants'],
+    )
+    return True
 
-    return True
\ No newline at end of file
+
+@shared_task
+def flush_last_seen():
+    return presence.flush_last_seen()
+
+
+@shared_task
+def purge_confirmations(batch_size=1000):
+    """
+    Delete used and expired UserConfirmation rows, ``batch_size`` per
+    DELETE so the table is never locked for long. Returns the number removed.
+    """
+    dead = UserConfirmation.objects.filter(Q(is_verified=True) | Q(expired_time__lt=timezone.now()))
+    purged = 0
+    while True:
+        ids = list(dead.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return purged
+        purged += UserConfirmation.objects.filter(pk__in=ids).delete()[0]
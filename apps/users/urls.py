@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import SignUpView, VerifyCodeView, UserInfoView, UserPhotoView, NewVerifyCodeView
+from .views import SignUpView, VerifyCodeView, UserInfoView, UserPhotoView, NewVerifyCodeView, FollowToggleView, \
+    LoginView, LoginRefreshView, LogoutView, LogoutAllView
 
 app_name = 'users'
 
@@ -9,4 +10,9 @@ urlpatterns = [
     path('new-verify/', NewVerifyCodeView.as_view(), name='new_verify_code'),
     path('change-info/', UserInfoView.as_view(), name='change_info'),
     path('change-photo/', UserPhotoView.as_view(), name='change_photo'),
+    path('login/', LoginView.as_view(), name='login'),
+    path('login/refresh/', LoginRefreshView.as_view(), name='login_refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
+    path('logout-all/', LogoutAllView.as_view(), name='logout_all'),
+    path('<uuid:user_id>/follow-toggle/', FollowToggleView.as_view(), name='follow_toggle'),
 ]
\ No newline at end of file
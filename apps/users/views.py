@@ -1,9 +1,18 @@
-from django.utils import timezone
 from rest_framework.views import APIView, Response, status
 from .serializers import SignUpSerializer, VerifiedCodeSerializer, InformationUserSerializer, UserPhotoSerializer, \
     LoginSerializer, LoginRefreshSerializer, LogoutSerializer, ForgotPasswordSerializer, ResetPasswordSerializer
 from rest_framework import permissions 
-from .models import AuthType, UserStatus, UserConfirmation, User, PHONE_TIME, EMAIL_TIME 
+from .models import AuthType, UserStatus, User, Follow
+from . import codes
+from django.db import transaction
+from django.db.models import F
+from apps.posts.tasks import add_author_to_timeline, remove_author_from_timeline
+from .tasks import generate_photo_derivatives
+from shared import revocation
+from shared.storage import release_file
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from django.core.exceptions import ObjectDoesNotExist
 
@@ -42,18 +51,18 @@ class VerifyCodeView(APIView):
         if serializer.is_valid():
             code = serializer.validated_data['code']
             user = request.user
-            try:
-                confirmation = UserConfirmation.objects.get(user=user, code=code)
-            except UserConfirmation.DoesNotExist:
-                return Response({"success": False, "detail": "Invalid verification code."}, status=status.HTTP_400_BAD_REQUEST)
             if user.user_status != UserStatus.New:
                 return Response({"success": False, "detail": "User is already verified."}, status=status.HTTP_400_BAD_REQUEST)
-            if timezone.now() > confirmation.expired_time:
+            result = codes.verify(user, code)
+            if result == codes.EXPIRED:
                 return Response({"detail": "Code expired"}, status=status.HTTP_400_BAD_REQUEST)
+            if result == codes.LOCKED:
+                return Response({"success": False, "detail": "Too many attempts, request a new code."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            if result == codes.INVALID:
+                return Response({"success": False, "detail": "Invalid verification code."}, status=status.HTTP_400_BAD_REQUEST)
 
             user.user_status = UserStatus.CodeVerified
             user.save()
-            confirmation.delete()
 
             data = {
                 "success": True,
@@ -71,9 +80,8 @@ class NewVerifyCodeView(APIView):
         user = request.user
         if user.user_status != UserStatus.New:
             return Response({"success": False, "detail": "User is already verified."}, status=status.HTTP_400_BAD_REQUEST)
-        if UserConfirmation.objects.filter(user=user, expired_time__gt=timezone.now()).exists():
+        if user.generate_code(user.auth_type, replace=False) is None:
             return Response({"success": False, "detail": "A valid verification code has already been sent."}, status=status.HTTP_400_BAD_REQUEST)
-        user.generate_code(user.auth_type)
         return Response({"success": True, "detail": "A new verification code has been sent."}, status=status.HTTP_200_OK)
 
 
@@ -109,9 +117,12 @@ class UserPhotoView(APIView):
             user = request.user
             photo = serializer.validated_data.get('photo')
             if photo:
+                old_photo = user.photo
                 user.photo = photo
                 user.user_status = UserStatus.Photo_Done
                 user.save()
+                release_file(old_photo)
+                transaction.on_commit(lambda: generate_photo_derivatives.delay(str(user.id)))
             data = {
                 "success": True,
                 "access": user.token()['access'],
@@ -120,3 +131,63 @@ class UserPhotoView(APIView):
             }
             return Response(data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+
+class FollowToggleView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, user_id):
+        if user_id == request.user.pk:
+            return Response({"success": False, "detail": "You cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            author = User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            return Response({"success": False, "detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        with transaction.atomic():
+            follow, created = Follow.objects.get_or_create(follower=request.user, following=author)
+            if not created:
+                follow.delete()
+                User.objects.filter(pk=author.pk).update(followers_count=F('followers_count') - 1)
+                transaction.on_commit(lambda: remove_author_from_timeline.delay(str(request.user.pk), str(author.pk)))
+                return Response({"success": True, "detail": "User unfollowed."}, status=status.HTTP_200_OK)
+            User.objects.filter(pk=author.pk).update(followers_count=F('followers_count') + 1)
+        transaction.on_commit(lambda: add_author_to_timeline.delay(str(request.user.pk), str(author.pk)))
+        return Response({"success": True, "detail": "User followed."}, status=status.HTTP_201_CREATED)
+
+
+class LoginView(TokenObtainPairView):
+    """Log in with an email, phone number or username (``userinput``) and a password."""
+    serializer_class = LoginSerializer
+
+
+class LoginRefreshView(TokenRefreshView):
+    serializer_class = LoginRefreshSerializer
+
+
+class LogoutView(APIView):
+    """Revoke the given refresh token and the access token of the request."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = LogoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            refresh = RefreshToken(serializer.validated_data['refresh'])
+        except TokenError:
+            return Response({"success": False, "detail": "Invalid refresh token."}, status=status.HTTP_400_BAD_REQUEST)
+        if str(refresh.get('user_id')) != str(request.user.pk):
+            return Response({"success": False, "detail": "Invalid refresh token."}, status=status.HTTP_400_BAD_REQUEST)
+        revocation.revoke(refresh)
+        revocation.revoke(request.auth)
+        return Response({"success": True, "detail": "Logged out."}, status=status.HTTP_200_OK)
+
+
+class LogoutAllView(APIView):
+    """Revoke every token of the user issued so far, on all devices."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        revocation.revoke_all(request.user.pk)
+        return Response({"success": True, "detail": "Logged out on all devices."}, status=status.HTTP_200_OK)
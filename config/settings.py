@@ -30,6 +30,7 @@ THIRD_PARTY_APPS = [
     "drf_spectacular_sidecar",
 ]
 LOCAL_APPS = [
+    'shared',
     'apps.users',
     'apps.posts',
 ]
@@ -49,7 +50,7 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'shared.authentication.CachedJWTAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -122,6 +123,21 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# New passwords are hashed with Argon2; older PBKDF2 hashes still verify and
+# are rehashed on the next successful login
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+# Login password checks per gunicorn process (gthread, 16 request threads):
+# hashing threads, requests allowed to wait for one, and seconds to wait
+# before answering 429. Workers + queue stay below the request threads so a
+# login burst leaves threads free for other requests.
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_QUEUE = 6
+PASSWORD_HASH_WAIT = 5
+
 
 
 # Internationalization
@@ -155,5 +171,115 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json' 
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_TIMEZONE = 'Asia/Tashkent'
+# CPU-heavy image work gets its own worker (--pool=threads) so it can use a process pool
+CELERY_TASK_ROUTES = {
+    'apps.posts.tasks.generate_post_derivatives': {'queue': 'images'},
+    'apps.users.tasks.generate_photo_derivatives': {'queue': 'images'},
+    'apps.posts.tasks.ingest_post_upload': {'queue': 'images'},
+}
+# How often buffered last-seen times are written to User.last_login (apps/users/presence.py);
+# also the most the column can lag behind
+LAST_SEEN_FLUSH_INTERVAL = 60
+LAST_SEEN_BATCH_SIZE = 1000
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-post-counters': {
+        'task': 'apps.posts.tasks.reconcile_counters',
+        'schedule': timedelta(minutes=30),
+    },
+    'flush-post-likes': {
+        'task': 'apps.posts.tasks.flush_post_likes',
+        'schedule': timedelta(seconds=5),
+    },
+    'relay-outbox': {
+        'task': 'shared.tasks.relay_outbox',
+        'schedule': timedelta(seconds=2),
+    },
+    'flush-last-seen': {
+        'task': 'apps.users.tasks.flush_last_seen',
+        'schedule': timedelta(seconds=LAST_SEEN_FLUSH_INTERVAL),
+    },
+    'purge-confirmations': {
+        'task': 'apps.users.tasks.purge_confirmations',
+        'schedule': timedelta(hours=1),
+    },
+}
+
+# Application data (counters, caches, timelines); kept apart from the Celery broker db
+REDIS_URL = 'redis://localhost:6379/2'
+
+# Lifetime of the cached post/comment detail payloads; bounds how long an
+# author's new username or photo can take to show up in them
+DETAIL_CACHE_TTL = 300
+# Rendered anonymous list pages (Redis and the s-maxage given to nginx/CDNs); 0 disables
+PAGE_CACHE_TTL = 60
+
+# Outbox of task calls written with the request's transaction. 'relay': the
+# relay_outbox beat task publishes them to Celery; 'on_commit': they run
+# in-process after commit and the relay only retries failures.
+OUTBOX_DELIVERY = 'relay'
+OUTBOX_BATCH_SIZE = 500
+# Retry backoff for failed publishes: OUTBOX_RETRY_BASE * 2**attempts seconds, capped
+OUTBOX_RETRY_BASE = 5
+OUTBOX_RETRY_MAX = 600
+# 'on_commit' only: seconds before the relay may take a row over from the inline
+# delivery; keep it well above the slowest delivery (e.g. the SMTP timeout)
+OUTBOX_INLINE_GRACE = 120
+# How long delivered message ids are remembered to drop duplicate publishes
+OUTBOX_DEDUPE_TTL = 24 * 60 * 60
+
+# Slim user records behind JWT authentication: Redis lifetime, and how long a
+# process may reuse one from memory (the longest another process can miss a
+# status or password change); 0 turns the in-memory layer off
+AUTH_USER_CACHE_TTL = 300
+AUTH_USER_LOCAL_TTL = 5
+
+# Where verification codes are kept: 'redis' (expiring keys) or 'db' (UserConfirmation rows)
+VERIFICATION_CODE_STORE = 'redis'
+# Wrong guesses allowed per code before a new one has to be requested
+VERIFICATION_CODE_MAX_ATTEMPTS = 5
+
+# How long a user's liked post/comment id sets stay in Redis before being reloaded
+LIKED_SET_TTL = 24 * 60 * 60
+# Users with more likes than this are checked against the database instead
+LIKED_SET_MAX_SIZE = 10000
+
+# Write-behind mode for post like counters: likes are buffered in Redis,
+# spread over POST_LIKES_COUNTER_SHARDS keys per post, and flushed to
+# Postgres by flush_post_likes instead of locking the post row per request.
+POST_LIKES_WRITE_BEHIND = False
+POST_LIKES_COUNTER_SHARDS = 8
+
+# Most posts (or like operations) accepted by one posts/batch/ or posts/likes/batch/ request
+POST_BATCH_MAX_SIZE = 50
+
+# Bounds for nested comment threads returned by the comment endpoints
+COMMENT_THREAD_MAX_DEPTH = 5
+COMMENT_THREAD_REPLIES_PER_LEVEL = 20
+# Replies shown under each top-level comment of posts/<id>/comments/
+COMMENT_REPLY_PREVIEW = 3
+
+# Home timelines: posts kept per user and followers written per fan-out batch
+TIMELINE_LENGTH = 800
+FANOUT_BATCH_SIZE = 1000
+# Authors with this many followers are merged in at read time instead of fanned out
+FANOUT_FOLLOWER_THRESHOLD = 10000
+AUTHOR_RECENT_POSTS = 200
+
+# Resized copies generated for Post.image and User.photo; IMAGE_PROCESS_WORKERS=None
+# uses every core of the images worker, 0 renders in the calling process
+IMAGE_VARIANT_WIDTHS = [320, 640, 1080]
+IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+IMAGE_PROCESS_WORKERS = None
+
+# Direct-to-bucket uploads (S3, or MinIO via AWS_S3_ENDPOINT_URL); credentials
+# come from the usual AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY environment
+AWS_S3_ENDPOINT_URL = None
+AWS_S3_REGION_NAME = 'us-east-1'
+DIRECT_UPLOAD_BUCKET = 'instagram-uploads'
+DIRECT_UPLOAD_PREFIX = 'uploads/'
+DIRECT_UPLOAD_MAX_SIZE = 30 * 1024 * 1024
+# Files above one part are sent as resumable multipart uploads (S3 minimum part is 5 MB)
+DIRECT_UPLOAD_PART_SIZE = 8 * 1024 * 1024
+DIRECT_UPLOAD_EXPIRES = 900  # seconds
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
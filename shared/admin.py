@@ -1,3 +1,18 @@
 from django.contrib import admin
+from .models import Blob, OutboxMessage
 
-# Register your models here.
+
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'refcount', 'created_at')
+    search_fields = ('hash', 'name')
+    readonly_fields = ('hash', 'name', 'size', 'refcount', 'derivatives')
+
+
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('task', 'attempts', 'available_at', 'created_at')
+    list_filter = ('task',)
+    readonly_fields = ('task', 'args', 'attempts', 'available_at', 'last_error')
+
+
+admin.site.register(Blob, BlobAdmin)
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
@@ -0,0 +1,134 @@
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from shared import revocation
+from shared.redis_client import get_redis
+
+# The user behind an access token is read from a slim record in Redis
+# instead of a SELECT per request. Each record carries the per-user version
+# stamp it was built at; invalidate_user() bumps the stamp after commit, so a
+# record built from pre-commit data by a concurrent request is never used.
+# A process may also keep records in memory for AUTH_USER_LOCAL_TTL seconds,
+# which bounds how long other processes can miss an invalidation.
+# Columns outside USER_FIELDS load from the database on first access.
+AUTH_USER_KEY = 'user:{user_id}:auth'
+AUTH_VERSION_KEY = 'user:{user_id}:auth_version'
+USER_FIELDS = {
+    'id', 'username', 'email', 'phone_number', 'auth_type', 'user_status',
+    'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser',
+}
+LOCAL_MAX_ENTRIES = 10000
+
+_local = {}
+
+
+def _fields():
+    return [field for field in get_user_model()._meta.concrete_fields if field.attname in USER_FIELDS]
+
+
+def _build(record):
+    model = get_user_model()
+    fields = _fields()
+    values = [field.to_python(record[field.attname]) for field in fields]
+    return model.from_db(model.objects.db, [field.attname for field in fields], values)
+
+
+def get_cached_user(user_id, extra_keys=()):
+    """
+    The user with ``user_id`` from the local, Redis or database layer (None
+    if there is none), and the values of ``extra_keys``, which are read in
+    the same Redis round trip.
+    """
+    user_id = str(user_id)
+    hit = _local.get(user_id)
+    if hit is not None and hit[0] > time.monotonic():
+        return _build(hit[1]), get_redis().mget(extra_keys) if extra_keys else []
+
+    record_key, version_key = AUTH_USER_KEY.format(user_id=user_id), AUTH_VERSION_KEY.format(user_id=user_id)
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.get(version_key)
+    pipe.get(record_key)
+    for key in extra_keys:
+        pipe.get(key)
+    version, cached, *extra = pipe.execute()
+    version = int(version or 0)
+    cached = json.loads(cached) if cached else None
+    if cached is None or cached['version'] != version:
+        fields = get_user_model().objects.filter(pk=user_id).values(*[field.attname for field in _fields()]).first()
+        if fields is None:
+            return None, extra
+        cached = json.loads(json.dumps({'version': version, 'fields': fields}, cls=DjangoJSONEncoder))
+        get_redis().set(record_key, json.dumps(cached), ex=settings.AUTH_USER_CACHE_TTL)
+
+    if settings.AUTH_USER_LOCAL_TTL:
+        if len(_local) >= LOCAL_MAX_ENTRIES:
+            _local.clear()
+        _local[user_id] = (time.monotonic() + settings.AUTH_USER_LOCAL_TTL, cached['fields'])
+    return _build(cached['fields']), extra
+
+
+def invalidate_user(user_id):
+    """Retire the cached record of a user once the current transaction commits."""
+    user_id = str(user_id)
+
+    def retire():
+        _local.pop(user_id, None)
+        version_key = AUTH_VERSION_KEY.format(user_id=user_id)
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.incr(version_key)
+        # outlives every record built before the bump
+        pipe.expire(version_key, 2 * settings.AUTH_USER_CACHE_TTL)
+        pipe.delete(AUTH_USER_KEY.format(user_id=user_id))
+        pipe.execute()
+
+    transaction.on_commit(retire)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user through get_cached_user and
+    rejects revoked tokens, both with one Redis round trip. Safe requests to
+    views with ``stateless_auth = True`` skip the user lookup and get a
+    TokenUser backed by the token's claims; such views must only need the
+    user's id.
+    """
+
+    def authenticate(self, request):
+        view = (request.parser_context or {}).get('view')
+        self.stateless = request.method in SAFE_METHODS and getattr(view, 'stateless_auth', False)
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+        keys = revocation.token_keys(validated_token)
+        if self.stateless:
+            self._check_revocation(validated_token, get_redis().mget(keys))
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # needs the password hash, which is not cached
+            self._check_revocation(validated_token, get_redis().mget(keys))
+            return super().get_user(validated_token)
+
+        user, values = get_cached_user(user_id, keys)
+        self._check_revocation(validated_token, values)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def _check_revocation(self, token, values):
+        if revocation.is_revoked(token, values):
+            raise InvalidToken(_("Token has been revoked"))
@@ -1,5 +1,14 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
@@ -13,4 +22,145 @@ class CustomPagination(PageNumberPagination):
             'previous': self.get_previous_link(),
             'count': self.page.paginator.count,
             'results': data
-        })
\ No newline at end of file
+        })
+
+
+def encode_cursor(payload):
+    data = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    try:
+        data = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        position = json.loads(data)
+    except (ValueError, TypeError):
+        raise NotFound('Invalid cursor.')
+    if not isinstance(position, dict):
+        raise NotFound('Invalid cursor.')
+    return position
+
+
+def estimate_count(queryset):
+    """
+    Row estimate from the Postgres planner for ``queryset``, or None on
+    databases without usable statistics. Never runs a COUNT(*).
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    # psycopg hands back the parsed list and Django dumps its single element
+    if isinstance(plan, list):
+        plan = plan[0]
+    return int(plan['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on ``(created_at, id)``. Each page is a single indexed
+    range scan no matter how deep the client scrolls, and no COUNT(*) is run.
+    Pass ``with_count=1`` to get a planner estimate of the total.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.descending = self.ordering[0].startswith('-')
+        self.count = estimate_count(queryset) if request.query_params.get(self.count_query_param) else None
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        position = decode_cursor(cursor) if cursor else None
+        self.reverse = bool(position and position.get('r'))
+
+        # Walking backwards is a forward scan in the opposite order.
+        descending = self.descending != self.reverse
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position, descending))
+        order = ('-created_at', '-id') if descending else ('created_at', 'id')
+        rows = list(queryset.order_by(*order)[:self.page_size + 1])
+
+        self.has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+        self.has_position = position is not None
+        self.page = rows
+        return rows
+
+    def position_filter(self, position, descending):
+        try:
+            created_at = datetime.fromisoformat(position['t'])
+            pk = uuid.UUID(position['i'])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise NotFound('Invalid cursor.')
+        if descending:
+            return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def build_link(self, obj, reverse):
+        payload = {'t': obj.created_at.isoformat(), 'i': str(obj.pk)}
+        if reverse:
+            payload['r'] = 1
+        url = remove_query_param(self.base_url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(payload))
+
+    def get_next_link(self):
+        if not self.page or (not self.reverse and not self.has_more):
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.page or (self.reverse and not self.has_more) or (not self.reverse and not self.has_position):
+            return None
+        return self.build_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer', 'description': 'Planner estimate, only with ?with_count=1'},
+                'results': schema,
+            },
+        }
+
+
+class OldestFirstKeysetPagination(KeysetPagination):
+    ordering = ('created_at', 'id')
+
+
+class KeysetPaginationMixin:
+    """Keyset pages by default; ``?page=N`` keeps the old page-number format for legacy clients."""
+    pagination_class = KeysetPagination
+    legacy_pagination_class = CustomPagination
+
+    def get_paginator(self, request):
+        if CustomPagination.page_query_param in request.query_params:
+            return self.legacy_pagination_class()
+        return self.pagination_class()
@@ -0,0 +1,160 @@
+import multiprocessing
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import blurhash
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import ExifTags, Image, ImageOps
+
+# Resizing and encoding are CPU bound, so they run in a process pool inside
+# the worker. Celery's prefork children may not start processes of their
+# own, which is why the image tasks are routed to the "images" queue served
+# by a --pool=threads worker (see docker-compose.prod.yml). Forking that
+# multi-threaded worker could copy locks held by other threads (logging, the
+# Redis pool) into the children, so they are started by a forkserver.
+_pool = None
+_pool_lock = threading.Lock()
+
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context('forkserver'),
+            )
+    return _pool
+
+
+def _open(data):
+    image = Image.open(BytesIO(data))
+    # apply the EXIF orientation before the metadata is dropped
+    image = ImageOps.exif_transpose(image)
+    return image.convert('RGB')
+
+
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+SANITIZED_OPTIONS = {
+    'JPEG': {'quality': 95},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 95},
+}
+
+
+def strip_metadata(content):
+    """
+    ``content`` re-encoded without EXIF/XMP (GPS position, camera, ...), with
+    the EXIF orientation applied, or ``content`` itself if it carries no such
+    metadata or is not an image Pillow can rewrite. The original is served
+    as is, so this runs before it is stored.
+    """
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    data = content.read()
+    try:
+        image = Image.open(BytesIO(data))
+        image_format = image.format
+        if image_format not in SANITIZED_OPTIONS or not (image.getexif() or any(key in image.info for key in METADATA_KEYS)):
+            return ContentFile(data)
+        options = dict(SANITIZED_OPTIONS[image_format])
+        if image.getexif().get(ExifTags.Base.Orientation, 1) == 1:
+            if image_format == 'JPEG':
+                # same quantization tables as the upload, so the pixels barely change
+                options['quality'] = 'keep'
+        else:
+            image = ImageOps.exif_transpose(image)
+        for key in METADATA_KEYS:
+            # Pillow writes some of these back from info on save
+            image.info.pop(key, None)
+        output = BytesIO()
+        image.save(output, image_format, **options)
+    except Exception:
+        return ContentFile(data)
+    return ContentFile(output.getvalue())
+
+
+def render_variant(data, width, fmt):
+    """Resize ``data`` to ``width`` and encode it as ``fmt``, without any EXIF/metadata."""
+    image = _open(data)
+    height = max(1, round(image.height * width / image.width))
+    image = image.resize((width, height), Image.Resampling.LANCZOS)
+    pil_format, _, options = FORMATS[fmt]
+    output = BytesIO()
+    image.save(output, pil_format, **options)
+    return output.getvalue()
+
+
+def describe(data):
+    """Width, height and blurhash placeholder of the (orientation corrected) image."""
+    image = _open(data)
+    width, height = image.size
+    image.thumbnail((64, 64))
+    return width, height, blurhash.encode(image, 4, 3)
+
+
+def _target_widths(width):
+    widths = [w for w in settings.IMAGE_VARIANT_WIDTHS if w < width]
+    return widths or [min(width, min(settings.IMAGE_VARIANT_WIDTHS))]
+
+
+def build_derivatives(field_file):
+    """
+    Generate every configured width/format of an uploaded image and store
+    them next to the original under ``variants/``. Returns the values for
+    the model's ``*_width``, ``*_height``, ``*_blurhash`` and ``*_variants``
+    fields. Content-addressed files that were processed before are not
+    rendered again.
+    """
+    storage = field_file.storage
+    cached = storage.cached_derivatives(field_file.name) if hasattr(storage, 'cached_derivatives') else None
+    if cached and set(cached['variants']) == set(settings.IMAGE_VARIANT_FORMATS):
+        return cached
+
+    with field_file.open('rb') as source:
+        data = source.read()
+
+    if settings.IMAGE_PROCESS_WORKERS == 0:
+        width, height, placeholder = describe(data)
+    else:
+        width, height, placeholder = get_pool().submit(describe, data).result()
+
+    jobs = [(fmt, w) for fmt in settings.IMAGE_VARIANT_FORMATS for w in _target_widths(width)]
+    if settings.IMAGE_PROCESS_WORKERS == 0:
+        rendered = [render_variant(data, w, fmt) for fmt, w in jobs]
+    else:
+        pool = get_pool()
+        rendered = [future.result() for future in [pool.submit(render_variant, data, w, fmt) for fmt, w in jobs]]
+
+    directory, filename = posixpath.split(field_file.name)
+    stem = posixpath.splitext(filename)[0]
+    variants = {}
+    for (fmt, w), content in zip(jobs, rendered):
+        name = posixpath.join(directory, 'variants', f'{stem}_{w}.{FORMATS[fmt][1]}')
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        variants.setdefault(fmt, {})[str(w)] = default_storage.save(name, ContentFile(content))
+    result = {'width': width, 'height': height, 'blurhash': placeholder, 'variants': variants}
+    if hasattr(storage, 'cache_derivatives'):
+        storage.cache_derivatives(field_file.name, result)
+    return result
+
+
+def variant_urls(variants, request=None):
+    """``{"webp": {"320": url, ...}, ...}`` for a stored ``*_variants`` value."""
+    urls = {}
+    for fmt, names in (variants or {}).items():
+        urls[fmt] = {}
+        for width, name in names.items():
+            url = default_storage.url(name)
+            urls[fmt][width] = request.build_absolute_uri(url) if request is not None else url
+    return urls
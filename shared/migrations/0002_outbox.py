@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:37
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared', '0001_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('task', models.CharField(max_length=255)),
+                ('args', models.JSONField(default=list)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(db_index=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Outbox Message',
+                'verbose_name_plural': 'Outbox Messages',
+                'db_table': 'outbox',
+            },
+        ),
+    ]
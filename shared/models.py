@@ -8,4 +8,39 @@ class BaseModel(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        abstract = True
\ No newline at end of file
+        abstract = True
+
+class Blob(BaseModel):
+    """One stored media file, shared by every field that uploaded the same bytes."""
+    hash = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    # cached output of shared.images.build_derivatives for this content
+    derivatives = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        db_table = 'blobs'
+        verbose_name = 'Blob'
+        verbose_name_plural = 'Blobs'
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount} refs)'
+
+
+class OutboxMessage(BaseModel):
+    """A Celery task call written in the same transaction as the change that caused it."""
+    task = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    attempts = models.PositiveIntegerField(default=0)
+    # relay skips the message until then (retry backoff)
+    available_at = models.DateTimeField(db_index=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'outbox'
+        verbose_name = 'Outbox Message'
+        verbose_name_plural = 'Outbox Messages'
+
+    def __str__(self):
+        return f'{self.task} ({self.attempts} attempts)'
@@ -0,0 +1,18 @@
+import boto3
+from botocore.config import Config
+from django.conf import settings
+
+_client = None
+
+
+def get_s3_client():
+    """Client for the S3-compatible bucket that receives direct uploads (AWS, MinIO, ...)."""
+    global _client
+    if _client is None:
+        _client = boto3.client(
+            's3',
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+            region_name=settings.AWS_S3_REGION_NAME,
+            config=Config(signature_version='s3v4'),
+        )
+    return _client
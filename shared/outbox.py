@@ -0,0 +1,101 @@
+import time
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from shared.models import OutboxMessage
+from shared.redis_client import get_redis
+
+# Task calls that must neither get lost nor run before their data is
+# committed go through the outbox table: enqueue() inserts a row in the
+# caller's transaction and relay() hands due rows to Celery in batches,
+# deleting them once published. A failed publish is retried with exponential
+# backoff. A crash between publishing and the delete publishes a row again,
+# so outbox tasks call claim_delivery() with their task id (the row id).
+# With OUTBOX_DELIVERY = 'on_commit' the task runs in-process right after
+# the commit instead. Its row only becomes due OUTBOX_INLINE_GRACE seconds
+# later, so the relay never races the inline delivery and only picks up the
+# calls that failed (rescheduled) or never ran (the process died).
+DELIVERED_KEY = 'outbox:delivered:{message_id}'
+METRICS_KEY = 'outbox:metrics'
+
+
+def enqueue(task, *args):
+    """Record a call of ``task`` to be made once the current transaction commits."""
+    inline = settings.OUTBOX_DELIVERY == 'on_commit'
+    available_at = timezone.now() + timedelta(seconds=settings.OUTBOX_INLINE_GRACE if inline else 0)
+    message = OutboxMessage.objects.create(task=task.name, args=list(args), available_at=available_at)
+    if inline:
+        transaction.on_commit(lambda: _deliver_inline(message))
+    return message
+
+
+def _deliver_inline(message):
+    try:
+        current_app.tasks[message.task].apply(args=message.args, task_id=str(message.pk), throw=True)
+    except Exception as exc:
+        _schedule_retry([(message, exc)])
+        return
+    OutboxMessage.objects.filter(pk=message.pk).delete()
+
+
+def _schedule_retry(failures):
+    now = timezone.now()
+    for message, exc in failures:
+        delay = min(settings.OUTBOX_RETRY_BASE * 2 ** message.attempts, settings.OUTBOX_RETRY_MAX)
+        message.attempts += 1
+        message.available_at = now + timedelta(seconds=delay)
+        message.last_error = repr(exc)[:1000]
+    OutboxMessage.objects.bulk_update([message for message, _ in failures], ['attempts', 'available_at', 'last_error'])
+
+
+def relay(batch_size=None):
+    """
+    Publish up to ``batch_size`` due messages, oldest first, and return the
+    run's numbers. Rows locked by a concurrent relay are skipped.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(available_at__lte=timezone.now())
+            .order_by('available_at')[:batch_size]
+        )
+        published, failures = [], []
+        for message in messages:
+            try:
+                current_app.tasks[message.task].apply_async(args=message.args, task_id=str(message.pk))
+            except Exception as exc:
+                failures.append((message, exc))
+            else:
+                published.append(message.pk)
+        OutboxMessage.objects.filter(pk__in=published).delete()
+        if failures:
+            _schedule_retry(failures)
+    return record_metrics(relayed=len(published), failed=len(failures))
+
+
+def record_metrics(**counts):
+    """Store the backlog size and the age of its oldest message in Redis for monitoring."""
+    backlog = OutboxMessage.objects.aggregate(pending=Count('pk'), oldest=Min('created_at'))
+    lag = (timezone.now() - backlog['oldest']).total_seconds() if backlog['oldest'] else 0
+    metrics = {'pending': backlog['pending'], 'lag_seconds': round(lag, 3), 'updated_at': time.time(), **counts}
+    get_redis().hset(METRICS_KEY, mapping=metrics)
+    return metrics
+
+
+def claim_delivery(message_id):
+    """True the first time a task with this id runs; calls without an id always pass."""
+    if not message_id:
+        return True
+    key = DELIVERED_KEY.format(message_id=message_id)
+    return bool(get_redis().set(key, 1, nx=True, ex=settings.OUTBOX_DEDUPE_TTL))
+
+
+def release_delivery(message_id):
+    """Undo claim_delivery so a retry of a failed delivery runs again."""
+    if message_id:
+        get_redis().delete(DELIVERED_KEY.format(message_id=message_id))
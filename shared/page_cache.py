@@ -0,0 +1,85 @@
+import hashlib
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from shared.redis_client import get_redis
+
+# Rendered responses of anonymous GETs, one Redis hash per URL. Every entry
+# is listed in a set per surrogate key it was tagged with ("post-<id>",
+# "posts-head", ...), so a write purges exactly the pages that showed the
+# changed object. A purge that lands while a page is being rendered can
+# leave that page stale for at most PAGE_CACHE_TTL.
+PAGE_KEY = 'page:{digest}'
+SURROGATE_KEY = 'surrogate:{key}'
+
+
+def page_key(request):
+    parts = (request.get_host(), request.get_full_path(), request.META.get('HTTP_ACCEPT', ''))
+    return PAGE_KEY.format(digest=hashlib.sha1('\n'.join(parts).encode()).hexdigest())
+
+
+def purge(keys):
+    """Delete every cached page tagged with any of the surrogate ``keys``."""
+    keys = [SURROGATE_KEY.format(key=key) for key in keys]
+    if not keys:
+        return
+    client = get_redis()
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.smembers(key)
+    pages = set().union(*pipe.execute())
+    client.delete(*pages, *keys)
+
+
+def _store(key, response, surrogate_keys):
+    ttl = settings.PAGE_CACHE_TTL
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hset(key, mapping={
+        'content': response.content.decode(),
+        'content_type': response['Content-Type'],
+        'keys': ' '.join(surrogate_keys),
+    })
+    pipe.expire(key, ttl)
+    for surrogate_key in surrogate_keys:
+        pipe.sadd(SURROGATE_KEY.format(key=surrogate_key), key)
+        pipe.expire(SURROGATE_KEY.format(key=surrogate_key), ttl)
+    pipe.execute()
+
+
+def _public_headers(response, surrogate_keys):
+    # browsers revalidate, shared caches (nginx, CDN) keep the page for PAGE_CACHE_TTL
+    patch_cache_control(response, public=True, max_age=0, s_maxage=settings.PAGE_CACHE_TTL)
+    patch_vary_headers(response, ['Authorization', 'Accept'])
+    response['Surrogate-Key'] = ' '.join(surrogate_keys)
+    return response
+
+
+class AnonymousPageCacheMixin:
+    """
+    Serve anonymous GETs of a list view from Redis. The view marks what a
+    page contains by setting ``response.surrogate_keys``; untagged responses
+    are not cached.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or 'HTTP_AUTHORIZATION' in request.META or not settings.PAGE_CACHE_TTL:
+            response = super().dispatch(request, *args, **kwargs)
+            if request.method == 'GET':
+                patch_cache_control(response, private=True)
+                patch_vary_headers(response, ['Authorization'])
+            return response
+
+        key = page_key(request)
+        cached = get_redis().hgetall(key)
+        if cached:
+            response = HttpResponse(cached['content'], content_type=cached['content_type'])
+            return _public_headers(response, cached['keys'].split())
+
+        response = super().dispatch(request, *args, **kwargs)
+        surrogate_keys = getattr(response, 'surrogate_keys', None)
+        if response.status_code != 200 or not surrogate_keys or self.request.user.is_authenticated:
+            return response
+        response.render()
+        _store(key, response, surrogate_keys)
+        return _public_headers(response, surrogate_keys)
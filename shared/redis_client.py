@@ -0,0 +1,12 @@
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """Shared client for application data in Redis (counters, caches, timelines)."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings
+from shared.redis_client import get_redis
+
+# Revoked tokens are kept in Redis rather than simplejwt's blacklist tables:
+# a logged out token's jti is stored until the token would expire anyway,
+# and "log out everywhere" stores a per-user watermark that rejects every
+# token issued before it. Checking both is one MGET (see token_keys).
+# Tokens issued within the same second as the watermark stay valid.
+REVOKED_KEY = 'jwt:revoked:{jti}'
+WATERMARK_KEY = 'user:{user_id}:tokens_valid_after'
+
+
+def token_keys(token):
+    """The keys whose values is_revoked() needs for ``token``, in that order."""
+    return [
+        REVOKED_KEY.format(jti=token.get(api_settings.JTI_CLAIM)),
+        WATERMARK_KEY.format(user_id=token.get(api_settings.USER_ID_CLAIM)),
+    ]
+
+
+def is_revoked(token, values):
+    revoked, watermark = values
+    return bool(revoked) or (watermark is not None and token.get('iat', 0) < int(watermark))
+
+
+def check(token):
+    return is_revoked(token, get_redis().mget(token_keys(token)))
+
+
+def revoke(token):
+    """Reject ``token`` from now until it expires."""
+    ttl = int(token['exp'] - time.time())
+    if ttl > 0:
+        get_redis().set(REVOKED_KEY.format(jti=token[api_settings.JTI_CLAIM]), 1, ex=ttl)
+
+
+def revoke_all(user_id):
+    """Reject every token of the user issued before now."""
+    lifetime = max(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'], settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'])
+    get_redis().set(WATERMARK_KEY.format(user_id=user_id), int(time.time()), ex=int(lifetime.total_seconds()))
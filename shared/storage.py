@@ -0,0 +1,125 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .images import strip_metadata
+
+# Uploads are stored once per distinct content under blobs/<aa>/<sha256>.<ext>,
+# whatever upload_to the field asks for. Every field save adds a reference
+# to the Blob row and every release removes one; the file (and its image
+# variants) is deleted when the last reference goes away.
+BLOB_DIR = 'blobs'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # the name is derived from the content in _save
+        return name
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        # originals are served as stored, so GPS/camera metadata goes before hashing
+        content = strip_metadata(content)
+        incoming = self.path(posixpath.join(BLOB_DIR, 'incoming'))
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+                    size += len(chunk)
+            content_hash = digest.hexdigest()
+            ext = posixpath.splitext(name)[1].lower()
+
+            with transaction.atomic():
+                blob = self._add_reference(content_hash, posixpath.join(BLOB_DIR, content_hash[:2], content_hash + ext), size)
+                path = self.path(blob.name)
+                if os.path.exists(path):
+                    os.remove(temp_path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(temp_path, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return blob.name
+
+    def _add_reference(self, content_hash, name, size):
+        from .models import Blob
+
+        while True:
+            if Blob.objects.filter(hash=content_hash).update(refcount=F('refcount') + 1):
+                return Blob.objects.get(hash=content_hash)
+            try:
+                with transaction.atomic():
+                    return Blob.objects.create(hash=content_hash, name=name, size=size, refcount=1)
+            except IntegrityError:
+                # a concurrent upload of the same bytes inserted the row first
+                continue
+
+    def delete(self, name):
+        """Drop one reference; the file goes once nothing refers to it."""
+        from .models import Blob
+
+        if not name:
+            return
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                # a file stored before content addressing, owned by one row
+                super().delete(name)
+                return
+            if blob.refcount > 1:
+                Blob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+                return
+            blob.delete()
+            transaction.on_commit(lambda: self._purge(blob))
+
+    def _purge(self, blob):
+        from .models import Blob
+
+        # the same bytes may have been uploaded again since the row was deleted
+        if Blob.objects.filter(hash=blob.hash).exists():
+            return
+        super().delete(blob.name)
+        for names in blob.derivatives.get('variants', {}).values():
+            for variant in names.values():
+                default_storage.delete(variant)
+
+    def refcount(self, name):
+        from .models import Blob
+        return Blob.objects.filter(name=name).values_list('refcount', flat=True).first() or 0
+
+    def cached_derivatives(self, name):
+        from .models import Blob
+        return Blob.objects.filter(name=name).values_list('derivatives', flat=True).first() or None
+
+    def cache_derivatives(self, name, derivatives):
+        from .models import Blob
+        Blob.objects.filter(name=name).update(derivatives=derivatives)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def get_media_storage():
+    return content_addressed_storage
+
+
+def release_file(field_file):
+    """Give back the reference a model held on ``field_file`` once the transaction commits."""
+    if field_file:
+        storage, name = field_file.storage, field_file.name
+        transaction.on_commit(lambda: storage.delete(name))
@@ -0,0 +1,7 @@
+from celery import shared_task
+from shared import outbox
+
+
+@shared_task
+def relay_outbox(batch_size=None):
+    return outbox.relay(batch_size)
@@ -1,6 +1,26 @@
+import fakeredis
 import pytest
+from io import BytesIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
 from rest_framework.test import APIClient
 from apps.users.models import User
+from config.celery import app as celery_app
+from shared import redis_client
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Изолированный in-memory Redis вместо настоящего для каждого теста"""
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client, "_client", client)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def celery_eager(monkeypatch):
+    """Задачи Celery выполняются сразу, без брокера"""
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
 
 @pytest.fixture
 def client():
@@ -25,3 +45,35 @@ def authenticated_client(client,user):
     token = RefreshToken.for_user(user)
     client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
     return client
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    """MEDIA_ROOT во временной папке, картинки обрабатываются в процессе теста"""
+    settings.MEDIA_ROOT = tmp_path
+    settings.IMAGE_PROCESS_WORKERS = 0
+    return tmp_path
+
+
+@pytest.fixture
+def image_bytes():
+    """Фабрика байтов картинки; camera добавляет EXIF с моделью камеры"""
+    def make(size=(1200, 800), color=(200, 30, 30), fmt="JPEG", camera=None):
+        buffer = BytesIO()
+        options = {}
+        if camera:
+            exif = Image.Exif()
+            exif[0x0110] = camera
+            options["exif"] = exif
+        Image.new("RGB", size, color).save(buffer, format=fmt, **options)
+        return buffer.getvalue()
+    return make
+
+
+@pytest.fixture
+def image_file(image_bytes):
+    """Фабрика загружаемой картинки; формат берётся из расширения имени"""
+    def make(name="photo.jpg", **options):
+        fmt, content_type = ("PNG", "image/png") if name.endswith(".png") else ("JPEG", "image/jpeg")
+        return SimpleUploadedFile(name, image_bytes(fmt=fmt, **options), content_type=content_type)
+    return make
@@ -0,0 +1,98 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.users.models import User
+from apps.posts.models import Post, PostComment
+
+
+@pytest.fixture
+def post(user):
+    """Пост с веткой комментариев"""
+    author = User.objects.create_user(username="author", password="password", auth_type="email", email="author@example.com")
+    post = Post.objects.create(author=author, image="post_images/cached.jpg", caption="cached")
+    root = PostComment.objects.create(post=post, author=author, content="root")
+    PostComment.objects.create(post=post, author=author, content="reply", parent=root)
+    return post
+
+
+@pytest.mark.django_db
+def test_post_detail_is_served_from_cache_with_etag(authenticated_client, post, django_assert_num_queries):
+    url = reverse("post-detail", args=[post.id])
+    first = authenticated_client.get(url)
+    assert first.status_code == 200
+    assert first["ETag"].startswith('"')
+    assert "Last-Modified" in first
+
+    # пользователь берётся из claims JWT, пост и лайки из Redis
+    with django_assert_num_queries(0):
+        second = authenticated_client.get(url)
+    assert second.data == first.data
+    assert second["ETag"] == first["ETag"]
+
+    response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 304
+    assert response["ETag"] == first["ETag"]
+
+
+@pytest.mark.django_db
+def test_me_liked_is_merged_per_viewer(authenticated_client, post, django_capture_on_commit_callbacks):
+    url = reverse("post-detail", args=[post.id])
+    anonymous = APIClient().get(url)
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.post(reverse("post-like-toggle", args=[post.id]))
+
+    liked = authenticated_client.get(url)
+    assert liked.data["me_liked"] is True
+    assert liked.data["post_likes_count"] == 1
+    assert liked["ETag"] != anonymous["ETag"]
+    assert APIClient().get(url).data["me_liked"] is False
+
+
+@pytest.mark.django_db
+def test_post_cache_is_invalidated_on_change(authenticated_client, user, post, django_capture_on_commit_callbacks):
+    url = reverse("post-detail", args=[post.id])
+    before = authenticated_client.get(url)
+    with django_capture_on_commit_callbacks(execute=True):
+        PostComment.objects.create(post=post, author=user, content="new")
+        Post.objects.filter(id=post.id).update(comments_count=3)
+    after = authenticated_client.get(url, HTTP_IF_NONE_MATCH=before["ETag"])
+    assert after.status_code == 200
+    assert after.data["post_comments_count"] == 3
+    assert after["ETag"] != before["ETag"]
+
+
+@pytest.mark.django_db
+def test_comment_detail_cache_follows_reply_likes(authenticated_client, post, django_capture_on_commit_callbacks):
+    root = PostComment.objects.get(parent__isnull=True)
+    reply = PostComment.objects.get(parent=root)
+    url = reverse("comment-detail", args=[root.id])
+    before = authenticated_client.get(url)
+    assert before.data["replies"][0]["me_liked"] is False
+    assert authenticated_client.get(url, HTTP_IF_NONE_MATCH=before["ETag"]).status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.post(reverse("comment-like-toggle", args=[reply.id]))
+    after = authenticated_client.get(url, HTTP_IF_NONE_MATCH=before["ETag"])
+    assert after.status_code == 200
+    assert after.data["replies"][0]["me_liked"] is True
+    assert after.data["replies"][0]["likes_count"] == 1
+
+
+@pytest.mark.django_db
+def test_stale_payload_written_after_invalidation_is_not_served(authenticated_client, post, django_capture_on_commit_callbacks):
+    from django.utils.http import http_date
+    from apps.posts import cache
+    url = reverse("post-detail", args=[post.id])
+    # читатель прочитал версию и строку до изменения поста
+    _, version = cache.get_post(post.id, "testserver")
+    stale = authenticated_client.get(url).data
+    with django_capture_on_commit_callbacks(execute=True):
+        Post.objects.filter(id=post.id).update(caption="edited")
+        cache.invalidate_posts([post.id])
+    # ... и записал устаревший payload уже после инвалидации
+    cache.set_post(post.id, "testserver", {**stale, "caption": "cached"}, version, post.updated_at)
+
+    response = authenticated_client.get(url)
+    assert response.data["caption"] == "edited"
+    post.refresh_from_db()
+    assert response["Last-Modified"] == http_date(post.updated_at.timestamp())
@@ -0,0 +1,85 @@
+import pytest
+from io import BytesIO
+from django.urls import reverse
+from PIL import Image
+from apps.posts.models import Post
+
+
+@pytest.mark.django_db
+def test_post_create_generates_derivatives(authenticated_client, media, django_capture_on_commit_callbacks, image_file):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.post(reverse("post-create"), {"image": image_file(camera="Test Camera"), "caption": "hi"}, format="multipart")
+    assert response.status_code == 201
+    post = Post.objects.get(id=response.data["id"])
+    assert (post.image_width, post.image_height) == (1200, 800)
+    assert len(post.image_blurhash) > 6
+    assert set(post.image_variants) == {"webp", "jpeg"}
+    assert set(post.image_variants["webp"]) == {"320", "640", "1080"}
+
+    with Image.open(media / post.image_variants["jpeg"]["640"]) as variant:
+        assert variant.size == (640, 427)
+        assert not variant.getexif()
+    with Image.open(post.image.path) as original:
+        assert original.size == (1200, 800)
+        assert not original.getexif()  # оригинал тоже без EXIF
+
+    response = authenticated_client.get(reverse("post-detail", args=[post.id]))
+    assert response.data["image_variants"]["webp"]["320"].startswith("http://testserver/media/")
+    assert response.data["image_blurhash"] == post.image_blurhash
+
+
+@pytest.mark.django_db
+def test_small_images_are_not_upscaled(user, media, image_file):
+    from apps.posts.tasks import generate_post_derivatives
+    post = Post.objects.create(author=user, image=image_file(camera="Test Camera", size=(200, 100)), caption="small")
+    assert generate_post_derivatives(str(post.id))
+    post.refresh_from_db()
+    assert post.image_variants["jpeg"] == {"200": post.image_variants["jpeg"]["200"]}
+
+
+@pytest.mark.django_db
+def test_derivatives_in_process_pool(user, media, settings, image_file):
+    from shared.images import build_derivatives
+    settings.IMAGE_PROCESS_WORKERS = 2
+    post = Post.objects.create(author=user, image=image_file(camera="Test Camera"), caption="pool")
+    result = build_derivatives(post.image)
+    assert result["width"] == 1200
+    assert len(result["variants"]["jpeg"]) == 3
+
+
+def test_get_pool_is_shared_and_uses_forkserver(settings, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from shared import images
+    settings.IMAGE_PROCESS_WORKERS = 1
+    monkeypatch.setattr(images, "_pool", None)
+    # потоки воркера создают пул одновременно — пул должен быть один
+    with ThreadPoolExecutor(8) as threads:
+        pools = set(threads.map(lambda _: images.get_pool(), range(16)))
+    assert len(pools) == 1
+    pool = pools.pop()
+    assert pool._mp_context.get_start_method() == "forkserver"
+    pool.shutdown()
+
+
+@pytest.mark.django_db
+def test_user_photo_derivatives(authenticated_client, user, media, django_capture_on_commit_callbacks, image_file):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.put(reverse("users:change_photo"), {"photo": image_file(camera="Test Camera", size=(700, 700))}, format="multipart")
+    assert response.status_code == 200
+    user.refresh_from_db()
+    assert user.photo_width == 700
+    with Image.open(user.photo.path) as original:
+        assert not original.getexif()
+    assert set(user.photo_variants["webp"]) == {"320", "640"}
+
+
+def test_strip_metadata_applies_orientation():
+    from shared.images import strip_metadata
+    buffer = BytesIO()
+    exif = Image.Exif()
+    exif[0x0112] = 6  # повернуть на 90°
+    exif[0x8825] = {1: "N"}  # GPS
+    Image.new("RGB", (40, 20)).save(buffer, format="JPEG", exif=exif)
+    with Image.open(strip_metadata(BytesIO(buffer.getvalue()))) as image:
+        assert image.size == (20, 40)
+        assert not image.getexif()
@@ -0,0 +1,86 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from apps.users.tasks import send_verification_email
+from shared import outbox
+from shared.models import OutboxMessage
+from shared.tasks import relay_outbox
+
+
+def signup(client, email="outbox@example.com"):
+    response = client.post(reverse("users:signup"), {"email_or_phone": email}, format="json")
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_relay_delivers_signup_email(client, mailoutbox, fake_redis):
+    signup(client)
+    assert len(mailoutbox) == 0
+    assert OutboxMessage.objects.count() == 1
+
+    metrics = relay_outbox()
+    assert metrics["relayed"] == 1 and metrics["pending"] == 0
+    assert [mail.to for mail in mailoutbox] == [["outbox@example.com"]]
+    assert not OutboxMessage.objects.exists()
+    assert fake_redis.hget(outbox.METRICS_KEY, "relayed") == "1"
+
+
+@pytest.mark.django_db
+def test_duplicate_publish_is_delivered_once(mailoutbox):
+    message = outbox.enqueue(send_verification_email, "twice@example.com", "1234")
+    # повторная публикация того же сообщения (например, после падения relay)
+    for _ in range(2):
+        send_verification_email.apply(args=message.args, task_id=str(message.pk))
+    assert len(mailoutbox) == 1
+
+
+@pytest.mark.django_db
+def test_failed_publish_is_retried_with_backoff(client, monkeypatch, mailoutbox):
+    signup(client)
+
+    def broker_down(*args, **kwargs):
+        raise ConnectionError("broker unavailable")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(send_verification_email, "apply_async", broker_down)
+        metrics = relay_outbox()
+        assert metrics["failed"] == 1 and metrics["pending"] == 1
+        message = OutboxMessage.objects.get()
+        assert message.attempts == 1
+        assert "broker unavailable" in message.last_error
+        assert message.available_at > timezone.now()
+
+        # до окончания паузы сообщение не берётся
+        assert relay_outbox()["failed"] == 0
+    OutboxMessage.objects.update(available_at=timezone.now())
+    assert relay_outbox()["relayed"] == 1
+    assert len(mailoutbox) == 1
+
+
+@pytest.mark.django_db
+def test_on_commit_mode_delivers_after_commit(client, settings, mailoutbox, django_capture_on_commit_callbacks):
+    settings.OUTBOX_DELIVERY = "on_commit"
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        signup(client)
+    assert len(mailoutbox) == 0  # транзакция ещё не зафиксирована
+    # пока идёт доставка на месте, relay строку не трогает
+    assert relay_outbox()["relayed"] == 0
+    assert OutboxMessage.objects.count() == 1
+    for callback in callbacks:
+        callback()
+    assert len(mailoutbox) == 1
+    assert not OutboxMessage.objects.exists()
+
+
+@pytest.mark.django_db
+def test_on_commit_mode_failure_is_left_to_relay(client, settings, monkeypatch, mailoutbox, django_capture_on_commit_callbacks):
+    settings.OUTBOX_DELIVERY = "on_commit"
+    with monkeypatch.context() as patched:
+        patched.setattr("django.core.mail.backends.locmem.EmailBackend.send_messages", lambda *args: 1 / 0)
+        with django_capture_on_commit_callbacks(execute=True):
+            signup(client)
+    message = OutboxMessage.objects.get()
+    assert message.attempts == 1 and "ZeroDivisionError" in message.last_error
+    OutboxMessage.objects.update(available_at=timezone.now())
+    assert relay_outbox()["relayed"] == 1
+    assert len(mailoutbox) == 1
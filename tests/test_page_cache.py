@@ -0,0 +1,79 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.users.models import User
+from apps.posts.models import Post, PostComment
+
+
+@pytest.fixture
+def posts(db):
+    """Пять постов одного автора"""
+    author = User.objects.create_user(username="author", password="password", auth_type="email", email="author@example.com")
+    return [Post.objects.create(author=author, image=f"post_images/{i}.jpg", caption=f"caption {i}") for i in range(5)]
+
+
+def _second_page_url(client):
+    return client.get(reverse("post-list"), {"page_size": 2}).data["next"]
+
+
+@pytest.mark.django_db
+def test_anonymous_list_is_served_from_redis(client, posts, django_assert_num_queries):
+    url = reverse("post-list")
+    first = client.get(url)
+    assert "s-maxage=60" in first["Cache-Control"]
+    assert "public" in first["Cache-Control"]
+    assert f"post-{posts[0].id}" in first["Surrogate-Key"].split()
+    assert "posts-head" in first["Surrogate-Key"].split()
+
+    with django_assert_num_queries(0):
+        second = client.get(url)
+    assert second.content == first.content
+    assert second["Surrogate-Key"] == first["Surrogate-Key"]
+
+
+@pytest.mark.django_db
+def test_authenticated_requests_bypass_the_cache(authenticated_client, posts, django_assert_num_queries):
+    APIClient().get(reverse("post-list"))
+    authenticated_client.get(reverse("post-list"))
+    with django_assert_num_queries(1):
+        response = authenticated_client.get(reverse("post-list"))
+    assert "private" in response["Cache-Control"]
+    assert "Surrogate-Key" not in response
+
+
+@pytest.mark.django_db
+def test_writes_purge_only_the_affected_pages(client, user, posts, django_capture_on_commit_callbacks, django_assert_num_queries):
+    first_page = reverse("post-list") + "?page_size=2"
+    second_page = _second_page_url(client)
+    client.get(first_page)
+    client.get(second_page)
+
+    # новый пост попадает только на первую страницу
+    with django_capture_on_commit_callbacks(execute=True):
+        Post.objects.create(author=user, image="post_images/new.jpg", caption="new")
+    with django_assert_num_queries(0):
+        client.get(second_page)
+    with django_assert_num_queries(1):
+        response = client.get(first_page)
+    assert response.data["results"][0]["caption"] == "new"
+
+    # комментарий меняет счётчик поста со второй страницы
+    on_second_page = client.get(second_page).json()["results"][0]["id"]
+    with django_capture_on_commit_callbacks(execute=True):
+        PostComment.objects.create(post_id=on_second_page, author=user, content="hi")
+        Post.objects.filter(id=on_second_page).update(comments_count=1)
+    with django_assert_num_queries(0):
+        client.get(first_page)
+    response = client.get(second_page)
+    assert response.json()["results"][0]["post_comments_count"] == 1
+
+
+@pytest.mark.django_db
+def test_new_reply_purges_comment_pages(client, user, posts, django_capture_on_commit_callbacks):
+    root = PostComment.objects.create(post=posts[0], author=user, content="root")
+    url = reverse("post-comment-list", args=[posts[0].id])
+    assert client.get(url).data["results"][0]["replies"] == []
+    with django_capture_on_commit_callbacks(execute=True):
+        PostComment.objects.create(post=posts[0], author=user, content="reply", parent=root)
+        PostComment.objects.filter(id=root.id).update(replies_count=1)
+    assert [reply["content"] for reply in client.get(url).json()["results"][0]["replies"]] == ["reply"]
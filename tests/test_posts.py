@@ -0,0 +1,546 @@
+import pytest
+from django.urls import reverse
+from apps.users.models import User
+from apps.posts.models import Post, PostComment, PostLike, CommentLike
+from apps.posts.tasks import reconcile_counters
+from apps.posts.likes import liked_post_ids
+
+
+@pytest.fixture
+def posts(user):
+    """Несколько постов от разных авторов с лайками и комментариями"""
+    result = []
+    for i in range(5):
+        author = User.objects.create_user(username=f"author{i}", password="password", auth_type="email", email=f"author{i}@example.com")
+        post = Post.objects.create(author=author, image=f"post_images/{i}.jpg", caption=f"caption {i}")
+        PostLike.objects.create(post=post, author=author)
+        PostComment.objects.create(post=post, author=author, content="nice")
+        result.append(post)
+    PostLike.objects.create(post=result[0], author=user)
+    reconcile_counters()
+    return result
+
+
+@pytest.mark.django_db
+def test_post_list_query_count_anonymous(client, posts, django_assert_num_queries):
+    # курсорная пагинация: только один SELECT страницы, без COUNT(*)
+    with django_assert_num_queries(1):
+        response = client.get(reverse("post-list"))
+    assert response.status_code == 200
+    assert len(response.data["results"]) == 5
+    assert all(item["post_likes_count"] == 1 for item in response.data["results"][:4])
+    assert all(item["me_liked"] is False for item in response.data["results"])
+
+
+@pytest.mark.django_db
+def test_post_list_query_count_authenticated(authenticated_client, user, posts, django_assert_num_queries):
+    liked_post_ids(user, [posts[0].id])  # множество лайков пользователя уже в Redis
+    # пользователь из claims JWT, только SELECT страницы
+    with django_assert_num_queries(1):
+        response = authenticated_client.get(reverse("post-list"))
+    assert response.status_code == 200
+    liked = {item["id"]: item["me_liked"] for item in response.data["results"]}
+    assert liked[str(posts[0].id)] is True
+    assert sum(liked.values()) == 1
+
+
+@pytest.mark.django_db
+def test_post_list_query_count_does_not_grow(client, posts, django_assert_max_num_queries):
+    for i in range(10):
+        Post.objects.create(author=posts[0].author, image=f"post_images/extra{i}.jpg", caption="extra")
+    with django_assert_max_num_queries(1):
+        response = client.get(reverse("post-list"), {"page_size": 15})
+    assert len(response.data["results"]) == 15
+
+
+@pytest.mark.django_db
+def test_post_list_cursor_walks_forward_and_back(client, posts):
+    response = client.get(reverse("post-list"), {"page_size": 2})
+    assert "count" not in response.data
+    assert response.data["previous"] is None
+    seen = [item["id"] for item in response.data["results"]]
+    pages = [list(seen)]
+    next_url = response.data["next"]
+    while next_url:
+        response = client.get(next_url)
+        page = [item["id"] for item in response.data["results"]]
+        pages.append(page)
+        seen += page
+        next_url = response.data["next"]
+    assert seen == [str(post.id) for post in reversed(posts)]
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+    response = client.get(response.data["previous"])
+    assert [item["id"] for item in response.data["results"]] == pages[1]
+    response = client.get(response.data["previous"])
+    assert [item["id"] for item in response.data["results"]] == pages[0]
+    assert response.data["previous"] is None
+
+
+@pytest.mark.django_db
+def test_post_list_legacy_page_number_mode(client, posts, django_assert_num_queries):
+    with django_assert_num_queries(2):
+        response = client.get(reverse("post-list"), {"page": 1, "page_size": 2})
+    assert response.data["count"] == 5
+    assert len(response.data["results"]) == 2
+
+
+@pytest.mark.django_db
+def test_post_list_invalid_cursor(client, posts):
+    response = client.get(reverse("post-list"), {"cursor": "garbage"})
+    assert response.status_code == 404
+    # валидный base64/JSON, но не объект или с неверным id
+    from shared.custom_pagination import encode_cursor
+    for payload in (5, [], {"t": "2024-01-01T00:00:00+00:00", "i": "not-a-uuid"}, {"t": "2024-01-01T00:00:00+00:00", "i": 5}):
+        response = client.get(reverse("post-list"), {"cursor": encode_cursor(payload)})
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("plan", [{"Plan": {"Plan Rows": 42}}, [{"Plan": {"Plan Rows": 42}}]])
+def test_post_list_with_count(client, posts, monkeypatch, plan):
+    import json
+    from types import SimpleNamespace
+    from django.db.models import QuerySet
+    # Django на Postgres отдаёт объект плана, а не список
+    monkeypatch.setattr("shared.custom_pagination.connections", {"default": SimpleNamespace(vendor="postgresql")})
+    monkeypatch.setattr(QuerySet, "explain", lambda self, **options: json.dumps(plan))
+    response = client.get(reverse("post-list"), {"with_count": 1})
+    assert response.status_code == 200
+    assert response.data["count"] == 42
+
+
+@pytest.mark.django_db
+def test_post_detail_query_count(authenticated_client, user, posts, django_assert_num_queries):
+    post = posts[0]
+    liked_post_ids(user, [post.id])
+    with django_assert_num_queries(1):
+        response = authenticated_client.get(reverse("post-detail", args=[post.id]))
+    assert response.status_code == 200
+    assert response.data["post_likes_count"] == 2
+    assert response.data["post_comments_count"] == 1
+    assert response.data["me_liked"] is True
+    assert response.data["author"]["username"] == "author0"
+
+
+@pytest.mark.django_db
+def test_post_like_toggle_updates_counter(authenticated_client, posts):
+    post = posts[1]
+    url = reverse("post-like-toggle", args=[post.id])
+    response = authenticated_client.post(url)
+    assert response.status_code == 201
+    post.refresh_from_db()
+    assert post.likes_count == 2
+    response = authenticated_client.post(url)
+    assert response.status_code == 200
+    post.refresh_from_db()
+    assert post.likes_count == 1
+
+
+@pytest.mark.django_db
+def test_post_like_put_delete_are_idempotent(authenticated_client, user, posts, django_capture_on_commit_callbacks, django_assert_num_queries):
+    post = posts[1]
+    url = reverse("post-like", args=[post.id])
+    liked_post_ids(user, [post.id])  # множество лайков уже в Redis
+    authenticated_client.get(reverse("post-detail", args=[post.id]))
+    with django_capture_on_commit_callbacks(execute=True):
+        # пользователь из JWT + INSERT ... RETURNING + UPDATE счётчика (и SAVEPOINT/RELEASE теста)
+        with django_assert_num_queries(5):
+            assert authenticated_client.put(url).status_code == 201
+        assert authenticated_client.put(url).status_code == 200
+    post.refresh_from_db()
+    assert post.likes_count == 2
+    detail = authenticated_client.get(reverse("post-detail", args=[post.id])).data
+    assert detail["post_likes_count"] == 2 and detail["me_liked"] is True
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert authenticated_client.delete(url).status_code == 204
+        assert authenticated_client.delete(url).status_code == 204
+    post.refresh_from_db()
+    assert post.likes_count == 1
+    assert liked_post_ids(user, [post.id]) == set()
+
+    missing = reverse("post-like", args=["00000000-0000-0000-0000-000000000000"])
+    assert authenticated_client.put(missing).status_code == 404
+    assert authenticated_client.delete(missing).status_code == 404
+
+
+@pytest.mark.django_db
+def test_comment_like_put_delete(authenticated_client, posts):
+    comment = posts[0].comments.first()
+    url = reverse("comment-like", args=[comment.id])
+    assert authenticated_client.put(url).status_code == 201
+    assert authenticated_client.put(url).status_code == 200
+    comment.refresh_from_db()
+    assert comment.likes_count == 1
+    assert authenticated_client.delete(url).status_code == 204
+    assert authenticated_client.delete(url).status_code == 204
+    comment.refresh_from_db()
+    assert comment.likes_count == 0
+    assert not CommentLike.objects.filter(comment=comment).exists()
+
+@pytest.mark.django_db
+def test_comment_create_and_delete_update_counters(authenticated_client, posts):
+    post = posts[2]
+    response = authenticated_client.post(reverse("comment-create"), {"post": str(post.id), "content": "root"}, format="json")
+    assert response.status_code == 201
+    root_id = response.data["id"]
+    response = authenticated_client.post(reverse("comment-create"), {"post": str(post.id), "content": "reply", "parent": root_id}, format="json")
+    assert response.status_code == 201
+    post.refresh_from_db()
+    assert post.comments_count == 3
+    assert PostComment.objects.get(id=root_id).replies_count == 1
+
+    response = authenticated_client.delete(reverse("comment-detail", args=[root_id]))
+    assert response.status_code == 204
+    post.refresh_from_db()
+    assert post.comments_count == 1
+
+
+@pytest.mark.django_db
+def test_reconcile_counters_repairs_drift(posts):
+    Post.objects.filter(id=posts[3].id).update(likes_count=42, comments_count=0)
+    comment = posts[3].comments.first()
+    PostComment.objects.filter(id=comment.id).update(likes_count=7)
+    assert reconcile_counters(batch_size=2) == 2
+    posts[3].refresh_from_db()
+    comment.refresh_from_db()
+    assert (posts[3].likes_count, posts[3].comments_count) == (1, 1)
+    assert comment.likes_count == 0
+    assert reconcile_counters() == 0
+
+
+@pytest.mark.django_db
+def test_write_behind_likes_are_buffered_and_flushed(authenticated_client, posts, settings, fake_redis, django_capture_on_commit_callbacks):
+    from apps.posts.tasks import flush_post_likes
+    settings.POST_LIKES_WRITE_BEHIND = True
+    post = posts[1]
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.post(reverse("post-like-toggle", args=[post.id]))
+    assert response.status_code == 201
+    post.refresh_from_db()
+    assert post.likes_count == 1  # в базе ещё старое значение
+    assert fake_redis.sismember("post:likes:dirty", str(post.id))
+
+    response = authenticated_client.get(reverse("post-detail", args=[post.id]))
+    assert response.data["post_likes_count"] == 2
+    response = authenticated_client.get(reverse("post-list"))
+    counts = {item["id"]: item["post_likes_count"] for item in response.data["results"]}
+    assert counts[str(post.id)] == 2
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert flush_post_likes() == 1
+    post.refresh_from_db()
+    assert post.likes_count == 2
+    response = authenticated_client.get(reverse("post-detail", args=[post.id]))
+    assert response.data["post_likes_count"] == 2
+    assert flush_post_likes() == 0
+
+
+@pytest.mark.django_db
+def test_write_behind_deltas_spread_over_shards(posts, settings, fake_redis):
+    from apps.posts.counters import buffer_post_likes, pending_post_likes, flush_pending_post_likes
+    settings.POST_LIKES_WRITE_BEHIND = True
+    post = posts[2]
+    for _ in range(40):
+        buffer_post_likes(post.id, 1)
+    buffer_post_likes(post.id, -5)
+    assert len(fake_redis.keys(f"post:likes:pending:{post.id}:*")) > 1
+    assert pending_post_likes([post.id]) == {str(post.id): 35}
+    assert flush_pending_post_likes() == 1
+    post.refresh_from_db()
+    assert post.likes_count == 36
+    assert pending_post_likes([post.id]) == {}
+
+
+@pytest.mark.django_db
+def test_reconcile_leaves_buffered_likes_to_the_flush(authenticated_client, posts, settings, fake_redis, django_capture_on_commit_callbacks):
+    from apps.posts.counters import buffer_post_likes
+    from apps.posts.tasks import flush_post_likes
+    settings.POST_LIKES_WRITE_BEHIND = True
+    post = posts[1]
+    with django_capture_on_commit_callbacks(execute=True):
+        assert authenticated_client.post(reverse("post-like-toggle", args=[post.id])).status_code == 201
+    # reconcile между лайком и flush не должен засчитать его дважды
+    assert reconcile_counters() == 0
+    with django_capture_on_commit_callbacks(execute=True):
+        flush_post_likes()
+    post.refresh_from_db()
+    assert post.likes_count == 2
+    assert reconcile_counters() == 0
+
+    # батч, где дельты взаимно погасились, не останавливает сброс остальных
+    buffer_post_likes(posts[2].id, 1)
+    buffer_post_likes(posts[2].id, -1)
+    buffer_post_likes(posts[3].id, 1)
+    assert flush_post_likes(batch_size=1) == 2
+    assert not fake_redis.exists("post:likes:dirty")
+
+
+@pytest.fixture
+def thread(posts, user):
+    """Цепочка ответов глубиной 4 и несколько ответов на корень"""
+    post = posts[4]
+    root = PostComment.objects.create(post=post, author=user, content="root")
+    node = root
+    chain = [root]
+    for i in range(4):
+        node = PostComment.objects.create(post=post, author=posts[i].author, content=f"level {i + 1}", parent=node)
+        chain.append(node)
+    for i in range(3):
+        PostComment.objects.create(post=post, author=user, content=f"sibling {i}", parent=root)
+    CommentLike.objects.create(comment=chain[2], author=user)
+    reconcile_counters()
+    return chain
+
+
+def _depth(data):
+    return 1 + max((_depth(reply) for reply in data["replies"]), default=0)
+
+
+@pytest.mark.django_db
+def test_comment_path_and_depth(thread):
+    assert [comment.depth for comment in thread] == [0, 1, 2, 3, 4]
+    assert thread[3].path == "".join(f"{comment.id.hex}/" for comment in thread[:4])
+    subtree = PostComment.objects.filter(path__startswith=thread[1].path)
+    assert set(subtree) == set(thread[1:])
+
+
+@pytest.mark.django_db
+def test_comment_detail_loads_thread_in_fixed_queries(authenticated_client, thread, django_assert_num_queries):
+    # комментарий + всё поддерево + лайки пользователя
+    with django_assert_num_queries(3):
+        response = authenticated_client.get(reverse("comment-detail", args=[thread[0].id]))
+    assert response.status_code == 200
+    assert _depth(response.data) == 5
+    assert len(response.data["replies"]) == 4
+    level2 = response.data["replies"][0]["replies"][0]
+    assert level2["id"] == str(thread[2].id)
+    assert level2["me_liked"] is True
+    assert level2["likes_count"] == 1
+
+
+@pytest.mark.django_db
+def test_comment_thread_limits(authenticated_client, thread, settings):
+    settings.COMMENT_THREAD_MAX_DEPTH = 2
+    settings.COMMENT_THREAD_REPLIES_PER_LEVEL = 2
+    response = authenticated_client.get(reverse("comment-detail", args=[thread[0].id]))
+    assert _depth(response.data) == 3
+    assert len(response.data["replies"]) == 2
+    assert response.data["replies_count"] == 4
+
+
+@pytest.mark.django_db
+def test_comment_thread_keeps_reply_moved_under_newer_comment(authenticated_client, thread):
+    sibling = PostComment.objects.get(content="sibling 2")
+    moved = thread[4]
+    moved.parent = sibling  # родитель новее ответа
+    moved.save()
+    response = authenticated_client.get(reverse("comment-detail", args=[thread[0].id]))
+    replies = {reply["content"]: reply for reply in response.data["replies"]}
+    assert [reply["id"] for reply in replies["sibling 2"]["replies"]] == [str(moved.id)]
+
+
+@pytest.mark.django_db
+def test_comment_move_keeps_counters(authenticated_client, thread, posts):
+    sibling = PostComment.objects.get(content="sibling 0")
+    url = reverse("comment-detail", args=[sibling.id])
+    payload = {"post": str(sibling.post_id), "content": "moved", "parent": str(thread[1].id)}
+    assert authenticated_client.put(url, payload, format="json").status_code == 200
+    # счётчики ответов старого и нового родителя сразу верны, без reconcile
+    assert PostComment.objects.get(id=thread[0].id).replies_count == 3
+    assert PostComment.objects.get(id=thread[1].id).replies_count == 2
+    # перенос в другой пост запрещён: ответы остались бы в старом
+    payload["post"] = str(posts[0].id)
+    payload.pop("parent")
+    assert authenticated_client.put(url, payload, format="json").status_code == 400
+    assert PostComment.objects.get(id=sibling.id).post_id == thread[0].post_id
+
+
+@pytest.mark.django_db
+def test_comment_list_query_count(client, thread, django_assert_num_queries):
+    # страница + поддеревья всех комментариев страницы одним запросом
+    with django_assert_num_queries(2):
+        response = client.get(reverse("comment-list"), {"page_size": 20})
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_comment_reply_must_match_post(authenticated_client, thread, posts):
+    payload = {"post": str(posts[0].id), "content": "wrong post", "parent": str(thread[0].id)}
+    response = authenticated_client.post(reverse("comment-create"), payload, format="json")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_post_comments_top_level_with_preview(client, thread, posts, settings, django_assert_num_queries):
+    settings.COMMENT_REPLY_PREVIEW = 2
+    post = posts[4]
+    # страница + превью ответов (оконная функция); лайков для анонима не запрашиваем
+    with django_assert_num_queries(2):
+        response = client.get(reverse("post-comment-list", args=[post.id]))
+    assert response.status_code == 200
+    ids = [item["id"] for item in response.data["results"]]
+    assert ids == [str(post.comments.get(content="nice").id), str(thread[0].id)]
+    root = response.data["results"][1]
+    assert root["replies_count"] == 4
+    assert [reply["content"] for reply in root["replies"]] == ["level 1", "sibling 0"]
+    assert root["replies"][0]["replies"] == []
+    assert root["replies"][0]["replies_count"] == 1
+
+
+@pytest.mark.django_db
+def test_comment_replies_endpoint_paginates(client, thread):
+    url = reverse("comment-replies", args=[thread[0].id])
+    response = client.get(url, {"page_size": 3})
+    assert [item["content"] for item in response.data["results"]] == ["level 1", "sibling 0", "sibling 1"]
+    assert response.data["results"][0]["replies"][0]["content"] == "level 2"
+    response = client.get(response.data["next"])
+    assert [item["content"] for item in response.data["results"]] == ["sibling 2"]
+    assert response.data["next"] is None
+
+
+@pytest.mark.django_db
+def test_post_comments_unknown_post(client, db):
+    import uuid
+    response = client.get(reverse("post-comment-list", args=[uuid.uuid4()]))
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_liked_set_is_loaded_once_and_kept_current(authenticated_client, user, posts, fake_redis, django_capture_on_commit_callbacks, django_assert_num_queries):
+    key = f"user:{user.pk}:liked_posts"
+    assert liked_post_ids(user, [post.id for post in posts]) == {posts[0].id}
+    assert fake_redis.exists(key)
+    with django_assert_num_queries(0):
+        assert liked_post_ids(user, [posts[1].id]) == set()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.post(reverse("post-like-toggle", args=[posts[1].id]))
+        authenticated_client.post(reverse("post-like-toggle", args=[posts[0].id]))
+    with django_assert_num_queries(0):
+        assert liked_post_ids(user, [post.id for post in posts]) == {posts[1].id}
+
+    response = authenticated_client.get(reverse("post-list"))
+    liked = [item["id"] for item in response.data["results"] if item["me_liked"]]
+    assert liked == [str(posts[1].id)]
+
+
+@pytest.mark.django_db
+def test_liked_set_load_racing_a_like_is_not_stored(user, posts, fake_redis, monkeypatch):
+    from apps.posts import likes
+    key = f"user:{user.pk}:liked_posts"
+
+    class Racing:
+        class objects:
+            @staticmethod
+            def filter(**kwargs):
+                # лайк фиксируется, пока множество читается из базы
+                likes._apply(key, f"{key}:version", True, [str(posts[1].id)])
+                return PostLike.objects.filter(**kwargs)
+
+    with monkeypatch.context() as patched:
+        patched.setitem(likes.SOURCES, "posts", (Racing, "post_id"))
+        assert liked_post_ids(user, [posts[0].id]) == {posts[0].id}
+    assert not fake_redis.exists(key)
+    assert liked_post_ids(user, [posts[0].id]) == {posts[0].id}
+    assert fake_redis.exists(key)
+
+
+@pytest.mark.django_db
+def test_large_liked_sets_are_checked_in_the_database(user, posts, settings, fake_redis, django_assert_num_queries):
+    settings.LIKED_SET_MAX_SIZE = 0
+    assert liked_post_ids(user, [post.id for post in posts]) == {posts[0].id}
+    assert fake_redis.smembers(f"user:{user.pk}:liked_posts") == {"*"}
+    with django_assert_num_queries(1):
+        assert liked_post_ids(user, [posts[0].id, posts[1].id]) == {posts[0].id}
+
+
+@pytest.mark.django_db
+def test_post_batch_keeps_order_and_reports_missing(client, posts, django_assert_num_queries):
+    missing = "00000000-0000-0000-0000-000000000000"
+    ids = [str(posts[3].id), missing, str(posts[0].id), str(posts[3].id)]
+    with django_assert_num_queries(1):
+        response = client.post(reverse("post-batch"), {"ids": ids}, format="json")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.data["results"]] == [str(posts[3].id), str(posts[0].id)]
+    assert [str(id) for id in response.data["missing"]] == [missing]
+
+    too_many = {"ids": [missing] * 51}
+    assert client.post(reverse("post-batch"), too_many, format="json").status_code == 400
+
+
+@pytest.mark.django_db
+def test_post_like_batch(authenticated_client, user, posts, django_capture_on_commit_callbacks):
+    missing = "00000000-0000-0000-0000-000000000000"
+    liked_post_ids(user, [post.id for post in posts])  # множество лайков уже в Redis
+    authenticated_client.get(reverse("post-detail", args=[posts[0].id]))  # деталь поста в кэше
+    operations = [
+        {"post_id": str(posts[0].id), "action": "unlike"},
+        {"post_id": str(posts[1].id), "action": "like"},
+        {"post_id": str(posts[2].id), "action": "unlike"},  # лайка не было
+        {"post_id": str(posts[3].id), "action": "like"},
+        {"post_id": str(posts[3].id), "action": "unlike"},  # последняя операция побеждает
+        {"post_id": missing, "action": "like"},
+    ]
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.post(reverse("post-like-batch"), {"operations": operations}, format="json")
+    assert response.status_code == 200
+    assert response.data["liked"] == [posts[1].id]
+    assert response.data["unliked"] == [posts[0].id]
+    assert [str(id) for id in response.data["missing"]] == [missing]
+
+    assert set(PostLike.objects.filter(author=user).values_list("post_id", flat=True)) == {posts[1].id}
+    assert [Post.objects.get(id=post.id).likes_count for post in posts[:4]] == [1, 2, 1, 1]
+    assert liked_post_ids(user, [post.id for post in posts]) == {posts[1].id}
+    detail = authenticated_client.get(reverse("post-detail", args=[posts[0].id])).data
+    assert detail["post_likes_count"] == 1 and detail["me_liked"] is False
+
+    # повтор ничего не меняет
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.post(reverse("post-like-batch"), {"operations": operations}, format="json")
+    assert response.data["liked"] == response.data["unliked"] == []
+    assert Post.objects.get(id=posts[1].id).likes_count == 2
+
+
+def test_post_like_batch_runs_one_insert_and_one_delete(authenticated_client, user, posts, django_capture_on_commit_callbacks):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    operations = [{"post_id": str(post.id), "action": "like"} for post in posts[1:]]
+    operations.append({"post_id": str(posts[0].id), "action": "unlike"})
+    with CaptureQueriesContext(connection) as queries, django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.post(reverse("post-like-batch"), {"operations": operations}, format="json")
+    assert sorted(response.data["liked"]) == sorted(post.id for post in posts[1:])
+    assert response.data["unliked"] == [posts[0].id]
+    # сколько бы ни было операций — один INSERT и один DELETE лайков
+    statements = [query["sql"].replace('"', "") for query in queries.captured_queries]
+    assert sum(sql.startswith("INSERT INTO post_likes") for sql in statements) == 1
+    assert sum(sql.startswith("DELETE FROM post_likes") for sql in statements) == 1
+    assert [Post.objects.get(id=post.id).likes_count for post in posts] == [1, 2, 2, 2, 2]
+
+
+@pytest.mark.django_db
+def test_comment_change_likes(user, posts, django_capture_on_commit_callbacks):
+    from apps.posts import likes
+    comments = list(PostComment.objects.order_by("created_at"))
+    with django_capture_on_commit_callbacks(execute=True):
+        liked, unliked = likes.change_likes("comments", user.pk, {comments[0].id: True, comments[1].id: True, comments[2].id: False})
+    assert liked == [comments[0].id, comments[1].id] and unliked == []
+    assert [PostComment.objects.get(id=c.id).likes_count for c in comments[:3]] == [1, 1, 0]
+    with django_capture_on_commit_callbacks(execute=True):
+        liked, unliked = likes.change_likes("comments", user.pk, {comments[0].id: False, comments[1].id: True})
+    assert liked == [] and unliked == [comments[0].id]
+    assert [PostComment.objects.get(id=c.id).likes_count for c in comments[:2]] == [0, 1]
+
+
+@pytest.mark.django_db
+def test_post_like_batch_counts_only_changed_rows(authenticated_client, user, posts, django_capture_on_commit_callbacks):
+    liked_post_ids(user, [posts[2].id])  # в Redis лайка ещё нет
+    PostLike.objects.create(author=user, post=posts[2])  # параллельный лайк, счётчик не тронут
+    before = Post.objects.get(id=posts[2].id).likes_count
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.post(
+            reverse("post-like-batch"), {"operations": [{"post_id": str(posts[2].id), "action": "like"}]}, format="json"
+        )
+    assert response.data["liked"] == []
+    assert Post.objects.get(id=posts[2].id).likes_count == before
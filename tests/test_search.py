@@ -0,0 +1,71 @@
+import pytest
+from django.urls import reverse
+from apps.users.models import User
+from apps.posts.models import Post, PostComment
+
+
+@pytest.fixture
+def captions(user):
+    """Посты с подписями для поиска"""
+    author = User.objects.create_user(username="sunset_hunter", password="password", auth_type="email", email="hunter@example.com")
+    texts = ["sunset over the sea", "sunset sunset sunset", "morning coffee", "sea breeze", "red sunset in the mountains"]
+    return [Post.objects.create(author=author, image=f"post_images/{i}.jpg", caption=text) for i, text in enumerate(texts)]
+
+
+@pytest.mark.django_db
+def test_search_posts_ranked(client, captions):
+    response = client.get(reverse("post-search"), {"q": "sunset"})
+    assert response.status_code == 200
+    found = [item["caption"] for item in response.data["results"]]
+    assert set(found) == {"sunset over the sea", "sunset sunset sunset", "red sunset in the mountains"}
+    assert found[0] == "sunset sunset sunset"
+
+
+@pytest.mark.django_db
+def test_search_cursor_pages_do_not_overlap(client, captions):
+    seen = []
+    url, params = reverse("post-search"), {"q": "sunset", "page_size": 1}
+    while url:
+        response = client.get(url, params)
+        seen += [item["id"] for item in response.data["results"]]
+        url, params = response.data["next"], None
+    assert len(seen) == len(set(seen)) == 3
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("kind", ["posts", "users"])
+def test_search_invalid_cursor(client, captions, kind):
+    from shared.custom_pagination import encode_cursor
+    for payload in ({"r": 1.0, "i": "nope"}, {"r": 1.0, "i": 5}, {"r": "x", "i": str(captions[0].id)}):
+        response = client.get(reverse("post-search"), {"q": "sunset", "type": kind, "cursor": encode_cursor(payload)})
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_search_index_follows_edits_and_deletes(client, captions):
+    post = captions[2]
+    post.caption = "sunset espresso"
+    post.save()
+    captions[0].delete()
+    found = {item["caption"] for item in client.get(reverse("post-search"), {"q": "sunset"}).data["results"]}
+    assert found == {"sunset espresso", "sunset sunset sunset", "red sunset in the mountains"}
+    assert client.get(reverse("post-search"), {"q": "coffee"}).data["results"] == []
+
+
+@pytest.mark.django_db
+def test_search_comments_and_users(client, user, captions):
+    PostComment.objects.create(post=captions[0], author=user, content="What a beautiful view")
+    response = client.get(reverse("post-search"), {"q": "beautif", "type": "comments"})
+    assert [item["content"] for item in response.data["results"]] == ["What a beautiful view"]
+
+    response = client.get(reverse("post-search"), {"q": "sunset", "type": "users"})
+    assert [item["username"] for item in response.data["results"]] == ["sunset_hunter"]
+    response = client.get(reverse("post-search"), {"q": "hunt", "type": "users"})
+    assert [item["username"] for item in response.data["results"]] == ["sunset_hunter"]
+
+
+@pytest.mark.django_db
+def test_search_ignores_query_syntax(client, captions):
+    response = client.get(reverse("post-search"), {"q": 'sun" OR NEAR(*'})
+    assert response.status_code == 200
+    assert client.get(reverse("post-search")).status_code == 400
@@ -0,0 +1,86 @@
+import pytest
+from django.urls import reverse
+from apps.posts.models import Post
+from shared import images
+from shared.models import Blob
+
+
+@pytest.mark.django_db
+def test_identical_uploads_share_one_blob(authenticated_client, media, django_capture_on_commit_callbacks, image_file):
+    ids = []
+    for name in ("first.png", "repost.png"):
+        with django_capture_on_commit_callbacks(execute=True):
+            response = authenticated_client.post(reverse("post-create"), {"image": image_file(name), "caption": name}, format="multipart")
+        assert response.status_code == 201
+        ids.append(response.data["id"])
+
+    first, second = Post.objects.filter(id__in=ids)
+    assert first.image.name == second.image.name
+    assert first.image.name.startswith("blobs/")
+    blob = Blob.objects.get()
+    assert blob.refcount == 2
+    assert blob.derivatives["blurhash"] == first.image_blurhash == second.image_blurhash
+    assert first.image_variants == second.image_variants
+
+    path = media / blob.name
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.delete(reverse("post-detail", args=[ids[0]]))
+    assert path.exists()
+    assert Blob.objects.get().refcount == 1
+
+    variant = media / blob.derivatives["variants"]["webp"]["320"]
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.delete(reverse("post-detail", args=[ids[1]]))
+    assert not path.exists()
+    assert not variant.exists()
+    assert not Blob.objects.exists()
+
+
+@pytest.mark.django_db
+def test_processed_content_is_not_rendered_again(user, media, monkeypatch, image_file):
+    from apps.posts.tasks import generate_post_derivatives
+    first = Post.objects.create(author=user, image=image_file("same.png"), caption="one")
+    assert generate_post_derivatives(str(first.id))
+
+    def fail(*args):
+        raise AssertionError("variant rendered twice")
+    monkeypatch.setattr(images, "render_variant", fail)
+    second = Post.objects.create(author=user, image=image_file("again.png"), caption="two")
+    assert generate_post_derivatives(str(second.id))
+    second.refresh_from_db()
+    assert second.image_variants == Post.objects.get(id=first.id).image_variants
+
+
+@pytest.mark.django_db
+def test_replacing_photo_releases_the_old_blob(authenticated_client, user, media, django_capture_on_commit_callbacks, image_file):
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.put(reverse("users:change_photo"), {"photo": image_file("same.png")}, format="multipart")
+    user.refresh_from_db()
+    old = user.photo.name
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.put(reverse("users:change_photo"), {"photo": image_file("same.png", color=(0, 0, 0))}, format="multipart")
+    user.refresh_from_db()
+    assert user.photo.name != old
+    assert not (media / old).exists()
+    assert list(Blob.objects.values_list("name", "refcount")) == [(user.photo.name, 1)]
+
+
+@pytest.mark.django_db
+def test_concurrent_first_upload_adds_a_reference(user, media, monkeypatch, image_file):
+    import hashlib
+    image = image_file("same.png")
+    content_hash = hashlib.sha256(image.read()).hexdigest()
+    # параллельная загрузка тех же байтов вставила строку сразу после нашего UPDATE
+    Blob.objects.create(hash=content_hash, name=f"blobs/{content_hash[:2]}/{content_hash}.png", size=image.size, refcount=1)
+    filter_ = Blob.objects.filter
+    calls = []
+
+    def late_filter(*args, **kwargs):
+        calls.append(kwargs)
+        return Blob.objects.none() if len(calls) == 1 else filter_(*args, **kwargs)
+
+    monkeypatch.setattr(Blob.objects, "filter", late_filter)
+    post = Post.objects.create(author=user, image=image, caption="race")
+    blob = Blob.objects.get()
+    assert post.image.name == blob.name
+    assert blob.refcount == 2
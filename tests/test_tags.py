@@ -0,0 +1,90 @@
+from io import StringIO
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from apps.users.models import User
+from apps.posts.models import Post, PostComment, Hashtag, PostHashtag, Mention
+from apps.posts.tags import extract_hashtags, extract_mentions
+
+
+def make_post(author, caption, i=0):
+    return Post.objects.create(author=author, image=f"post_images/{i}.jpg", caption=caption)
+
+
+def counts():
+    return dict(Hashtag.objects.values_list("name", "posts_count"))
+
+
+def test_extract():
+    assert extract_hashtags("#Sun and #sea, #sun again, a#b, &#39;") == ["sun", "sea"]
+    assert extract_mentions("hi @anna, @bob. and mail me@example.com") == ["anna", "bob"]
+
+
+@pytest.mark.django_db
+def test_tags_follow_caption_edits_and_deletes(user):
+    post = make_post(user, "#sun #sea")
+    other = make_post(user, "#sun", 1)
+    assert counts() == {"sun": 2, "sea": 1}
+
+    post.caption = "#sea #mountains"
+    post.save()
+    assert counts() == {"sun": 1, "sea": 1, "mountains": 1}
+    assert set(post.post_hashtags.values_list("hashtag__name", flat=True)) == {"sea", "mountains"}
+
+    other.delete()
+    assert counts() == {"sun": 0, "sea": 1, "mountains": 1}
+
+
+@pytest.mark.django_db
+def test_mentions_in_captions_and_comments(user):
+    anna = User.objects.create_user(username="anna", password="password", auth_type="email", email="anna@example.com")
+    post = make_post(user, "with @anna and @nobody")
+    comment = PostComment.objects.create(post=post, author=user, content="@anna @testuser look")
+    assert set(Mention.objects.values_list("user__username", "comment")) == {
+        ("anna", None), ("anna", comment.pk), ("testuser", comment.pk),
+    }
+
+    comment.content = "no one"
+    comment.save()
+    assert list(Mention.objects.values_list("user", "comment")) == [(anna.pk, None)]
+
+
+@pytest.mark.django_db
+def test_tag_feed_paginates_newest_first(client, user):
+    posts = [make_post(user, f"day {i} #travel", i) for i in range(3)]
+    make_post(user, "#food", 9)
+    response = client.get(reverse("post-tag-feed", args=["Travel"]), {"page_size": 2})
+    assert response.status_code == 200
+    assert response.data["tag"] == "travel"
+    assert response.data["posts_count"] == 3
+    assert [item["id"] for item in response.data["results"]] == [str(posts[2].pk), str(posts[1].pk)]
+
+    rest = client.get(response.data["next"])
+    assert [item["id"] for item in rest.data["results"]] == [str(posts[0].pk)]
+    assert client.get(reverse("post-tag-feed", args=["unknown"])).status_code == 404
+
+
+@pytest.mark.django_db
+def test_tag_feed_page_cache_sees_new_posts(client, user, django_capture_on_commit_callbacks):
+    url = reverse("post-tag-feed", args=["travel"])
+    make_post(user, "#travel")
+    assert len(client.get(url).json()["results"]) == 1
+    with django_capture_on_commit_callbacks(execute=True):
+        make_post(user, "#travel again", 1)
+    assert len(client.get(url).json()["results"]) == 2
+
+
+@pytest.mark.django_db
+def test_backfill_tags(user):
+    User.objects.create_user(username="anna", password="password", auth_type="email", email="anna@example.com")
+    posts = [make_post(user, f"#sun #day{i} @anna", i) for i in range(5)]
+    # строки, созданные до появления индекса
+    PostHashtag.objects.all().delete()
+    Mention.objects.all().delete()
+    Hashtag.objects.update(posts_count=0)
+    PostComment.objects.bulk_create([PostComment(post=posts[0], author=user, content="@anna hi")])
+
+    call_command("backfill_tags", chunk_size=2, stdout=StringIO())
+    assert counts()["sun"] == 5
+    assert PostHashtag.objects.count() == 10
+    assert Mention.objects.count() == 6
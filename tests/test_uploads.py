@@ -0,0 +1,111 @@
+import base64
+import json
+import pytest
+from django.urls import reverse
+from moto import mock_aws
+from apps.posts.models import Post, PostUpload, UploadStatus
+from shared import object_storage
+
+
+def _policy_conditions(fields):
+    return json.loads(base64.b64decode(fields["policy"]))["conditions"]
+
+
+@pytest.fixture
+def bucket(settings, media, monkeypatch):
+    """Бакет для прямых загрузок в moto"""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    settings.DIRECT_UPLOAD_PART_SIZE = 5 * 1024 * 1024
+    with mock_aws():
+        monkeypatch.setattr(object_storage, "_client", None)
+        client = object_storage.get_s3_client()
+        client.create_bucket(Bucket=settings.DIRECT_UPLOAD_BUCKET)
+        yield client
+    object_storage._client = None
+
+
+@pytest.mark.django_db
+def test_direct_upload_creates_post(authenticated_client, bucket, settings, django_capture_on_commit_callbacks, image_bytes):
+    data = image_bytes(size=(900, 600))
+    response = authenticated_client.post(reverse("post-upload-create"), {"content_type": "image/jpeg", "size": len(data)}, format="json")
+    assert response.status_code == 201
+    assert response.data["method"] == "POST"
+    assert ["content-length-range", 1, len(data)] in _policy_conditions(response.data["fields"])
+
+    upload = PostUpload.objects.get(id=response.data["id"])
+    # файл ещё не загружен: finalize можно повторить позже
+    response = authenticated_client.post(reverse("post-upload-finalize", args=[upload.id]), {"caption": "early"}, format="json")
+    assert response.status_code == 400
+    upload.refresh_from_db()
+    assert upload.status == UploadStatus.Pending
+    bucket.put_object(Bucket=settings.DIRECT_UPLOAD_BUCKET, Key=upload.key, Body=data)
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        response = authenticated_client.post(reverse("post-upload-finalize", args=[upload.id]), {"caption": "direct"}, format="json")
+    assert response.status_code == 202
+    assert response.data["status"] == UploadStatus.Finalized
+    # пост появляется только после переноса файла в media storage
+    assert not Post.objects.exists()
+    # повторный finalize не создаёт второй пост
+    response = authenticated_client.post(reverse("post-upload-finalize", args=[upload.id]), {"caption": "again"}, format="json")
+    assert response.status_code == 400
+    with django_capture_on_commit_callbacks(execute=True):
+        for callback in callbacks:
+            callback()
+
+    response = authenticated_client.get(reverse("post-upload-detail", args=[upload.id]))
+    assert response.data["status"] == UploadStatus.Processed
+    post = Post.objects.get(id=response.data["post"])
+    assert post.caption == "direct"
+    upload.refresh_from_db()
+    assert upload.status == UploadStatus.Processed
+    assert post.image.name.startswith("blobs/")
+    assert (post.image_width, post.image_height) == (900, 600)
+    assert "Contents" not in bucket.list_objects_v2(Bucket=settings.DIRECT_UPLOAD_BUCKET)
+
+
+@pytest.mark.django_db
+def test_multipart_upload_can_resume(authenticated_client, bucket, settings, django_capture_on_commit_callbacks, image_bytes):
+    data = image_bytes(size=(900, 600))
+    data += b"\0" * (settings.DIRECT_UPLOAD_PART_SIZE + 1024 - len(data))
+    response = authenticated_client.post(reverse("post-upload-create"), {"content_type": "image/jpeg", "size": len(data)}, format="json")
+    assert response.status_code == 201
+    assert response.data["total_parts"] == 2
+    assert response.data["uploaded_parts"] == []
+
+    upload = PostUpload.objects.get(id=response.data["id"])
+    part_size = settings.DIRECT_UPLOAD_PART_SIZE
+    bucket.upload_part(Bucket=settings.DIRECT_UPLOAD_BUCKET, Key=upload.key, UploadId=upload.multipart_id, PartNumber=1, Body=data[:part_size])
+
+    # клиент прервался: запрашивает ссылку только на недостающую часть
+    response = authenticated_client.post(reverse("post-upload-parts", args=[upload.id]), {"parts": [2]}, format="json")
+    assert response.status_code == 200
+    assert list(response.data["parts"]) == [2]
+    assert [part["part_number"] for part in response.data["uploaded_parts"]] == [1]
+
+    bucket.upload_part(Bucket=settings.DIRECT_UPLOAD_BUCKET, Key=upload.key, UploadId=upload.multipart_id, PartNumber=2, Body=data[part_size:])
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.post(reverse("post-upload-finalize", args=[upload.id]), {"caption": "big"}, format="json")
+    assert response.status_code == 202
+    upload.refresh_from_db()
+    assert upload.status == UploadStatus.Processed
+
+
+@pytest.mark.django_db
+def test_upload_rejects_oversized_and_invalid_files(authenticated_client, bucket, settings, django_capture_on_commit_callbacks):
+    response = authenticated_client.post(
+        reverse("post-upload-create"), {"content_type": "image/jpeg", "size": settings.DIRECT_UPLOAD_MAX_SIZE + 1}, format="json"
+    )
+    assert response.status_code == 400
+    response = authenticated_client.post(reverse("post-upload-create"), {"content_type": "image/gif", "size": 10}, format="json")
+    assert response.status_code == 400
+
+    response = authenticated_client.post(reverse("post-upload-create"), {"content_type": "image/jpeg", "size": 100}, format="json")
+    upload = PostUpload.objects.get(id=response.data["id"])
+    bucket.put_object(Bucket=settings.DIRECT_UPLOAD_BUCKET, Key=upload.key, Body=b"not an image")
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.post(reverse("post-upload-finalize", args=[upload.id]), {"caption": "bad"}, format="json")
+    assert response.status_code == 202
+    upload.refresh_from_db()
+    assert upload.status == UploadStatus.Failed
+    assert not Post.objects.exists()
@@ -6,6 +6,10 @@ from rest_framework.exceptions import ValidationError
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
+from apps.users import codes
+from rest_framework.test import APIClient
+from apps.users.tasks import purge_confirmations
+from shared.models import OutboxMessage
 
 @pytest.mark.django_db
 def test_signup_serializer_invalid_email():
@@ -46,7 +50,11 @@ def test_signup_sends_email(mock_send_email, client):
     payload = {"email_or_phone": "mockuser@example.com"}
     response = client.post(url, payload, format="json")
     assert response.status_code == 200
-    mock_send_email.assert_called_once()
+    # письмо уходит через outbox, а не из запроса
+    mock_send_email.assert_not_called()
+    message = OutboxMessage.objects.get()
+    assert message.task == "apps.users.tasks.send_verification_email"
+    assert message.args[0] == "mockuser@example.com"
 
 @pytest.mark.django_db
 def test_verify_code_serializer_invalid_code():
@@ -62,59 +70,122 @@ def test_verify_code_serializer_valid_code():
 @pytest.mark.django_db
 def test_verify_code_view(client):
     user = User.objects.create_user(email="user@example.com", auth_type=AuthType.Email, username="testuser")
-    UserConfirmation.objects.create(user=user, code="1234", auth_type=AuthType.Email)
+    codes.issue(user, AuthType.Email)
     url = reverse("users:verify_code")
     payload = {"code": "1234"}
     response = client.post(url, payload, format="json")
     assert response.status_code == 401
 
 @pytest.mark.django_db
-def test_verify_code_view_authenticated(authenticated_client, user):
-    UserConfirmation.objects.create(user=user, code="1234", auth_type=AuthType.Email)
+def test_verify_code_view_authenticated(authenticated_client, user, fake_redis):
+    code = codes.issue(user, AuthType.Email)
+    # код живёт в Redis EMAIL_TIME минут, таблица не растёт
+    assert 0 < fake_redis.ttl(f"user:{user.pk}:verify_code") <= 5 * 60
+    assert not UserConfirmation.objects.exists()
     url = reverse("users:verify_code")
-    payload = {"code": "1234"}
+    payload = {"code": code}
     response = authenticated_client.post(url, payload, format="json")
     assert response.status_code == 200
     user.refresh_from_db()
     assert user.user_status == UserStatus.CodeVerified
     assert user.username == "testuser"
+    # код одноразовый
+    assert not fake_redis.exists(f"user:{user.pk}:verify_code")
 
 
 @pytest.mark.django_db
 def test_verify_code_view_invalid_code(authenticated_client, user):
-    UserConfirmation.objects.create(user=user, code="1234", auth_type=AuthType.Email)
+    code = codes.issue(user, AuthType.Email)
     url = reverse("users:verify_code")
-    payload = {"code": "4321"}
+    payload = {"code": "0000" if code != "0000" else "1111"}
     response = authenticated_client.post(url, payload, format="json")
     assert response.status_code == 400
     user.refresh_from_db()
     assert user.user_status == UserStatus.New
 
 @pytest.mark.django_db
-def test_verify_code_expired_time(authenticated_client, user):
-    UserConfirmation.objects.create(user=user, code="1234", auth_type=AuthType.Email)
+def test_verify_code_expired_time(authenticated_client, user, fake_redis):
+    code = codes.issue(user, AuthType.Email)
+    fake_redis.delete(f"user:{user.pk}:verify_code")  # TTL истёк
     url = reverse("users:verify_code")
-    payload = {"code": "1234"}
-    with patch("apps.users.views.timezone") as mock_timezone:
-        mock_timezone.now.return_value = timezone.now() + timedelta(minutes=10)
-        response = authenticated_client.post(url, payload, format="json")
+    payload = {"code": code}
+    response = authenticated_client.post(url, payload, format="json")
     
     # проверяем, что код истёк
-    assert response.status_code == 400  # или другой статус, который возвращает view
+    assert response.status_code == 400
+    assert response.data["detail"] == "Code expired"
     user.refresh_from_db()
     assert user.user_status != UserStatus.CodeVerified
 
 
 @pytest.mark.django_db
-def test_new_verify_code_view(authenticated_client, user):
+def test_verify_code_attempts_are_limited(authenticated_client, user, settings):
+    code = codes.issue(user, AuthType.Email)
+    wrong = {"code": "0000" if code != "0000" else "1111"}
+    url = reverse("users:verify_code")
+    for _ in range(settings.VERIFICATION_CODE_MAX_ATTEMPTS):
+        assert authenticated_client.post(url, wrong, format="json").status_code == 400
+    # после лимита не проходит даже верный код
+    assert authenticated_client.post(url, {"code": code}, format="json").status_code == 429
+    user.refresh_from_db()
+    assert user.user_status == UserStatus.New
+    # запрос нового кода, пока старый действует, не сбрасывает счётчик
+    assert authenticated_client.post(reverse("users:new_verify_code"), format="json").status_code == 400
+    assert authenticated_client.post(url, {"code": code}, format="json").status_code == 429
+
+
+@pytest.mark.django_db
+def test_verify_code_db_store_attempts_are_limited(authenticated_client, user, settings):
+    settings.VERIFICATION_CODE_STORE = "db"
+    UserConfirmation.objects.create(user=user, code="1234", auth_type=AuthType.Email)
+    url = reverse("users:verify_code")
+    for _ in range(settings.VERIFICATION_CODE_MAX_ATTEMPTS):
+        assert authenticated_client.post(url, {"code": "4321"}, format="json").status_code == 400
+    assert authenticated_client.post(url, {"code": "1234"}, format="json").status_code == 429
+    assert UserConfirmation.objects.get().attempts == settings.VERIFICATION_CODE_MAX_ATTEMPTS
+
+
+@pytest.mark.django_db
+def test_new_verify_code_view(authenticated_client, user, fake_redis):
     url = reverse("users:new_verify_code")
     response = authenticated_client.post(url, format="json")
     assert response.status_code == 200
-    assert UserConfirmation.objects.filter(user=user).exists()
+    assert fake_redis.exists(f"user:{user.pk}:verify_code")
     response2 = authenticated_client.post(url, format="json")
     assert response2.status_code == 400  # Уже есть действующий код 
+
+
+@pytest.mark.django_db
+def test_verify_code_db_store(authenticated_client, user, settings):
+    settings.VERIFICATION_CODE_STORE = "db"
+    UserConfirmation.objects.create(user=user, code="1234", auth_type=AuthType.Email)
+    url = reverse("users:verify_code")
+    assert authenticated_client.post(url, {"code": "4321"}, format="json").status_code == 400
+    with patch("apps.users.codes.timezone") as mock_timezone:
+        mock_timezone.now.return_value = timezone.now() + timedelta(minutes=10)
+        assert authenticated_client.post(url, {"code": "1234"}, format="json").status_code == 400
+    assert authenticated_client.post(url, {"code": "1234"}, format="json").status_code == 200
+    assert not UserConfirmation.objects.exists()
+
+
+@pytest.mark.django_db
+def test_new_verify_code_db_store(authenticated_client, user, settings):
+    settings.VERIFICATION_CODE_STORE = "db"
+    url = reverse("users:new_verify_code")
+    assert authenticated_client.post(url, format="json").status_code == 200
+    assert authenticated_client.post(url, format="json").status_code == 400
     assert UserConfirmation.objects.filter(user=user).count() == 1
 
+
+@pytest.mark.django_db
+def test_purge_confirmations(user):
+    live = UserConfirmation.objects.create(user=user, code="1111", auth_type=AuthType.Email)
+    for i in range(5):
+        UserConfirmation.objects.create(user=user, code="2222", auth_type=AuthType.Email)
+    UserConfirmation.objects.exclude(pk=live.pk).update(expired_time=timezone.now() - timedelta(minutes=1))
+    assert purge_confirmations(batch_size=2) == 5
+    assert list(UserConfirmation.objects.all()) == [live]
+
 @pytest.mark.django_db
 def test_new_verify_code_view_already_verified(authenticated_client, user):
     user.user_status = UserStatus.CodeVerified
@@ -200,3 +271,245 @@ def test_info_user_serializer_valid(user):
     
     assert serializer.is_valid()
     assert not serializer.errors
+
+
+@pytest.mark.django_db
+def test_jwt_user_is_cached_and_invalidated(authenticated_client, user, fake_redis, django_capture_on_commit_callbacks, django_assert_num_queries, settings):
+    settings.AUTH_USER_LOCAL_TTL = 0  # проверяем слой Redis
+    url = reverse("users:new_verify_code")
+    authenticated_client.post(url, format="json")
+    assert fake_redis.exists(f"user:{user.pk}:auth")
+    # пользователь из Redis: только проверка, что код уже выдан
+    with django_assert_num_queries(0):
+        response = authenticated_client.post(url, format="json")
+    assert response.status_code == 400
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.user_status = UserStatus.CodeVerified
+        user.save()
+    assert not fake_redis.exists(f"user:{user.pk}:auth")
+    response = authenticated_client.post(url, format="json")
+    assert response.data["detail"] == "User is already verified."
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.is_active = False
+        user.save()
+    assert authenticated_client.post(url, format="json").status_code == 401
+
+
+@pytest.mark.django_db
+def test_stale_cached_user_is_not_used(user, fake_redis, django_capture_on_commit_callbacks):
+    from shared.authentication import get_cached_user, invalidate_user
+    assert get_cached_user(user.pk)[0].username == "testuser"
+    # запись, построенная до коммита изменения, отбрасывается по версии
+    stale = fake_redis.get(f"user:{user.pk}:auth")
+    User.objects.filter(pk=user.pk).update(username="renamed")
+    with django_capture_on_commit_callbacks(execute=True):
+        invalidate_user(user.pk)
+    fake_redis.set(f"user:{user.pk}:auth", stale)
+    assert get_cached_user(user.pk)[0].username == "renamed"
+
+
+def issue_tokens(user, age=0):
+    """Пара токенов, выданная ``age`` секунд назад"""
+    from rest_framework_simplejwt.tokens import RefreshToken
+    refresh = RefreshToken.for_user(user)
+    access = refresh.access_token
+    for token in (refresh, access):
+        token["iat"] -= age
+    return str(refresh), str(access)
+
+
+@pytest.mark.django_db
+def test_refresh_and_logout(user):
+    from rest_framework.test import APIClient
+    client = APIClient()
+    refresh, access = issue_tokens(user)
+    response = client.post(reverse("users:login_refresh"), {"refresh": refresh}, format="json")
+    assert response.status_code == 200 and response.data["access"]
+
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+    assert client.post(reverse("users:logout"), {"refresh": refresh}, format="json").status_code == 200
+    # отозваны и refresh, и access токен запроса, в том числе на stateless-эндпоинтах
+    assert client.post(reverse("users:login_refresh"), {"refresh": refresh}, format="json").status_code == 401
+    assert client.post(reverse("users:new_verify_code"), format="json").status_code == 401
+    assert client.get(reverse("home-timeline")).status_code == 401
+
+
+@pytest.mark.django_db
+def test_logout_rejects_foreign_refresh_token(authenticated_client):
+    other = User.objects.create_user(username="other", password="password", auth_type="email", email="other@example.com")
+    refresh, _ = issue_tokens(other)
+    response = authenticated_client.post(reverse("users:logout"), {"refresh": refresh}, format="json")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_logout_all_devices(user, fake_redis, django_assert_num_queries):
+    from rest_framework.test import APIClient
+    old_refresh, old_access = issue_tokens(user, age=60)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {old_access}")
+    assert client.get(reverse("home-timeline")).status_code == 200
+    assert client.post(reverse("users:logout_all"), format="json").status_code == 200
+
+    assert client.get(reverse("home-timeline")).status_code == 401
+    assert client.post(reverse("users:login_refresh"), {"refresh": old_refresh}, format="json").status_code == 401
+    # новый вход после «выйти везде» работает; проверка отзыва не ходит в БД,
+    # остаётся только запрос самой ленты
+    _, access = issue_tokens(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+    with django_assert_num_queries(1):
+        assert client.get(reverse("home-timeline")).status_code == 200
+
+
+@pytest.fixture
+def member(db):
+    """Пользователь, прошедший регистрацию до конца"""
+    return User.objects.create_user(
+        username="Member", email="member@example.com", phone_number="+998901234567",
+        password="s3cret-pass", auth_type="email", user_status=UserStatus.Done,
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("userinput", ["member", "MEMBER@example.com", "+998901234567"])
+def test_login_with_any_identifier(client, member, userinput, django_assert_num_queries):
+    # один SELECT пользователя, без повторных exists()/first()/authenticate()
+    with django_assert_num_queries(1):
+        response = client.post(reverse("users:login"), {"userinput": userinput, "password": "s3cret-pass"}, format="json")
+    assert response.status_code == 200
+    assert response.data["access"] and response.data["refresh"]
+    assert response.data["user_status"] == UserStatus.Done
+
+
+@pytest.mark.django_db
+def test_login_rejects_wrong_password_and_unfinished_signup(client, member, user):
+    url = reverse("users:login")
+    assert client.post(url, {"userinput": "member", "password": "wrong"}, format="json").status_code == 400
+    assert client.post(url, {"userinput": "nobody", "password": "wrong"}, format="json").status_code == 400
+    # user ещё не прошёл регистрацию
+    response = client.post(url, {"userinput": "testuser", "password": "password"}, format="json")
+    assert response.status_code == 400
+    assert "royhatdan" in str(response.data)
+    # без верного пароля статус не раскрывается
+    response = client.post(url, {"userinput": "testuser", "password": "wrong"}, format="json")
+    assert response.status_code == 400
+    assert "royhatdan" not in str(response.data)
+
+
+@pytest.mark.django_db
+def test_login_upgrades_pbkdf2_hash_to_argon2(client, member):
+    from django.contrib.auth.hashers import make_password
+    User.objects.filter(pk=member.pk).update(password=make_password("s3cret-pass", hasher="pbkdf2_sha256"))
+    response = client.post(reverse("users:login"), {"userinput": "member", "password": "s3cret-pass"}, format="json")
+    assert response.status_code == 200
+    member.refresh_from_db()
+    assert member.password.startswith("argon2")
+    assert member.check_password("s3cret-pass")
+
+
+@pytest.mark.django_db
+def test_password_hashing_is_bounded(member, monkeypatch, settings):
+    from threading import BoundedSemaphore
+    from rest_framework.exceptions import Throttled
+    from apps.users import passwords
+    monkeypatch.setattr(passwords, "_slots", BoundedSemaphore(1))
+    settings.PASSWORD_HASH_WAIT = 0.01
+    passwords._slots.acquire()  # все слоты заняты
+    with pytest.raises(Throttled):
+        passwords.verify_password(member, "s3cret-pass")
+    passwords._slots.release()
+    assert passwords.verify_password(member, "s3cret-pass")
+
+
+@pytest.mark.django_db
+def test_last_seen_is_buffered_and_flushed(member, fake_redis, django_assert_num_queries):
+    from apps.users.tasks import flush_last_seen
+    refresh, _ = issue_tokens(member)
+    response = APIClient().post(reverse("users:login_refresh"), {"refresh": refresh}, format="json")
+    assert response.status_code == 200
+    member.refresh_from_db()
+    assert member.last_login is None  # строка пользователя не пишется при refresh
+    assert fake_redis.hexists("users:last_seen", str(member.pk))
+
+    others = [User.objects.create_user(username=f"seen{i}", password="password", auth_type="email", email=f"seen{i}@example.com") for i in range(3)]
+    for other in others:
+        fake_redis.hset("users:last_seen", str(other.pk), 1700000000.5)
+    # один bulk UPDATE на всех
+    with django_assert_num_queries(1, exact=False):
+        assert flush_last_seen() == 4
+    assert not fake_redis.exists("users:last_seen")
+    member.refresh_from_db()
+    assert timezone.now() - member.last_login < timedelta(minutes=1)
+    assert {u.last_login.timestamp() for u in User.objects.filter(pk__in=[o.pk for o in others])} == {1700000000.5}
+    assert flush_last_seen() == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("workers", [0, 2])
+def test_import_users_command(tmp_path, user, workers):
+    from io import StringIO
+    from django.core.management import call_command
+    source = tmp_path / "users.csv"
+    source.write_text(
+        "email,phone_number,username,password,first_name\n"
+        "New.One@Example.com,,newone,s3cret-pass,Ali\n"
+        ",998 90 123 45 67,,,\n"
+        "not-an-email,123,,,\n"
+        f"{user.email},,taken,,\n"
+        "new.one@example.com,,again,,\n",
+        encoding="utf-8",
+    )
+    out = StringIO()
+    call_command("import_users", str(source), "--workers", str(workers), "--chunk-size", "2", stdout=out)
+    assert "Imported 2 users, skipped 3" in out.getvalue()
+
+    imported = User.objects.get(email="new.one@example.com")
+    assert imported.username == "newone" and imported.first_name == "Ali"
+    assert imported.check_password("s3cret-pass")
+    assert imported.user_status == UserStatus.Done
+    by_phone = User.objects.get(phone_number="+998901234567")
+    assert by_phone.username.startswith("instagram-")
+    assert not by_phone.has_usable_password()  # пароль не задан
+    assert by_phone.auth_type == AuthType.Phone
+
+
+@pytest.mark.django_db
+def test_import_users_command_ndjson(tmp_path):
+    from io import StringIO
+    from django.core.management import call_command
+    source = tmp_path / "users.ndjson"
+    source.write_text(
+        '{"email": "a@example.com", "username": "a_user"}\n'
+        '\n'
+        '["c@example.com"]\n'
+        'null\n'
+        '{"email": "b@example.com", "username": "a_user"}\n',
+        encoding="utf-8",
+    )
+    out = StringIO()
+    call_command("import_users", str(source), "--workers", "0", stdout=out)
+    # строки-не-объекты пропускаются, а не роняют импорт
+    assert "Imported 1 users, skipped 3" in out.getvalue()
+    # второй ряд пропущен: username уже занят
+    assert list(User.objects.filter(email__endswith="@example.com").values_list("email", flat=True)) == ["a@example.com"]
+
+
+@pytest.mark.django_db
+def test_import_users_counts_only_inserted_rows(tmp_path, monkeypatch):
+    from io import StringIO
+    from django.core.management import call_command
+    source = tmp_path / "users.csv"
+    source.write_text("email,username\na@example.com,a_user\nb@example.com,b_user\n", encoding="utf-8")
+    bulk_create = User.objects.bulk_create
+
+    def racing_bulk_create(users, **kwargs):
+        # параллельная регистрация успела занять username
+        User.objects.create_user(username="b_user", email="other@example.com", password="x")
+        return bulk_create(users, **kwargs)
+
+    monkeypatch.setattr(User.objects, "bulk_create", racing_bulk_create)
+    out = StringIO()
+    call_command("import_users", str(source), "--workers", "0", stdout=out)
+    assert "Imported 1 users, skipped 1" in out.getvalue()